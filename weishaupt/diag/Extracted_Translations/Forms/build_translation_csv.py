@@ -2,6 +2,14 @@ import csv
 import re
 import os
 import glob
+import argparse
+
+try:
+    # phase_profiler lives in diag/, which is on sys.path when this runs
+    # through whdiag.py or benchmark_generators.py (or with PYTHONPATH=diag)
+    from phase_profiler import PhaseProfiler, dump_cprofile
+except ImportError:
+    PhaseProfiler = dump_cprofile = None
 
 # Aggressive filter for Delphi layout noise
 NOISE_WORDS = {
@@ -35,7 +43,28 @@ def is_valid_translation(val):
         return False
     return True
 
-def process_single_file(input_file, output_file):
+def process_single_file(input_file, output_file, profiler=None):
+    if profiler is None:
+        return write_translation_csv(parse_form_components(input_file), output_file)
+
+    profiler.start_file(input_file)
+    try:
+        with profiler.phase("parse") as stats:
+            components = parse_form_components(input_file)
+            stats['bytes'] = os.path.getsize(input_file)
+            stats['symbols'] = len(components)
+
+        with profiler.phase("write") as stats:
+            comps_written = write_translation_csv(components, output_file)
+            stats['symbols'] = comps_written
+            if comps_written:
+                stats['bytes'] = os.path.getsize(output_file)
+    finally:
+        profiler.end_file()
+
+    return comps_written
+
+def parse_form_components(input_file):
     components = {}
     current_main_comp = None
 
@@ -77,6 +106,9 @@ def process_single_file(input_file, output_file):
                     if len(components[current_main_comp]['translations']) == 0 or val != components[current_main_comp]['translations'][-1]:
                         components[current_main_comp]['translations'].append(val)
 
+    return components
+
+def write_translation_csv(components, output_file):
     # Clean out empty components
     cleaned_components = {k: v for k, v in components.items() if len(v['translations']) > 0}
     
@@ -109,7 +141,7 @@ def process_single_file(input_file, output_file):
             
     return len(cleaned_components)
 
-def batch_process(input_dir, output_dir):
+def batch_process(input_dir, output_dir, profiler=None):
     if not os.path.exists(input_dir):
         print(f"Error: The input directory '{input_dir}' does not exist.")
         return
@@ -133,7 +165,7 @@ def batch_process(input_dir, output_dir):
         csv_filename = os.path.splitext(filename)[0] + ".csv"
         out_filepath = os.path.join(output_dir, csv_filename)
         
-        comps_found = process_single_file(filepath, out_filepath)
+        comps_found = process_single_file(filepath, out_filepath, profiler=profiler)
         
         if comps_found > 0:
             print(f" -> Created {csv_filename} ({comps_found} components)")
@@ -146,8 +178,30 @@ def batch_process(input_dir, output_dir):
     print(f"Check the '{output_dir}' folder.")
 
 if __name__ == "__main__":
-    # Define your folders here
-    INPUT_FOLDER = "Extracted_Translations/Forms"
-    OUTPUT_FOLDER = "Extracted_Translations/CSV_Matrices"
-    
-    batch_process(INPUT_FOLDER, OUTPUT_FOLDER)
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Build per-form translation CSV matrices from extracted DFM text.")
+    parser.add_argument("--profile", metavar="REPORT.json",
+                        help="record per-phase timing and throughput into a JSON report")
+    parser.add_argument("--cprofile", metavar="OUT.prof",
+                        help="with --profile: also dump a cProfile of the slowest file")
+    parser.add_argument("--profile-memory", action="store_true",
+                        help="with --profile: trace peak memory per phase (slows the timed run down)")
+    parser.add_argument("--input", default="Extracted_Translations/Forms",
+                        help="folder with the extracted form texts (default: Extracted_Translations/Forms)")
+    parser.add_argument("--output", default="Extracted_Translations/CSV_Matrices",
+                        help="folder for the CSV matrices (default: Extracted_Translations/CSV_Matrices)")
+    args = parser.parse_args()
+
+    INPUT_FOLDER = args.input
+    OUTPUT_FOLDER = args.output
+    if args.profile and PhaseProfiler is None:
+        parser.error("--profile needs phase_profiler.py from diag/; run with PYTHONPATH=diag")
+
+    profiler = PhaseProfiler("build_translation_csv", args.profile_memory) if args.profile else None
+    batch_process(INPUT_FOLDER, OUTPUT_FOLDER, profiler=profiler)
+
+    if profiler and profiler.files:
+        profiler.write_report(args.profile)
+        if args.cprofile:
+            slowest = os.path.abspath(os.path.join(INPUT_FOLDER, profiler.slowest_file()))
+            out_filepath = os.path.join(OUTPUT_FOLDER, os.path.splitext(profiler.slowest_file())[0] + ".csv")
+            dump_cprofile(lambda path: process_single_file(path, out_filepath), slowest, args.cprofile)
@@ -0,0 +1,258 @@
+import os
+import io
+import sys
+import glob
+import json
+import time
+import random
+import hashlib
+import argparse
+import tempfile
+import contextlib
+
+from generate_ebusd_csv import calculate_weishaupt_crc_multi, extract_syc_symbols, parse_syc_to_ebusd, SECTION_FOOTERS
+from generate_ebusd_templates import generate_template_file
+
+DIAG_DIR = os.path.dirname(os.path.abspath(__file__))
+TRANSLATION_INPUT = os.path.join(DIAG_DIR, "Extracted_Translations", "Forms")
+GOLDEN_FILE = os.path.join(DIAG_DIR, "benchmark_golden.json")
+
+# Sections a synthetic file is laid out in, in the same order as the footers.
+# Bit addresses stay below 0x100, everything else uses the 16-bit range.
+SYNTHETIC_SECTIONS = [("RAM", 0x0100), ("Bits", 0x0100), ("SFR", 0x0100), ("Konstanten", 0x0400), ("XRAM", 0xF100)]
+
+def make_synthetic_syc(symbol_count, seed=0):
+    """
+    Builds an in-memory .SYC image with symbol_count records spread over all
+    sections, using the same length/name/address/79 05 record layout and the
+    same section footers the real firmware files use.
+    """
+    rng = random.Random(seed)
+    out = bytearray()
+    per_section = max(1, symbol_count // len(SYNTHETIC_SECTIONS))
+
+    for sec_idx, (sec_name, addr_limit) in enumerate(SYNTHETIC_SECTIONS):
+        for i in range(per_section):
+            name = f"SYN{sec_idx}_{i:07d}".encode('ascii')
+            address = rng.randrange(addr_limit)
+            out.append(len(name))
+            out += name
+            out += address.to_bytes(2, byteorder='little')
+            out += b"\x79\x05"
+        out += b"\x00" + SECTION_FOOTERS[sec_idx] + b"\x00"
+
+    return bytes(out)
+
+def list_syc_files():
+    syc_files = glob.glob(os.path.join(DIAG_DIR, "*.SYC")) + glob.glob(os.path.join(DIAG_DIR, "*.syc"))
+    return sorted(set(syc_files))
+
+def time_best_of(func, repeat):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):
+            func()
+        elapsed = time.perf_counter() - start
+        if best is None or elapsed < best:
+            best = elapsed
+    return best
+
+def sha256_of(filepath):
+    with open(filepath, 'rb') as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+# --- Benchmarks: each returns (work_units, unit_name, callable) ---
+
+def bench_crc():
+    rng = random.Random(1)
+    payloads = [bytes(rng.randrange(256) for _ in range(rng.choice((2, 4, 10)))).hex() for _ in range(20000)]
+    def run():
+        for p in payloads:
+            calculate_weishaupt_crc_multi(p)
+    return len(payloads), "payloads", run
+
+def bench_syc_parse(syc_files):
+    blobs = []
+    for path in syc_files:
+        with open(path, 'rb') as f:
+            blobs.append(f.read())
+    def run():
+        for data in blobs:
+            extract_syc_symbols(data)
+    return sum(len(b) for b in blobs), "bytes", run
+
+def bench_inc_generation(syc_files, out_dir):
+    def run():
+        for path in syc_files:
+            base = os.path.splitext(os.path.basename(path))[0]
+            parse_syc_to_ebusd(path, out_filepath=os.path.join(out_dir, base + ".inc"))
+    return len(syc_files), "files", run
+
+def bench_templates(syc_files, out_dir):
+    def run():
+        for path in syc_files:
+            base = os.path.splitext(os.path.basename(path))[0]
+            generate_template_file(path, out_filepath=os.path.join(out_dir, base + "_template.inc"))
+    return len(syc_files), "files", run
+
+def bench_translations(out_dir):
+    sys.path.insert(0, TRANSLATION_INPUT)
+    from build_translation_csv import batch_process
+    def run():
+        batch_process(TRANSLATION_INPUT, out_dir)
+    return len(glob.glob(os.path.join(TRANSLATION_INPUT, "*.txt"))), "files", run
+
+def bench_synthetic(base_count, scale):
+    data = make_synthetic_syc(base_count * scale, seed=scale)
+    def run():
+        extract_syc_symbols(data)
+    return len(data), "bytes", run
+
+def selected_syc_files(args):
+    syc_files = list_syc_files()
+    if args.files:
+        syc_files = [p for p in syc_files if os.path.basename(p) in args.files]
+    return syc_files
+
+def run_benchmarks(args, out_dir):
+    syc_files = selected_syc_files(args)
+
+    # Base symbol count for synthetic scaling: the symbols of WH11928, our reference firmware
+    with open(os.path.join(DIAG_DIR, "WH11928.SYC"), 'rb') as f:
+        regs, _, bits = extract_syc_symbols(f.read())
+    base_count = len(regs) + len(bits)
+
+    benches = {
+        'crc': bench_crc(),
+        'syc_parse': bench_syc_parse(syc_files),
+        'inc_generation': bench_inc_generation(syc_files, out_dir),
+        'templates': bench_templates(syc_files, out_dir),
+        'translations': bench_translations(out_dir),
+    }
+    for scale in args.scales:
+        benches[f'synthetic_x{scale}'] = bench_synthetic(base_count, scale)
+
+    results = {}
+    for name, (units, unit_name, func) in benches.items():
+        if args.only and name not in args.only:
+            continue
+        best = time_best_of(func, args.repeat)
+        results[name] = {'best_s': best, 'units': units, 'unit': unit_name, 'per_s': units / best if best > 0 else 0.0}
+        print(f"{name:<22} {best * 1000:>10.2f} ms   {results[name]['per_s']:>14.1f} {unit_name}/s")
+    return results
+
+def collect_outputs(out_dir):
+    outputs = {}
+    for path in sorted(glob.glob(os.path.join(out_dir, "*"))):
+        outputs[os.path.basename(path)] = sha256_of(path)
+    return outputs
+
+def golden_owner(filename):
+    # Benchmark that writes a golden output file
+    if filename.endswith("_template.inc"):
+        return 'templates'
+    if filename.endswith(".inc") or filename.endswith(".alias.csv"):
+        return 'inc_generation'
+    return 'translations'
+
+def expected_outputs(golden, ran, syc_files):
+    """
+    Golden entries the benchmarks that ran should have produced: inc and
+    template outputs of the selected .SYC files, all translation CSVs.
+    """
+    stems = {os.path.splitext(os.path.basename(p))[0] for p in syc_files}
+    expected = set()
+    for filename in golden:
+        owner = golden_owner(filename)
+        if owner not in ran:
+            continue
+        stem = filename.split('.')[0]
+        if owner == 'templates':
+            stem = stem[:-len("_template")]
+        if owner != 'translations' and stem not in stems:
+            continue
+        expected.add(filename)
+    return expected
+
+def check_golden(outputs, ran, syc_files, update, partial=False):
+    golden = {}
+    if os.path.exists(GOLDEN_FILE):
+        with open(GOLDEN_FILE, 'r') as f:
+            golden = json.load(f)
+
+    if update:
+        # A run limited by --only/--files only refreshes its own entries
+        if partial:
+            golden.update(outputs)
+        else:
+            golden = outputs
+        with open(GOLDEN_FILE, 'w') as f:
+            json.dump(golden, f, indent=1, sort_keys=True)
+        print(f"Updated golden digests in {GOLDEN_FILE} ({len(outputs)} files)")
+        return True
+
+    ok = True
+    compared = 0
+    for filename, digest in sorted(outputs.items()):
+        if filename not in golden:
+            print(f"GOLDEN UNKNOWN OUTPUT: {filename}")
+            ok = False
+            continue
+        compared += 1
+        if golden[filename] != digest:
+            print(f"GOLDEN MISMATCH: {filename}")
+            ok = False
+    for filename in sorted(expected_outputs(golden, ran, syc_files) - set(outputs)):
+        print(f"GOLDEN NOT PRODUCED: {filename}")
+        ok = False
+    if compared == 0:
+        print("Golden check: FAILED (nothing compared; the selected benchmarks write no outputs, use --no-golden)")
+        return False
+    print(f"Golden check: {'OK' if ok else 'FAILED'} ({compared} outputs compared)")
+    return ok
+
+def check_regressions(results, baseline_path, threshold):
+    with open(baseline_path, 'r') as f:
+        baseline = json.load(f)
+
+    ok = True
+    for name, result in results.items():
+        if name not in baseline:
+            continue
+        ratio = result['best_s'] / baseline[name]['best_s']
+        flag = "REGRESSION" if ratio > 1 + threshold else "ok"
+        if flag != "ok":
+            ok = False
+        print(f"{name:<22} {ratio:>6.2f}x baseline  {flag}")
+    return ok
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the SYC generators, CRC and translation builder, and check their outputs.")
+    parser.add_argument("--repeat", type=int, default=3, help="runs per benchmark, best time is kept (default: 3)")
+    parser.add_argument("--scales", type=lambda s: [int(x) for x in s.split(',') if x], default=[10],
+                        help="comma separated synthetic SYC scale factors, e.g. 10,100,1000 (default: 10)")
+    parser.add_argument("--files", nargs='*', help="only use these .SYC files (basenames)")
+    parser.add_argument("--only", nargs='*', help="only run these benchmarks")
+    parser.add_argument("--save-baseline", metavar="BASELINE.json", help="store the timings as the new baseline")
+    parser.add_argument("--baseline", metavar="BASELINE.json", help="fail when a benchmark is slower than this baseline")
+    parser.add_argument("--threshold", type=float, default=0.20, help="allowed slowdown against the baseline (default: 0.20)")
+    parser.add_argument("--update-golden", action="store_true", help="rewrite benchmark_golden.json from the current outputs")
+    parser.add_argument("--no-golden", action="store_true", help="only time the benchmarks, skip the output check")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as out_dir:
+        results = run_benchmarks(args, out_dir)
+        golden_ok = args.no_golden or check_golden(collect_outputs(out_dir), set(results), selected_syc_files(args),
+                                                   args.update_golden, bool(args.only or args.files))
+
+    if args.save_baseline:
+        with open(args.save_baseline, 'w') as f:
+            json.dump(results, f, indent=2)
+        print(f"Saved baseline to {args.save_baseline}")
+
+    perf_ok = True
+    if args.baseline:
+        perf_ok = check_regressions(results, args.baseline, args.threshold)
+
+    sys.exit(0 if golden_ok and perf_ok else 1)
@@ -0,0 +1,305 @@
+import os
+import re
+import sys
+import csv
+import json
+import argparse
+
+from register_requests import READ_PBSB, parse_elements
+from ebusd_config import CONFIG_DIR, device_files, read_messages
+
+# eBUS line: 2400 baud, 1 start + 8 data + 1 stop bit
+BAUD = 2400
+BITS_PER_BYTE = 10
+BYTE_TIME = BITS_PER_BYTE / BAUD
+SYN = 0xAA
+ESC = 0xA9
+BROADCAST = 0xFE
+EBUSD_ADDRESS = 0x31
+# Longest wait for the auto-SYN on an idle bus before arbitration can start
+AUTO_SYN_WAIT = 0.050
+# ebusd polls one message per --pollinterval (default 5 s)
+DEFAULT_POLL_INTERVAL = 5.0
+# Assumed send interval of passive messages (broadcasts, master-master)
+DEFAULT_PASSIVE_INTERVAL = 10.0
+DEFAULT_MAX_UTILIZATION = 0.5
+
+BASE_TYPE_SIZES = {
+    "UCH": 1, "SCH": 1, "D1B": 1, "D1C": 1, "BCD": 1, "HEX": 1, "BDY": 1, "HDY": 1,
+    "TTM": 1, "TTH": 1, "TTQ": 1,
+    "UIN": 2, "SIN": 2, "UIR": 2, "SIR": 2, "D2B": 2, "D2C": 2, "FLT": 2, "FLR": 2,
+    "PIN": 2, "BTM": 2, "VTM": 2, "HTM": 2,
+    "U3N": 3, "S3N": 3, "U3R": 3, "S3R": 3, "BTI": 3, "HTI": 3, "VTI": 3, "HDA": 3,
+    "BDA": 4, "ULG": 4, "SLG": 4, "ULR": 4, "SLR": 4, "EXP": 4, "EXR": 4,
+}
+SIZED_TYPE = re.compile(r'^(STR|IGN|HEX|NTS|BCD):(\d+)$')
+BIT_TYPE = re.compile(r'^BI(\d)(?::(\d))?$')
+
+def is_master(address):
+    nibbles = {0x0, 0x1, 0x3, 0x7, 0xF}
+    return (address >> 4) in nibbles and (address & 0x0F) in nibbles
+
+def ebus_crc(data):
+    """
+    eBUS CRC-8 (polynomial 0x9B) over the transmitted, escaped bytes.
+    """
+    crc = 0
+    for byte in data:
+        for _ in range(8):
+            bit = ((crc ^ byte) & 0x80) != 0
+            crc = (crc << 1) & 0xFF
+            if bit:
+                crc ^= 0x9B
+            byte = (byte << 1) & 0xFF
+    return crc
+
+def escape(data):
+    out = bytearray()
+    for byte in data:
+        if byte == ESC:
+            out += bytes((ESC, 0x00))
+        elif byte == SYN:
+            out += bytes((ESC, 0x01))
+        else:
+            out.append(byte)
+    return bytes(out)
+
+def wire_bytes(qq, zz, master_data, response_len=0):
+    """
+    Bytes on the wire for one transaction: QQ ZZ PB SB NN data CRC, slave
+    ACK, slave answer NN data CRC, master ACK and the closing SYN. The
+    master part and its CRC are escaped exactly; the answer is unknown, so
+    returns (expected, worst case) with 2/256 escapes per answer byte on
+    average and every answer byte escaped in the worst case.
+    """
+    master = escape(bytes((0x00 if qq is None else qq, zz)) + master_data)
+    master += escape(bytes((ebus_crc(master),)))
+    total = len(master) + 1
+    if zz == BROADCAST:
+        return float(total), total
+    total += 1
+    if is_master(zz):
+        return float(total), total
+    # NN + data + CRC, then the master ACK
+    answer = 1 + response_len + 1
+    total += answer + 1
+    escapable = response_len + 1
+    return total + escapable * 2 / 256.0, total + escapable
+
+def load_templates(path):
+    templates = {}
+    if not os.path.exists(path):
+        return templates
+    with open(path, 'r', encoding='utf-8', errors='ignore') as f:
+        for row in csv.reader(f):
+            if len(row) < 2 or not row[0].startswith('_'):
+                continue
+            templates.setdefault(row[0].split(':')[0].strip(), row[1].strip())
+    return templates
+
+def type_size(type_str, templates, depth=0):
+    """
+    Returns (bytes, bit position or None) for a field type. Unknown types
+    and templates count as one byte.
+    """
+    type_str = type_str.strip()
+    if not type_str:
+        return 0, None
+    if type_str in templates and depth < 8:
+        parts = [type_size(t, templates, depth + 1) for t in templates[type_str].split(';')]
+        if len(parts) == 1:
+            return parts[0]
+        return sum(size for size, _ in parts), None
+    m = BIT_TYPE.match(type_str)
+    if m:
+        return 1, int(m.group(1))
+    m = SIZED_TYPE.match(type_str)
+    if m:
+        return int(m.group(2)), None
+    return BASE_TYPE_SIZES.get(type_str, 1), None
+
+def fields_size(fields, part, templates):
+    """
+    Sums the sizes of the fields of one part ('m' or 's'); consecutive bit
+    fields share a byte while their positions keep rising.
+    """
+    size = 0
+    last_bit = None
+    for field_part, field_type in fields:
+        if field_part != part:
+            continue
+        field_size, bit = type_size(field_type, templates)
+        if bit is not None and last_bit is not None and bit > last_bit:
+            last_bit = bit
+            continue
+        last_bit = bit
+        size += field_size
+    return size
+
+def _row_fields(row, default_part):
+    fields = []
+    for i in range(8, len(row) - 2, 6):
+        field_type = row[i + 2].strip()
+        if field_type:
+            fields.append((row[i + 1].strip() or default_part, field_type))
+    return fields
+
+def load_config(config_dir=CONFIG_DIR, firmware=True):
+    """
+    Loads every message of the device CSVs (ZZ..circuit.csv) and their
+    includes with the wire size of its telegram. firmware=False leaves out
+    the firmware symbol includes (WH11928.inc ...).
+    """
+    templates = load_templates(os.path.join(config_dir, "_templates.csv"))
+    messages = []
+    for path, zz, circuit in device_files(config_dir):
+        for msg in read_messages(path, firmware):
+            if len(msg['pbsb']) != 4:
+                continue
+            try:
+                id_bytes = bytes.fromhex(msg['pbsb'] + msg['id'])
+            except ValueError:
+                continue
+            polled = msg['kind'] == 'r'
+            fields = _row_fields(msg['row'], 's' if polled else 'm')
+            master_data = id_bytes[2:] + bytes(fields_size(fields, 'm', templates))
+            response_len = fields_size(fields, 's', templates)
+            if polled and msg['pbsb'] == READ_PBSB:
+                # Memory reads answer with a status byte plus the element bytes
+                runs = parse_elements(msg['id'])
+                if runs:
+                    response_len = 1 + sum(run[2] for run in runs)
+            messages.append({
+                'circuit': circuit,
+                'name': msg['name'],
+                'kind': msg['kind'],
+                'priority': msg['priority'] if polled else None,
+                # Passive messages without QQ come from an unknown master
+                'qq': int(msg['qq'], 16) if msg['qq'] else (EBUSD_ADDRESS if msg['kind'] in ('r', 'w') else None),
+                'zz': int(msg['zz'], 16) if msg['zz'] else zz,
+                'telegram': id_bytes[:2] + bytes((len(master_data),)) + master_data,
+                'response_len': response_len,
+            })
+    for msg in messages:
+        msg['bytes'], msg['worst_bytes'] = wire_bytes(msg['qq'], msg['zz'], msg['telegram'], msg['response_len'])
+        msg['airtime'] = msg['bytes'] * BYTE_TIME
+        msg['worst_airtime'] = msg['worst_bytes'] * BYTE_TIME
+    return messages
+
+def load_poll_file(path):
+    """
+    Poll list with one "circuit name seconds" per line (# comments), e.g.
+    what FHEM reads through EBUS.Timer.
+    """
+    polls = {}
+    with open(path, 'r') as f:
+        for line in f:
+            line = line.split('#', 1)[0].strip()
+            if not line:
+                continue
+            circuit, name, seconds = line.replace(',', ' ').split()[:3]
+            polls[(circuit, name)] = float(seconds)
+    return polls
+
+def schedule(messages, polls=None, poll_interval=DEFAULT_POLL_INTERVAL, passive_interval=DEFAULT_PASSIVE_INTERVAL):
+    """
+    Sets the send period of every message that generates traffic:
+    - r1..r9: ebusd polls one message per poll_interval, a message of
+      priority p gets a share of 1/p of the poll slots
+    - entries of the poll file: their own period
+    - passive messages (broadcasts, master-master) every passive_interval
+    Writes are only sent on demand and are not counted.
+    Returns the active messages.
+    """
+    polls = polls or {}
+    prioritized = [m for m in messages if m['priority'] and (m['circuit'], m['name']) not in polls]
+    weights = sum(1.0 / m['priority'] for m in prioritized)
+    active = []
+    for msg in messages:
+        key = (msg['circuit'], msg['name'])
+        if msg['kind'] == 'w':
+            continue
+        if key in polls:
+            msg['period'] = polls[key]
+        elif msg['priority']:
+            msg['period'] = poll_interval * weights * msg['priority']
+        elif msg['kind'] != 'r':
+            msg['period'] = passive_interval
+        else:
+            continue
+        active.append(msg)
+    return active
+
+def analyze(active):
+    """
+    Utilization of the bus and worst-case latency per message. A message
+    may have to wait for the telegram in flight, for the auto-SYN and, as
+    every master wins arbitration once under the eBUS fairness rule, for
+    the longest telegram of each other master. Polls of ebusd are queued
+    one after the other, so a message also waits for the other ebusd
+    messages due at the same time.
+    """
+    utilization = sum(m['airtime'] / m['period'] for m in active)
+    longest_by_master = {}
+    for m in active:
+        longest_by_master[m['qq']] = max(longest_by_master.get(m['qq'], 0.0), m['worst_airtime'])
+    longest = max(longest_by_master.values(), default=0.0)
+    ebusd_queue = sum(m['worst_airtime'] for m in active if m['qq'] == EBUSD_ADDRESS)
+
+    for m in active:
+        others = sum(t for qq, t in longest_by_master.items() if qq != m['qq'])
+        queue = ebusd_queue - m['worst_airtime'] if m['qq'] == EBUSD_ADDRESS else 0.0
+        m['load'] = m['airtime'] / m['period']
+        m['worst_latency'] = m['period'] + longest + AUTO_SYN_WAIT + others + queue + m['worst_airtime']
+    return utilization
+
+def print_report(active, utilization, top=15):
+    print(f"{len(active)} active messages, bus utilization {utilization * 100:.1f}% at {BAUD} baud")
+    print(f"\nMost expensive messages (share of bus time):")
+    for m in sorted(active, key=lambda m: m['load'], reverse=True)[:top]:
+        print(f"  {m['circuit'] + ' ' + m['name']:<40} {m['bytes']:6.1f} bytes {m['airtime'] * 1000:7.1f} ms "
+              f"every {m['period']:7.1f} s  {m['load'] * 100:5.2f}%")
+    print(f"\nWorst-case latency:")
+    for m in sorted(active, key=lambda m: m['worst_latency'], reverse=True)[:top]:
+        print(f"  {m['circuit'] + ' ' + m['name']:<40} {m['worst_latency']:8.2f} s")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Estimate the eBUS load of a config tree before rolling it out.")
+    parser.add_argument("--config", default=CONFIG_DIR, help="ebusd config dir (default: the parent directory)")
+    parser.add_argument("--poll", help="poll list, one 'circuit name seconds' per line")
+    parser.add_argument("--poll-interval", type=float, default=DEFAULT_POLL_INTERVAL,
+                        help=f"ebusd --pollinterval for r1..r9 messages (default: {DEFAULT_POLL_INTERVAL:g} s)")
+    parser.add_argument("--passive-interval", type=float, default=DEFAULT_PASSIVE_INTERVAL,
+                        help=f"assumed period of broadcasts and master-master messages (default: {DEFAULT_PASSIVE_INTERVAL:g} s)")
+    parser.add_argument("--max-utilization", type=float, default=DEFAULT_MAX_UTILIZATION,
+                        help=f"reject the config above this bus load (default: {DEFAULT_MAX_UTILIZATION})")
+    parser.add_argument("--max-latency", type=float, help="reject the config if any worst-case latency exceeds this (s)")
+    parser.add_argument("--top", type=int, default=15, help="messages listed per ranking (default: 15)")
+    parser.add_argument("--json", metavar="REPORT.json", help="also write every active message into a JSON report")
+    args = parser.parse_args()
+
+    messages = load_config(args.config)
+    polls = load_poll_file(args.poll) if args.poll else None
+    active = schedule(messages, polls, args.poll_interval, args.passive_interval)
+    utilization = analyze(active)
+    print(f"Loaded {len(messages)} messages from {args.config}")
+    print_report(active, utilization, args.top)
+
+    if args.json:
+        report = {'utilization': utilization, 'messages': [
+            {k: (v.hex() if isinstance(v, bytes) else v) for k, v in m.items()} for m in active]}
+        with open(args.json, 'w') as f:
+            json.dump(report, f, indent=1)
+        print(f"  -> Wrote {args.json}")
+
+    failures = []
+    if utilization > args.max_utilization:
+        failures.append(f"utilization {utilization * 100:.1f}% > {args.max_utilization * 100:.1f}%")
+    if args.max_latency is not None:
+        slow = [m for m in active if m['worst_latency'] > args.max_latency]
+        if slow:
+            failures.append(f"{len(slow)} message(s) above {args.max_latency:g} s worst-case latency")
+    if failures:
+        print(f"\nREJECTED: {'; '.join(failures)}")
+        sys.exit(2)
+    print("\nOK: the bus can carry this configuration.")
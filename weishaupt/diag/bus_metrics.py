@@ -0,0 +1,165 @@
+import re
+import bisect
+import threading
+import time
+
+DEFAULT_METRICS_HOST = "127.0.0.1"
+DEFAULT_METRICS_PORT = 8891
+# A bus transaction at 2400 baud takes roughly 30-300 ms, retries and
+# arbitration losses push it into seconds
+LATENCY_BUCKETS = (0.025, 0.05, 0.1, 0.15, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# ebusd error answers -> error kind
+ERROR_KINDS = [
+    (re.compile(r'CRC', re.IGNORECASE), "crc"),
+    (re.compile(r'timeout|timed out|no answer', re.IGNORECASE), "timeout"),
+    (re.compile(r'NAK|ACK', re.IGNORECASE), "nak"),
+    (re.compile(r'arbitration|SYN', re.IGNORECASE), "arbitration"),
+]
+READ_TARGET = re.compile(r'(?:^|\s)-(?:c|d)\s+(\S+)')
+
+def classify_error(line):
+    for pattern, kind in ERROR_KINDS:
+        if pattern.search(line):
+            return kind
+    return "other"
+
+def command_labels(command):
+    """
+    (message, address) labels of an ebusd command: "read -c bc1 TA_FILTER"
+    -> ("TA_FILTER", "bc1"), "hex 08500003..." -> ("5000", "08").
+    """
+    parts = command.split()
+    if not parts:
+        return "", ""
+    if parts[0] == "hex" and len(parts) > 1 and len(parts[1]) >= 6:
+        return parts[1][2:6].upper(), parts[1][:2].lower()
+    if parts[0] in ("read", "write"):
+        m = READ_TARGET.search(command)
+        names = [p for p in parts[1:] if not p.startswith('-')]
+        target = m.group(1) if m else ""
+        names = [p for p in names if p != target]
+        return (names[0] if names else ""), target
+    return parts[0], ""
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+def _format_labels(labels):
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in labels) + "}"
+
+class Metrics:
+    """
+    Counters and latency histograms kept in plain dicts keyed by
+    (name, labels), labels being a tuple of (key, value) pairs. Recording is
+    a dict lookup and an add, so it can stay on the hot path; everything
+    else (cumulative buckets, collectors, text format) happens in render().
+    """
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = tuple(buckets)
+        self.counters = {}
+        self.histograms = {}
+        self.help = {}
+        self.collectors = []
+
+    def describe(self, name, help_text):
+        self.help[name] = help_text
+
+    def inc(self, name, labels=(), value=1):
+        key = (name, labels)
+        self.counters[key] = self.counters.get(key, 0) + value
+
+    def observe(self, name, labels, seconds):
+        key = (name, labels)
+        hist = self.histograms.get(key)
+        if hist is None:
+            # One slot per bucket plus +Inf, then the sum
+            hist = self.histograms[key] = [0] * (len(self.buckets) + 1) + [0.0]
+        hist[bisect.bisect_left(self.buckets, seconds)] += 1
+        hist[-1] += seconds
+
+    def add_collector(self, func):
+        """
+        func() is called at scrape time and returns (name, type, labels,
+        value) samples with type "counter" or "gauge", e.g. for queue depths
+        or stats a component already keeps itself.
+        """
+        self.collectors.append(func)
+
+    def render(self):
+        families = {}
+        for (name, labels), value in list(self.counters.items()):
+            families.setdefault(name, ("counter", []))[1].append((name + "_total", labels, value))
+        for (name, labels), hist in list(self.histograms.items()):
+            samples = families.setdefault(name, ("histogram", []))[1]
+            total = 0
+            for bound, count in zip(self.buckets + (float("inf"),), hist[:-1]):
+                total += count
+                le = "+Inf" if bound == float("inf") else repr(bound)
+                samples.append((name + "_bucket", labels + (("le", le),), total))
+            samples.append((name + "_count", labels, total))
+            samples.append((name + "_sum", labels, hist[-1]))
+        for collector in self.collectors:
+            for name, kind, labels, value in collector():
+                sample = name + "_total" if kind == "counter" else name
+                families.setdefault(name, (kind, []))[1].append((sample, labels, value))
+
+        lines = []
+        for name in sorted(families):
+            kind, samples = families[name]
+            lines.append(f"# TYPE {name} {kind}")
+            if name in self.help:
+                lines.append(f"# HELP {name} {self.help[name]}")
+            for sample, labels, value in samples:
+                lines.append(f"{sample}{_format_labels(labels)} {value}")
+        lines.append("# EOF")
+        return "\n".join(lines) + "\n"
+
+METRICS = Metrics()
+METRICS.describe("ebus_request_duration_seconds", "ebusd request latency by message")
+METRICS.describe("ebus_device_request_duration_seconds", "ebusd request latency by device address")
+METRICS.describe("ebus_errors", "failed ebusd requests by error kind (crc, timeout, nak, arbitration, other)")
+METRICS.describe("ebus_retries", "requests repeated after a failed attempt")
+
+def record_request(command, started, lines=None, error_kind=None, metrics=METRICS):
+    """
+    Records one finished ebusd command: latency per message and per
+    device, and the error kind if the answer is an ERR line.
+    """
+    elapsed = time.perf_counter() - started
+    message, address = command_labels(command)
+    metrics.observe("ebus_request_duration_seconds", (("message", message),), elapsed)
+    metrics.observe("ebus_device_request_duration_seconds", (("address", address),), elapsed)
+    if error_kind is None and lines is not None and (not lines or lines[0].startswith("ERR")):
+        error_kind = classify_error(lines[0] if lines else "no answer")
+    if error_kind:
+        metrics.inc("ebus_errors", (("kind", error_kind), ("message", message), ("address", address)))
+
+def serve_metrics(host=DEFAULT_METRICS_HOST, port=DEFAULT_METRICS_PORT, metrics=METRICS):
+    """
+    Serves GET /metrics in the OpenMetrics text format from a daemon
+    thread. Returns the server, call shutdown() to stop it.
+    """
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    class MetricsHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split('?')[0] != "/metrics":
+                self.send_error(404)
+                return
+            body = metrics.render().encode('utf-8')
+            self.send_response(200)
+            self.send_header("Content-Type", "application/openmetrics-text; version=1.0.0; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer((host, port), MetricsHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    print(f"Metrics on http://{host}:{port}/metrics")
+    return server
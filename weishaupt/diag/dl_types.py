@@ -0,0 +1,81 @@
+import os
+import re
+
+DL_INI = os.path.join(os.path.dirname(os.path.abspath(__file__)), "DL.Ini")
+
+# DL.Ini DataTyp -> ebusd template type. Bits are handled as BI{pos}.
+# The XC886 firmware is built with Keil C51, which stores ints big-endian
+# (high byte at the lower address), hence UIR/SIR rather than UIN/SIN.
+DATATYP_TEMPLATES = {
+    "UChar": "UCH", "UCHAR": "UCH", "UMask": "UCH", "UMASK": "UCH",
+    "SChar": "SCH",
+    "UInt": "UIR", "U2Byte": "UIR",
+    "SInt": "SIR", "S2Byte": "SIR",
+}
+TEMPLATE_SIZES = {"UCH": 1, "SCH": 1, "UIR": 2, "SIR": 2}
+# Single byte fallback when the .SYC layout leaves no room for a 16-bit value
+NARROW_TEMPLATES = {"UIR": "UCH", "SIR": "SCH"}
+# Struct member suffixes as used in DL.Ini (WBV_NFS_st.tvl_soll_eff_s16, ..._u8)
+NAME_SUFFIX_TEMPLATES = [
+    (re.compile(r'_s16$', re.IGNORECASE), "SIR"),
+    (re.compile(r'_un?16$', re.IGNORECASE), "UIR"),
+    (re.compile(r'_s8$', re.IGNORECASE), "SCH"),
+]
+DL_ENTRY = re.compile(r'^(VarName|DataTyp)(\d+)=(.*)$')
+
+def load_dl_types(ini_path=DL_INI):
+    """
+    Reads the VarNameN/DataTypN pairs of all DL.Ini sections and returns
+    {symbol name: template type}. Numeric VarNames (0902 register numbers)
+    and bits are skipped; the first section naming a symbol wins.
+    """
+    types = {}
+    if not os.path.exists(ini_path):
+        return types
+    entries = {}
+    with open(ini_path, 'r', encoding='latin-1') as f:
+        for line in f:
+            line = line.strip()
+            if line.startswith('['):
+                entries = {}
+                continue
+            m = DL_ENTRY.match(line)
+            if not m:
+                continue
+            entry = entries.setdefault(m.group(2), {})
+            entry[m.group(1)] = m.group(3).strip()
+            name = entry.get('VarName')
+            template = DATATYP_TEMPLATES.get(entry.get('DataTyp'))
+            if name and template and not name.isdigit():
+                types.setdefault(name, template)
+    return types
+
+def bit_parent_cell(bit_address):
+    # 8051 bit addressing: 0x00-0x7F live in RAM 0x20-0x2F, the rest in the
+    # bit-addressable SFRs (addresses divisible by 8)
+    if bit_address < 0x80:
+        return ("RAM", 0x20 + bit_address // 8)
+    return ("SFR", bit_address & 0xF8)
+
+def assign_symbol_types(raw_registers, dl_types, raw_bits=()):
+    """
+    Sets 'type' and 'size' on every register dict of extract_syc_symbols().
+    The type comes from DL.Ini, else from the name suffix, else UCH. A 16-bit
+    type is only kept if the .SYC layout agrees: the second (low) byte must
+    not be another symbol or the parent byte of a bit, and must stay in the
+    same 256 byte page. Bit parents missing from raw_registers are taken
+    from raw_bits.
+    """
+    named_cells = {(reg['section'], reg['address']) for reg in raw_registers}
+    named_cells.update(bit_parent_cell(bit['address']) for bit in raw_bits)
+    for reg in raw_registers:
+        template = dl_types.get(reg['name'])
+        if template is None:
+            template = next((t for pattern, t in NAME_SUFFIX_TEMPLATES if pattern.search(reg['name'])), "UCH")
+        if TEMPLATE_SIZES[template] == 2:
+            low = reg['address'] + 1
+            if (reg['section'], low) in named_cells or (low >> 8) != (reg['address'] >> 8):
+                template = NARROW_TEMPLATES[template]
+        reg['type'] = template
+        reg['size'] = TEMPLATE_SIZES[template]
+    return raw_registers
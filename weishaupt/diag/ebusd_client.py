@@ -0,0 +1,39 @@
+import time
+import socket
+
+from bus_metrics import record_request
+
+DEFAULT_EBUSD_HOST = "localhost"
+DEFAULT_EBUSD_PORT = 8888
+
+def send_command(command, host=DEFAULT_EBUSD_HOST, port=DEFAULT_EBUSD_PORT, timeout=10):
+    """
+    Sends one command to the ebusd command port (the same port FHEM's ECMD
+    telnet device and ebusctl use) and returns the answer lines.
+
+    ebusd terminates every answer with an empty line.
+    """
+    started = time.perf_counter()
+    try:
+        with socket.create_connection((host, port), timeout=timeout) as sock:
+            sock.sendall(command.strip().encode('utf-8') + b"\n")
+            buf = b""
+            while b"\n\n" not in buf:
+                chunk = sock.recv(4096)
+                if not chunk:
+                    break
+                buf += chunk
+    except socket.timeout:
+        record_request(command, started, error_kind="timeout")
+        raise
+    except OSError:
+        # Refused or reset connections still count as failed requests
+        record_request(command, started, error_kind="other")
+        raise
+    answer = buf.split(b"\n\n", 1)[0].decode('utf-8', errors='replace')
+    lines = [line for line in answer.split("\n") if line]
+    record_request(command, started, lines)
+    return lines
+
+def is_error(lines):
+    return not lines or lines[0].startswith("ERR:")
@@ -0,0 +1,86 @@
+import os
+import re
+import csv
+import glob
+
+CONFIG_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Device CSVs are named ZZ..circuit.csv, e.g. 08..bc1.csv
+DEVICE_FILE = re.compile(r'^([0-9a-fA-F]{2})\.\.(.+)\.csv$')
+# Firmware symbol includes generated from the .SYC tables: WH11928.inc, 0011366.inc
+FIRMWARE_STEM = r'(WH\d{5}|\d{7})'
+FIRMWARE_INCLUDE = re.compile(rf'^{FIRMWARE_STEM}\.inc$', re.IGNORECASE)
+
+def circuit_of(device_csv):
+    # 08..bc1.csv -> bc1
+    return os.path.splitext(os.path.basename(device_csv))[0].split('.')[-1]
+
+def device_files(config_dir=CONFIG_DIR):
+    """
+    Returns (path, zz, circuit) for every device CSV of a config dir.
+    """
+    devices = []
+    for path in sorted(glob.glob(os.path.join(config_dir, "*..*.csv"))):
+        m = DEVICE_FILE.match(os.path.basename(path))
+        if m:
+            devices.append((path, int(m.group(1), 16), m.group(2)))
+    return devices
+
+def is_firmware_include(include):
+    return FIRMWARE_INCLUDE.match(os.path.basename(include)) is not None
+
+def firmware_includes(device_csv):
+    """
+    Names of the firmware symbol includes a device CSV pulls in directly.
+    """
+    includes = []
+    with open(device_csv, 'r', encoding='utf-8', errors='ignore') as f:
+        for row in csv.reader(f):
+            if row and row[0].strip().startswith('!include') and len(row) > 1 and is_firmware_include(row[1].strip()):
+                includes.append(row[1].strip())
+    return includes
+
+def read_messages(path, firmware=True, seen_files=None):
+    """
+    Walks an ebusd CSV and its !include files depth first and yields one
+    dict per message row, with the '*' default row of its file applied:
+    kind (r, w, u, b ... without the poll priority), priority, name, qq, zz,
+    pbsb and id as stripped hex strings, the file and the raw row.
+    firmware=False skips the firmware symbol includes (WH11928.inc ...).
+    """
+    if seen_files is None:
+        seen_files = set()
+    if path in seen_files or not os.path.exists(path):
+        return
+    seen_files.add(path)
+    defaults = {}
+    with open(path, 'r', encoding='utf-8', errors='ignore') as f:
+        rows = list(csv.reader(f))
+    for row in rows:
+        if not row:
+            continue
+        kind = row[0].strip()
+        if kind.startswith('!include') and len(row) > 1:
+            include = row[1].strip()
+            if firmware or not is_firmware_include(include):
+                yield from read_messages(os.path.join(os.path.dirname(path), include), firmware, seen_files)
+            continue
+        if not kind or kind[0] == '#' or len(row) < 8:
+            continue
+        cols = [c.strip().strip('"') for c in row[:8]]
+        if kind[0] == '*':
+            defaults[kind[1:]] = cols
+            continue
+        base = kind.rstrip('123456789')
+        default = defaults.get(base, [''] * 8)
+        yield {
+            'kind': base,
+            'priority': int(kind[len(base):]) if kind[len(base):] else None,
+            'name': cols[2],
+            'qq': cols[4] or default[4],
+            'zz': cols[5] or default[5],
+            'pbsb': (cols[6] or default[6]).upper(),
+            'id': default[7] + cols[7],
+            'path': path,
+            'row': row,
+        }
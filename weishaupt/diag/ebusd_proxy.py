@@ -0,0 +1,328 @@
+import time
+import shlex
+import asyncio
+import argparse
+
+from ebusd_client import DEFAULT_EBUSD_HOST, DEFAULT_EBUSD_PORT
+from bus_metrics import METRICS, DEFAULT_METRICS_HOST, record_request, serve_metrics
+from ebusd_config import CONFIG_DIR, device_files, read_messages
+from register_requests import READ_PBSB, parse_elements
+
+DEFAULT_PROXY_PORT = 8889
+
+# Seconds an answer stays valid, by register section of the message
+DEFAULT_TTLS = {
+    "Konstanten": 3600.0,
+    "SFR": 5.0,
+    "RAM": 2.0,
+    "External RAM (XRAM)": 5.0,
+    None: 10.0,
+}
+MAX_CACHE_ENTRIES = 10000
+# Longest wait for an ebusd answer; a bus read normally takes well under a second
+DEFAULT_UPSTREAM_TIMEOUT = 10.0
+
+def section_of_id(id_hex):
+    """
+    Register section of a 5000 read message from its ID (CRC + elements).
+    """
+    runs = parse_elements(id_hex)
+    return runs[0][0] if runs else None
+
+def load_message_sections(config_dir=CONFIG_DIR):
+    """
+    Walks the device CSVs of the ebusd config tree and their includes and
+    maps every read message that goes through PBSB 5000 to its register
+    section: {(circuit, name): section}.
+    """
+    sections = {}
+    for path, _, circuit in device_files(config_dir):
+        for msg in read_messages(path):
+            if msg['kind'] == 'r' and msg['pbsb'] == READ_PBSB:
+                section = section_of_id(msg['id'])
+                if section:
+                    sections.setdefault((circuit, msg['name']), section)
+    return sections
+
+def parse_read_command(command):
+    """
+    Returns (cache key, circuit, message name, force flag) for an ebusd read
+    command, or None if the command is not a cacheable read. The key is the
+    command without -f, so a forced read refreshes the plain entry.
+    """
+    try:
+        parts = shlex.split(command)
+    except ValueError:
+        return None
+    if not parts or parts[0] != "read":
+        return None
+    force = False
+    circuit = None
+    args = []
+    key = ["read"]
+    i = 1
+    while i < len(parts):
+        part = parts[i]
+        if part == "-f":
+            force = True
+        elif part in ("-c", "-m", "-s", "-d", "-p", "-i"):
+            if part == "-c" and i + 1 < len(parts):
+                circuit = parts[i + 1]
+            key += parts[i:i + 2]
+            i += 1
+        elif part in ("-h", "-def"):
+            return None
+        else:
+            key.append(part)
+            if not part.startswith("-"):
+                args.append(part)
+        i += 1
+    if not args:
+        return None
+    return " ".join(key), circuit, args[0], force
+
+class EbusdProxy:
+    """
+    Sits between many clients and the ebusd command port. Identical reads
+    that are in flight at the same time share one upstream request, and
+    answers are cached for the TTL of the message's register section.
+    """
+    def __init__(self, upstream_host=DEFAULT_EBUSD_HOST, upstream_port=DEFAULT_EBUSD_PORT,
+                 message_sections=None, ttls=None, pool_size=2, upstream_timeout=DEFAULT_UPSTREAM_TIMEOUT,
+                 max_cache_entries=MAX_CACHE_ENTRIES):
+        self.upstream_host = upstream_host
+        self.upstream_port = upstream_port
+        self.message_sections = message_sections or {}
+        # Reads without -c go to whichever circuit ebusd finds first; only
+        # names that have the same section in every circuit get its TTL
+        by_name = {}
+        for (_, name), section in self.message_sections.items():
+            by_name.setdefault(name, set()).add(section)
+        self.name_sections = {name: sections.pop() for name, sections in by_name.items() if len(sections) == 1}
+        self.upstream_timeout = upstream_timeout
+        self.ttls = dict(DEFAULT_TTLS)
+        if ttls:
+            self.ttls.update(ttls)
+        self.pool_size = pool_size
+        self.max_cache_entries = max_cache_entries
+        # key -> (expiry, lines), oldest entry first
+        self.cache = {}
+        self.inflight = {}
+        self.pool = None
+        self.waiting = 0
+        self.stats = {'hits': 0, 'misses': 0, 'coalesced': 0, 'passthrough': 0,
+                      'upstream_errors': 0, 'clients': 0}
+        METRICS.add_collector(self.metric_samples)
+
+    async def _connect(self):
+        return await asyncio.open_connection(self.upstream_host, self.upstream_port)
+
+    async def _ensure_pool(self):
+        if self.pool is None:
+            self.pool = asyncio.Queue()
+            for _ in range(self.pool_size):
+                self.pool.put_nowait(None)
+
+    async def execute(self, command):
+        """
+        Runs one command on a pooled upstream connection and returns the
+        answer lines (without the terminating empty line).
+        """
+        await self._ensure_pool()
+        self.waiting += 1
+        try:
+            conn = await self.pool.get()
+        finally:
+            self.waiting -= 1
+        started = time.perf_counter()
+        try:
+            for attempt in range(2):
+                if attempt:
+                    METRICS.inc("ebus_retries", (("tool", "proxy"),))
+                try:
+                    if conn is None:
+                        conn = await asyncio.wait_for(self._connect(), self.upstream_timeout)
+                    reader, writer = conn
+                    writer.write(command.encode('utf-8') + b"\n")
+                    await writer.drain()
+                    lines = []
+                    while True:
+                        line = await asyncio.wait_for(reader.readline(), self.upstream_timeout)
+                        if not line:
+                            raise ConnectionError("ebusd closed the connection")
+                        line = line.decode('utf-8', errors='replace').rstrip("\r\n")
+                        if line == "":
+                            record_request(command, started, lines)
+                            return lines
+                        lines.append(line)
+                except asyncio.CancelledError:
+                    # The answer may still arrive; never hand this connection out again
+                    if conn is not None:
+                        conn[1].close()
+                    conn = None
+                    raise
+                except asyncio.TimeoutError:
+                    # A late answer would end up in front of the next command
+                    if conn is not None:
+                        conn[1].close()
+                    conn = None
+                    self.stats['upstream_errors'] += 1
+                    record_request(command, started, error_kind="timeout")
+                    return [f"ERR: no answer from ebusd within {self.upstream_timeout:g} s"]
+                except (OSError, ConnectionError):
+                    if conn is not None:
+                        conn[1].close()
+                    conn = None
+                    if attempt:
+                        self.stats['upstream_errors'] += 1
+                        record_request(command, started, error_kind="upstream")
+                        return ["ERR: ebusd not reachable"]
+        finally:
+            self.pool.put_nowait(conn)
+
+    def ttl_for(self, circuit, name):
+        if circuit is None:
+            section = self.name_sections.get(name)
+        else:
+            section = self.message_sections.get((circuit, name))
+        return self.ttls.get(section, self.ttls[None])
+
+    async def read(self, command, key, circuit, name, force):
+        now = time.monotonic()
+
+        if not force:
+            cached = self.cache.get(key)
+            if cached and cached[0] > now:
+                self.stats['hits'] += 1
+                return cached[1]
+
+        pending = self.inflight.get(key)
+        if pending is not None:
+            self.stats['coalesced'] += 1
+            try:
+                return await asyncio.shield(pending)
+            except Exception as e:
+                # Whatever failed the leading request (see below)
+                return [f"ERR: {e}"]
+
+        self.stats['misses'] += 1
+        future = asyncio.get_running_loop().create_future()
+        # Marks the exception as retrieved when nobody was waiting for it
+        future.add_done_callback(lambda f: f.cancelled() or f.exception())
+        self.inflight[key] = future
+        try:
+            lines = await self.execute(command)
+            if lines and not lines[0].startswith("ERR"):
+                self.cache.pop(key, None)
+                if len(self.cache) >= self.max_cache_entries:
+                    self.cache = {k: v for k, v in self.cache.items() if v[0] > now}
+                    # Still full of long-lived entries: drop the oldest ones
+                    for old in list(self.cache)[:len(self.cache) - self.max_cache_entries + 1]:
+                        del self.cache[old]
+                self.cache[key] = (time.monotonic() + self.ttl_for(circuit, name), lines)
+            future.set_result(lines)
+            return lines
+        except BaseException as e:
+            # Coalesced waiters must not hang when the leading client goes
+            # away (cancelled) or the upstream request fails
+            if isinstance(e, Exception):
+                future.set_exception(e)
+            else:
+                future.set_exception(ConnectionError("upstream request was cancelled"))
+            raise
+        finally:
+            del self.inflight[key]
+
+    def metric_samples(self):
+        lookups = self.stats['hits'] + self.stats['misses'] + self.stats['coalesced']
+        ratio = (self.stats['hits'] + self.stats['coalesced']) / lookups if lookups else 0.0
+        samples = [("ebus_proxy_cache_requests", "counter", (("result", result),), self.stats[result])
+                   for result in ('hits', 'misses', 'coalesced', 'passthrough')]
+        samples += [
+            ("ebus_proxy_upstream_errors", "counter", (), self.stats['upstream_errors']),
+            ("ebus_proxy_cache_hit_ratio", "gauge", (), ratio),
+            ("ebus_proxy_cache_entries", "gauge", (), len(self.cache)),
+            ("ebus_proxy_clients", "gauge", (), self.stats['clients']),
+            ("ebus_proxy_queue_depth", "gauge", (("queue", "inflight"),), len(self.inflight)),
+            ("ebus_proxy_queue_depth", "gauge", (("queue", "upstream_wait"),), self.waiting),
+        ]
+        return samples
+
+    def stats_lines(self):
+        lookups = self.stats['hits'] + self.stats['misses'] + self.stats['coalesced']
+        ratio = (self.stats['hits'] + self.stats['coalesced']) / lookups if lookups else 0.0
+        lines = [f"{k}={v}" for k, v in self.stats.items()]
+        lines.append(f"cached={len(self.cache)}")
+        lines.append(f"hit_ratio={ratio:.3f}")
+        return lines
+
+    async def handle_client(self, reader, writer):
+        self.stats['clients'] += 1
+        try:
+            while True:
+                raw = await reader.readline()
+                if not raw:
+                    break
+                command = raw.decode('utf-8', errors='replace').strip()
+                if not command:
+                    continue
+                if command in ("quit", "exit"):
+                    break
+
+                if command == "proxystats":
+                    lines = self.stats_lines()
+                elif command.split()[0] == "listen":
+                    lines = ["ERR: listen is not supported through the proxy, connect to ebusd directly"]
+                else:
+                    parsed = parse_read_command(command)
+                    if parsed:
+                        lines = await self.read(command, *parsed)
+                    else:
+                        self.stats['passthrough'] += 1
+                        lines = await self.execute(command)
+
+                writer.write(("\n".join(lines) + "\n\n").encode('utf-8'))
+                await writer.drain()
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            self.stats['clients'] -= 1
+            writer.close()
+
+    async def serve(self, host="127.0.0.1", port=DEFAULT_PROXY_PORT):
+        server = await asyncio.start_server(self.handle_client, host, port)
+        print(f"ebusd proxy on {host}:{port} -> {self.upstream_host}:{self.upstream_port} "
+              f"({len(self.message_sections)} messages with section TTLs)")
+        async with server:
+            await server.serve_forever()
+
+def parse_ttl_overrides(values):
+    ttls = {}
+    for item in values or []:
+        section, seconds = item.split('=', 1)
+        ttls[None if section == "default" else section] = float(seconds)
+    return ttls
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Coalescing, TTL-caching proxy for the ebusd command port.")
+    parser.add_argument("--listen-host", default="127.0.0.1")
+    parser.add_argument("--listen-port", type=int, default=DEFAULT_PROXY_PORT)
+    parser.add_argument("--host", default=DEFAULT_EBUSD_HOST, help="ebusd host")
+    parser.add_argument("--port", type=int, default=DEFAULT_EBUSD_PORT, help="ebusd command port")
+    parser.add_argument("--config", default=CONFIG_DIR, help="ebusd config dir used for the message sections")
+    parser.add_argument("--pool", type=int, default=2, help="upstream connections (default: 2)")
+    parser.add_argument("--ttl", nargs='*', metavar="SECTION=SECONDS",
+                        help="override TTLs, e.g. RAM=1 Konstanten=86400 default=30")
+    parser.add_argument("--upstream-timeout", type=float, default=DEFAULT_UPSTREAM_TIMEOUT,
+                        help=f"seconds to wait for an ebusd answer (default: {DEFAULT_UPSTREAM_TIMEOUT:g})")
+    parser.add_argument("--metrics-port", type=int, help="serve OpenMetrics on this port (/metrics)")
+    args = parser.parse_args()
+
+    proxy = EbusdProxy(args.host, args.port, load_message_sections(args.config),
+                       parse_ttl_overrides(args.ttl), args.pool, args.upstream_timeout)
+    if args.metrics_port:
+        serve_metrics(DEFAULT_METRICS_HOST, args.metrics_port)
+    try:
+        asyncio.run(proxy.serve(args.listen_host, args.listen_port))
+    except KeyboardInterrupt:
+        pass
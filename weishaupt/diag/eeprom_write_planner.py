@@ -0,0 +1,204 @@
+import sys
+import csv
+import json
+import argparse
+
+from ebusd_client import send_command, is_error, DEFAULT_EBUSD_HOST, DEFAULT_EBUSD_PORT
+from register_requests import (READ_PBSB, WRITE_PBSB, MAX_MASTER_BYTES, element_bytes, coalesce_cells,
+                               pack_read_requests, read_request_hex, write_request_hex, ebusd_hex_command,
+                               decode_read_response)
+
+SECTION = "Konstanten"
+
+def parse_konstanten_id(id_hex):
+    """
+    Decodes a single-element Konstanten message ID ("ba0202", "060102yy",
+    "8a0225" ...) into (address, byte count). Returns None for anything else.
+    """
+    try:
+        data = bytes.fromhex(id_hex.strip().strip('"'))
+    except ValueError:
+        return None
+    body = data[1:]
+    page = 0
+    if len(body) == 4 and body[0] == 0x06:
+        page = body[1]
+        body = body[2:]
+    if len(body) != 2 or (body[0] & 0x0F) != 0x02:
+        return None
+    return (page << 8) | body[1], (body[0] >> 4) + 1
+
+def load_eeprom_catalog(inc_paths):
+    """
+    Collects name -> (address, byte count) for every single-element
+    Konstanten read message in the given includes, e.g. wtc.eeprom.inc or a
+    generated WH11928.inc.
+    """
+    catalog = {}
+    for path in inc_paths:
+        with open(path, 'r', encoding='utf-8', errors='ignore') as f:
+            for row in csv.reader(f):
+                if len(row) < 8 or row[0].strip() != 'r':
+                    continue
+                cell = parse_konstanten_id(row[7])
+                if cell is not None:
+                    catalog.setdefault(row[2].strip(), cell)
+    return catalog
+
+def expand_desired(desired, catalog):
+    """
+    Turns {name: value} into {address: byte}. Multi-byte parameters take a
+    list of bytes or an int that is split big-endian like the Keil C51 ints
+    of the firmware; negative ints are stored as two's complement.
+    """
+    if not isinstance(desired, dict):
+        raise ValueError("Desired parameters must be a JSON object {name: value}")
+    cells = {}
+    for name, value in desired.items():
+        if name not in catalog:
+            raise KeyError(f"Unknown EEPROM parameter '{name}'")
+        address, count = catalog[name]
+        if isinstance(value, list):
+            if not all(isinstance(b, int) and 0 <= b <= 0xFF for b in value):
+                raise ValueError(f"{name}: byte list {value} has entries outside 0..255")
+            raw = bytes(value)
+        else:
+            value = int(value)
+            low, high = -(1 << (8 * count - 1)), (1 << (8 * count)) - 1
+            if not low <= value <= high:
+                raise OverflowError(f"{name} takes {count} byte(s), {value} is outside {low}..{high}")
+            raw = value.to_bytes(count, byteorder='big', signed=value < 0)
+        if len(raw) != count:
+            raise ValueError(f"{name} takes {count} byte(s), got {len(raw)}")
+        for i, b in enumerate(raw):
+            cells[address + i] = b
+    return cells
+
+def diff_cells(desired_cells, current_cells):
+    return {addr: value for addr, value in desired_cells.items() if current_cells.get(addr) != value}
+
+def plan_writes(changed, max_master=MAX_MASTER_BYTES, chain=False, merge=False):
+    """
+    Turns changed cells into write requests, by default one single-byte
+    element per telegram like the generated `w` lines. merge=True lets
+    adjacent cells share one element (count nibble); chain=True lets several
+    elements share one telegram as long as CRC + elements + skip byte + data
+    fit into max_master bytes. Neither layout is verified on a controller yet.
+    Returns a list of (runs, payload_hex).
+    """
+    if not merge:
+        runs = [(SECTION, address, 1) for address in sorted(changed)]
+    else:
+        runs = []
+        for section, start, count in coalesce_cells([(SECTION, a) for a in changed], max_run=16):
+            # Split runs that would not fit into a single telegram on their own
+            while count:
+                room = max_master - 2 - len(element_bytes(section, start))
+                step = min(count, room)
+                runs.append((section, start, step))
+                start += step
+                count -= step
+
+    requests = []
+    current = []
+    size = 2
+    for run in runs:
+        run_size = len(element_bytes(*run)) + run[2]
+        if current and (not chain or size + run_size > max_master):
+            requests.append(current)
+            current = []
+            size = 2
+        current.append(run)
+        size += run_size
+    if current:
+        requests.append(current)
+
+    planned = []
+    for req in requests:
+        data = bytes(changed[start + i] for _, start, count in req for i in range(count))
+        planned.append((req, write_request_hex(req, data)))
+    return planned
+
+def plan_reads(addresses):
+    runs = coalesce_cells([(SECTION, a) for a in addresses])
+    return [(req, read_request_hex(req)) for req in pack_read_requests(runs)]
+
+def execute_reads(zz, read_plan, host, port):
+    values = {}
+    for runs, payload in read_plan:
+        lines = send_command(ebusd_hex_command(zz, READ_PBSB, payload), host, port)
+        if is_error(lines):
+            raise IOError(f"Read {payload} failed: {' '.join(lines) or 'no answer'}")
+        for (_, address), value in decode_read_response(runs, lines[0]).items():
+            values[address] = value
+    return values
+
+def load_cells_json(path):
+    with open(path, 'r') as f:
+        raw = json.load(f)
+    return {int(k, 0): int(v) for k, v in raw.items()}
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Plan (and optionally run) the minimal set of EEPROM writes for a parameter set.")
+    parser.add_argument("--catalog", nargs='+', default=["../wtc.eeprom.inc"],
+                        help="includes with the Konstanten messages (default: ../wtc.eeprom.inc)")
+    parser.add_argument("--desired", required=True, help="JSON file {parameter name: value}")
+    parser.add_argument("--current", help="JSON file {\"0x0203\": value} with a bulk read of the EEPROM")
+    parser.add_argument("--zz", default="08", help="target slave address (default: 08, bc1)")
+    parser.add_argument("--chain", action="store_true",
+                        help="chain several elements per write telegram (planning only, not verified on hardware)")
+    parser.add_argument("--merge", action="store_true",
+                        help="write adjacent cells as one multi-byte element (planning only, not verified on hardware)")
+    parser.add_argument("--execute", action="store_true", help="send the writes through ebusd and verify them")
+    parser.add_argument("--host", default=DEFAULT_EBUSD_HOST)
+    parser.add_argument("--port", type=int, default=DEFAULT_EBUSD_PORT)
+    args = parser.parse_args()
+
+    for flag in ("chain", "merge"):
+        if getattr(args, flag) and args.execute:
+            print(f"Error: --{flag} cannot be combined with --execute until that write layout is verified "
+                  f"on a controller.")
+            sys.exit(1)
+
+    try:
+        catalog = load_eeprom_catalog(args.catalog)
+        with open(args.desired, 'r') as f:
+            desired_cells = expand_desired(json.load(f), catalog)
+
+        if args.current:
+            current_cells = load_cells_json(args.current)
+        elif args.execute:
+            current_cells = execute_reads(args.zz, plan_reads(desired_cells), args.host, args.port)
+        else:
+            print("Error: --current is required unless --execute reads the EEPROM from the bus.")
+            sys.exit(1)
+
+        changed = diff_cells(desired_cells, current_cells)
+        write_plan = plan_writes(changed, chain=args.chain, merge=args.merge)
+        verify_plan = plan_reads(changed)
+
+        print(f"{len(desired_cells)} cells requested, {len(changed)} differ -> "
+              f"{len(write_plan)} write telegram(s), {len(verify_plan)} read-back telegram(s)")
+        for runs, payload in write_plan:
+            print(f"  W {ebusd_hex_command(args.zz, WRITE_PBSB, payload)}")
+        for runs, payload in verify_plan:
+            print(f"  R {ebusd_hex_command(args.zz, READ_PBSB, payload)}")
+
+        if args.execute and changed:
+            for runs, payload in write_plan:
+                lines = send_command(ebusd_hex_command(args.zz, WRITE_PBSB, payload), args.host, args.port)
+                if is_error(lines):
+                    raise IOError(f"Write {payload} failed: {' '.join(lines) or 'no answer'}")
+            readback = execute_reads(args.zz, verify_plan, args.host, args.port)
+            mismatches = {a: v for a, v in changed.items() if readback.get(a) != v}
+            if mismatches:
+                for address, value in sorted(mismatches.items()):
+                    print(f"  !! 0x{address:04X}: wrote {value}, read back {readback.get(address)}")
+                sys.exit(2)
+            print("  -> All writes verified.")
+    except KeyError as e:
+        print(f"Error: {e.args[0]}")
+        sys.exit(1)
+    except (IOError, ValueError, OverflowError) as e:
+        print(f"Error: {e}")
+        sys.exit(1)
@@ -0,0 +1,162 @@
+import os
+import sys
+import json
+import time
+import argparse
+
+from ebusd_client import DEFAULT_EBUSD_HOST, DEFAULT_EBUSD_PORT
+from eeprom_write_planner import execute_reads
+from register_requests import coalesce_cells, pack_read_requests, read_request_hex
+
+DIAG_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_STATE_FILE = os.path.join(DIAG_DIR, "error_history_state.json")
+
+# Fault history in the controller EEPROM (Konstanten page 2), see the
+# ErrorHistory*/EEA_F_HIST_* messages in wtc.eeprom.inc:
+#   0x0200  EEA_F_HIST_PTR   u16, slot the next fault is written to
+#   0x0202  EEA_F_HIST_ANF1  8 bytes per slot, 6 slots (ring buffer)
+# A slot is ErrorCode (bits 0-6) / ErrorType (bit 7, 1 = warning),
+# OperatingPhase, LoadSetting, PwmPumpSpeed, BoilerTemp, FlueGasTemp,
+# IonisationSignal, ReturnTemp.
+SECTION = "Konstanten"
+HIST_PTR = 0x0200
+HIST_START = 0x0202
+SLOT_SIZE = 8
+SLOT_COUNT = 6
+
+def slot_address(slot):
+    return HIST_START + (slot % SLOT_COUNT) * SLOT_SIZE
+
+def pointer_slot(value):
+    """
+    EEA_F_HIST_PTR holds either the EEPROM address of the next slot or its
+    index, depending on the firmware. Returns the slot index.
+    """
+    if HIST_START <= value < HIST_START + SLOT_COUNT * SLOT_SIZE:
+        return (value - HIST_START) // SLOT_SIZE
+    if value < SLOT_COUNT:
+        return value
+    raise ValueError(f"Fault history pointer 0x{value:04X} is outside the history table")
+
+def plan_reads(cells):
+    runs = coalesce_cells([(SECTION, a) for a in cells])
+    return [(req, read_request_hex(req)) for req in pack_read_requests(runs)]
+
+def slot_cells(slots):
+    return [slot_address(s) + i for s in slots for i in range(SLOT_SIZE)]
+
+def pointer_cells():
+    return [HIST_PTR, HIST_PTR + 1]
+
+def slot_bytes(values, slot):
+    return bytes(values[slot_address(slot) + i] for i in range(SLOT_SIZE))
+
+def decode_entry(raw):
+    if raw in (bytes(SLOT_SIZE), b"\xff" * SLOT_SIZE):
+        return None
+    signed = lambda b: b - 256 if b > 127 else b
+    return {
+        'code': f"{'W' if raw[0] & 0x80 else 'F'}{raw[0] & 0x7F}",
+        'phase': raw[1],
+        'load': raw[2],
+        'pwm_pump': raw[3],
+        'boiler_temp': signed(raw[4]),
+        'flue_gas_temp': signed(raw[5]),
+        'ionisation': raw[6],
+        'return_temp': signed(raw[7]),
+    }
+
+def collect(zz, state, read):
+    """
+    Returns the history entries written since the last call, oldest first,
+    and updates state[zz] (high-water mark and the last seen slot contents).
+    read(zz, plan) executes a read plan and returns {address: value}.
+
+    The steady-state poll is a single request: the pointer chained with the
+    slot the controller writes next. If the pointer did not move and that
+    slot is unchanged there is nothing to do; if it moved by one, that slot
+    already is the new entry. Only a burst of faults costs extra requests.
+    """
+    device = state.get(zz)
+    if device is None:
+        values = read(zz, plan_reads(pointer_cells() + slot_cells(range(SLOT_COUNT))))
+        pointer = pointer_slot(values[HIST_PTR] | values[HIST_PTR + 1] << 8)
+        slots = {s: slot_bytes(values, s) for s in range(SLOT_COUNT)}
+        # Everything already stored counts as new, oldest slot first
+        new_slots = [(pointer + i) % SLOT_COUNT for i in range(SLOT_COUNT)]
+    else:
+        mark = device['slot']
+        values = read(zz, plan_reads(pointer_cells() + slot_cells([mark])))
+        pointer = pointer_slot(values[HIST_PTR] | values[HIST_PTR + 1] << 8)
+        slots = {mark: slot_bytes(values, mark)}
+        count = (pointer - mark) % SLOT_COUNT
+        if count == 0 and slots[mark].hex() != device['slots'][mark]:
+            # The slot under the mark changed without the pointer moving: a
+            # full turn of the ring, or a fault written between slot and
+            # pointer update. Re-read pointer and table to tell them apart.
+            values = read(zz, plan_reads(pointer_cells() + slot_cells(range(SLOT_COUNT))))
+            pointer = pointer_slot(values[HIST_PTR] | values[HIST_PTR + 1] << 8)
+            slots = {s: slot_bytes(values, s) for s in range(SLOT_COUNT)}
+            count = (pointer - mark) % SLOT_COUNT or SLOT_COUNT
+        new_slots = [(mark + i) % SLOT_COUNT for i in range(count)]
+        missing = [s for s in new_slots if s not in slots]
+        if missing:
+            values = read(zz, plan_reads(slot_cells(missing)))
+            slots.update((s, slot_bytes(values, s)) for s in missing)
+
+    known = device['slots'] if device else [None] * SLOT_COUNT
+    for slot, raw in slots.items():
+        known[slot] = raw.hex()
+    state[zz] = {'slot': pointer, 'slots': known}
+
+    entries = []
+    for slot in new_slots:
+        entry = decode_entry(slots[slot])
+        if entry is not None:
+            entry['slot'] = slot
+            entries.append(entry)
+    return entries
+
+def load_state(path):
+    if not os.path.exists(path):
+        return {}
+    with open(path, 'r') as f:
+        return json.load(f)
+
+def save_state(path, state):
+    tmp = path + ".tmp"
+    with open(tmp, 'w') as f:
+        json.dump(state, f, indent=1)
+    os.replace(tmp, path)
+
+def format_entry(zz, entry):
+    return (f"{zz} slot {entry['slot']}: {entry['code']} phase 0x{entry['phase']:02X} load {entry['load']} "
+            f"boiler {entry['boiler_temp']}°C flue {entry['flue_gas_temp']}°C return {entry['return_temp']}°C "
+            f"ion {entry['ionisation']}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Read only the fault history entries added since the last poll.")
+    parser.add_argument("--zz", nargs='+', default=["08"], help="controller slave addresses (default: 08, bc1)")
+    parser.add_argument("--state", default=DEFAULT_STATE_FILE,
+                        help=f"high-water marks per device (default: {os.path.basename(DEFAULT_STATE_FILE)})")
+    parser.add_argument("--interval", type=float, help="keep polling every N seconds")
+    parser.add_argument("--json", action="store_true", help="print new entries as JSON lines")
+    parser.add_argument("--host", default=DEFAULT_EBUSD_HOST)
+    parser.add_argument("--port", type=int, default=DEFAULT_EBUSD_PORT)
+    args = parser.parse_args()
+
+    state = load_state(args.state)
+    read = lambda zz, plan: execute_reads(zz, plan, args.host, args.port)
+    while True:
+        for zz in args.zz:
+            try:
+                entries = collect(zz, state, read)
+            except (IOError, ValueError) as e:
+                print(f"Error: {zz}: {e}", file=sys.stderr)
+                continue
+            for entry in entries:
+                print(json.dumps(dict(entry, zz=zz)) if args.json else format_entry(zz, entry), flush=True)
+        save_state(args.state, state)
+        if args.interval is None:
+            break
+        time.sleep(args.interval)
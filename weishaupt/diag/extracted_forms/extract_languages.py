@@ -1,6 +1,6 @@
-import pefile
 import re
 import os
+import argparse
 
 # Standard Windows Language IDs (LCID)
 LANGUAGES = {
@@ -12,7 +12,10 @@ LANGUAGES = {
 def get_language_name(lang_id):
     return LANGUAGES.get(lang_id, f"LangID_{lang_id}")
 
-def extract_translations(exe_path):
+def extract_translations(exe_path, out_dir="Extracted_Translations"):
+    # pefile is only needed here; importing it lazily keeps the CLI start fast
+    import pefile
+
     print(f"Analyzing {exe_path} for Multi-Language Resources...\n")
     try:
         pe = pefile.PE(exe_path)
@@ -24,7 +27,6 @@ def extract_translations(exe_path):
     RT_RCDATA = 10
     
     # Create the main output directory
-    out_dir = "Extracted_Translations"
     os.makedirs(out_dir, exist_ok=True)
     
     # ==========================================
@@ -152,5 +154,8 @@ def extract_translations(exe_path):
     print(f"\nExtraction complete! All files saved successfully in the '{out_dir}' directory.")
 
 if __name__ == "__main__":
-    # ---> CHANGE THIS to your executable name <---
-    extract_translations("WCMDiag5519b.exe")
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Extract string tables and DFM forms of all languages from the diagnosis EXE.")
+    parser.add_argument("exe", nargs='?', default="WCMDiag5519b.exe", help="diagnosis executable (default: WCMDiag5519b.exe)")
+    parser.add_argument("-o", "--output", default="Extracted_Translations", help="output directory (default: Extracted_Translations)")
+    args = parser.parse_args()
+    extract_translations(args.exe, args.output)
@@ -1,7 +1,9 @@
-import pefile
 import re
+import argparse
 
 def extract_all_translations(exe_path):
+    import pefile
+
     print(f"Loading {exe_path} and scanning for UI components...\n")
     try:
         pe = pefile.PE(exe_path)
@@ -79,5 +81,7 @@ def extract_all_translations(exe_path):
         print(f"{comp:<35} | {all_mappings[comp]}")
 
 if __name__ == "__main__":
-    # ---> CHANGE THIS to your actual EXE file name <---
-    extract_all_translations("WCMDiag5519b.exe")
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="List UI component captions found in the diagnosis EXE.")
+    parser.add_argument("exe", nargs='?', default="WCMDiag5519b.exe", help="diagnosis executable (default: WCMDiag5519b.exe)")
+    args = parser.parse_args()
+    extract_all_translations(args.exe)
@@ -1,4 +1,5 @@
 import re
+import argparse
 
 def extract_dfm_translations(filepath):
     with open(filepath, 'r', encoding='utf-8', errors='ignore') as f:
@@ -42,4 +43,7 @@ def extract_dfm_translations(filepath):
         print(f"{comp:<35} | {mappings[comp]}")
 
 if __name__ == "__main__":
-    extract_dfm_translations("TFRMWCM_5.txt")
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="List UI component captions of an extracted DFM text file.")
+    parser.add_argument("file", nargs='?', default="TFRMWCM_5.txt", help="extracted form (default: TFRMWCM_5.txt)")
+    args = parser.parse_args()
+    extract_dfm_translations(args.file)
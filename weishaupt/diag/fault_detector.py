@@ -0,0 +1,351 @@
+import os
+import sys
+import csv
+import json
+import time
+import asyncio
+import argparse
+
+from bus_load import load_templates
+from ebusd_config import CONFIG_DIR, device_files, read_messages
+from ebusd_client import DEFAULT_EBUSD_PORT
+
+STATUS_MESSAGE = "WTCStatus"     # 500A broadcast of the WTC
+DEMAND_MESSAGE = "PowerDemand"   # 0507 heat demand to the WTC
+PHASE_TEMPLATE = "_8_WtcOperatingPhase"
+
+PHASE_OFF = 0x00
+PHASE_PREPURGE = 0x03
+PHASE_OPERATION = 0x06
+PHASE_F22 = 0x16
+# Phases from 0x0B on are the F../W.. codes of _8_WtcOperatingPhase
+FIRST_FAULT_PHASE = 0x0B
+# _8_Opdataheat1 values without heat demand
+NO_DEMAND = {"Off", "Standby", "0", "85", "0x00", "0x55"}
+ON_VALUES = {"On", "on", "1"}
+
+DEFAULT_WINDOW = 3600.0
+DEFAULT_MAX_STARTS = 6
+DEFAULT_F22_REPEAT = 3
+DEFAULT_PREPURGE_TIMEOUT = 120.0
+# Resolution of the rolling counters: the window is split into this many buckets
+WINDOW_BUCKETS = 12
+
+def _resolve_type(type_str, templates, depth=0):
+    while type_str.startswith('_') and type_str in templates and depth < 8:
+        type_str = templates[type_str]
+        depth += 1
+    return type_str
+
+def load_message_fields(config_dir=CONFIG_DIR, names=(STATUS_MESSAGE, DEMAND_MESSAGE)):
+    """
+    Field names of the given messages in the order ebusd prints them, per
+    circuit: {(circuit, message): [field, ...]}. IGN fields (_8_Skip ...)
+    are not printed by ebusd and are left out.
+    """
+    templates = load_templates(os.path.join(config_dir, "_templates.csv"))
+    fields = {}
+    for path, _, circuit in device_files(config_dir):
+        for msg in read_messages(path, firmware=False):
+            row = msg['row']
+            if msg['name'] not in names or len(row) < 9:
+                continue
+            fields[(circuit, msg['name'])] = [
+                row[i].strip() for i in range(8, len(row) - 2, 6)
+                if row[i + 2].strip() and not _resolve_type(row[i + 2].strip(), templates).startswith("IGN")]
+    return fields
+
+def load_phase_codes(templates_csv=os.path.join(CONFIG_DIR, "_templates.csv")):
+    """
+    Returns ({text: code}, {code: text}) of the _8_WtcOperatingPhase value
+    list, e.g. "F22:Flame failure during operation" <-> 0x16.
+    """
+    with open(templates_csv, 'r', encoding='utf-8', errors='ignore') as f:
+        for row in csv.reader(f):
+            if row and row[0].strip() == PHASE_TEMPLATE and len(row) > 2:
+                codes = {}
+                for entry in row[2].split(';'):
+                    raw, _, text = entry.partition('=')
+                    if text:
+                        codes[text.strip()] = int(raw, 0)
+                return codes, {code: text for text, code in codes.items()}
+    return {}, {}
+
+class RollingCount:
+    """
+    Events in the last `window` seconds, kept in a fixed ring of buckets:
+    constant memory and O(1) per update, at the cost of bucket resolution.
+    """
+    __slots__ = ('width', 'buckets', 'current', 'total')
+
+    def __init__(self, window=DEFAULT_WINDOW, buckets=WINDOW_BUCKETS):
+        self.width = window / buckets
+        self.buckets = [0] * buckets
+        self.current = None
+        self.total = 0
+
+    def _advance(self, ts):
+        index = int(ts // self.width)
+        if self.current is None:
+            self.current = index
+        steps = min(index - self.current, len(self.buckets))
+        for i in range(1, steps + 1):
+            slot = (self.current + i) % len(self.buckets)
+            self.total -= self.buckets[slot]
+            self.buckets[slot] = 0
+        if index > self.current:
+            self.current = index
+        return self.current % len(self.buckets)
+
+    def add(self, ts):
+        self.buckets[self._advance(ts)] += 1
+        self.total += 1
+        return self.total
+
+    def count(self, ts):
+        self._advance(ts)
+        return self.total
+
+class DeviceState:
+    __slots__ = ('phase', 'phase_since', 'flame', 'flame_since', 'last_runtime', 'demand',
+                 'starts', 'f22', 'flame_losses', 'cycling_alarm', 'f22_alarm', 'prepurge_alarm')
+
+    def __init__(self, window):
+        self.phase = None
+        self.phase_since = None
+        self.flame = None
+        self.flame_since = None
+        self.last_runtime = None
+        self.demand = None
+        self.starts = RollingCount(window)
+        self.f22 = RollingCount(window)
+        self.flame_losses = RollingCount(window)
+        self.cycling_alarm = False
+        self.f22_alarm = False
+        self.prepurge_alarm = False
+
+class FaultDetector:
+    """
+    Consumes decoded WTCStatus/PowerDemand broadcasts and returns events as
+    soon as a sample completes them. Nothing is stored per sample: every
+    device has its current phase, flame and demand, three rolling counters
+    and the alarm latches.
+
+    Events (dicts with ts, device, event):
+      phase           every phase change, with the time spent in the old phase
+      fault           entering an F../W.. phase
+      flame_loss      flame off during operation or into F22, with the rate per window
+      short_cycling   max_starts burner starts within the window
+      repeated_f22    f22_repeat times F22 within the window
+      stuck_prepurge  prepurge (0x03) for longer than prepurge_timeout
+    Alarms fire once and re-arm when the condition clears.
+    """
+    def __init__(self, window=DEFAULT_WINDOW, max_starts=DEFAULT_MAX_STARTS, f22_repeat=DEFAULT_F22_REPEAT,
+                 prepurge_timeout=DEFAULT_PREPURGE_TIMEOUT, fields=None, phase_codes=None):
+        self.window = window
+        self.max_starts = max_starts
+        self.f22_repeat = f22_repeat
+        self.prepurge_timeout = prepurge_timeout
+        self.fields = load_message_fields() if fields is None else fields
+        self.codes, self.texts = load_phase_codes() if phase_codes is None else phase_codes
+        self.devices = {}
+        self.samples = 0
+
+    def _device(self, device):
+        state = self.devices.get(device)
+        if state is None:
+            state = self.devices[device] = DeviceState(self.window)
+        return state
+
+    def phase_code(self, value):
+        code = self.codes.get(value)
+        if code is None:
+            try:
+                code = int(value, 0)
+            except ValueError:
+                return None
+        return code
+
+    def on_status(self, device, ts, phase, flame=None):
+        self.samples += 1
+        state = self._device(device)
+        events = []
+        if phase is not None and phase != state.phase:
+            if state.phase is not None:
+                events.append({'ts': ts, 'device': device, 'event': "phase",
+                               'from': state.phase, 'to': phase, 'text': self.texts.get(phase, ""),
+                               'duration': ts - state.phase_since})
+            if phase >= FIRST_FAULT_PHASE:
+                events.append({'ts': ts, 'device': device, 'event': "fault", 'phase': phase,
+                               'text': self.texts.get(phase, "")})
+            if phase == PHASE_F22:
+                count = state.f22.add(ts)
+                if count >= self.f22_repeat and not state.f22_alarm:
+                    state.f22_alarm = True
+                    events.append({'ts': ts, 'device': device, 'event': "repeated_f22", 'count': count,
+                                   'window': self.window})
+            # Without a Flame field a burner start is the entry into operation
+            if flame is None and phase == PHASE_OPERATION:
+                self._start(device, state, ts, events)
+            state.phase = phase
+            state.phase_since = ts
+            state.prepurge_alarm = False
+
+        if flame is not None and flame != state.flame:
+            if flame:
+                state.flame_since = ts
+                if state.flame is not None:
+                    self._start(device, state, ts, events)
+            elif state.flame and state.flame_since is not None:
+                state.last_runtime = ts - state.flame_since
+                if state.phase in (PHASE_OPERATION, PHASE_F22):
+                    losses = state.flame_losses.add(ts)
+                    events.append({'ts': ts, 'device': device, 'event': "flame_loss", 'phase': state.phase,
+                                   'runtime': state.last_runtime, 'count': losses, 'window': self.window})
+            state.flame = flame
+
+        if (state.phase == PHASE_PREPURGE and not state.prepurge_alarm
+                and ts - state.phase_since >= self.prepurge_timeout):
+            state.prepurge_alarm = True
+            events.append({'ts': ts, 'device': device, 'event': "stuck_prepurge", 'duration': ts - state.phase_since})
+        if state.cycling_alarm and state.starts.count(ts) < self.max_starts:
+            state.cycling_alarm = False
+        if state.f22_alarm and state.f22.count(ts) < self.f22_repeat:
+            state.f22_alarm = False
+        return events
+
+    def _start(self, device, state, ts, events):
+        count = state.starts.add(ts)
+        if count >= self.max_starts and not state.cycling_alarm:
+            state.cycling_alarm = True
+            events.append({'ts': ts, 'device': device, 'event': "short_cycling", 'starts': count,
+                           'window': self.window, 'last_runtime': state.last_runtime, 'demand': state.demand})
+
+    def on_demand(self, device, ts, status):
+        self.samples += 1
+        self._device(device).demand = status not in NO_DEMAND
+        return []
+
+    def on_line(self, line, ts=None, prefix=""):
+        """
+        Parses an ebusd 'listen' line "<circuit> <message> = <values>", with
+        the values either positional ("0;Prepurge;0;...") or named
+        ("Operatingphase=Prepurge;Flame=On;..."), and feeds it in.
+        """
+        head, sep, values = line.partition(" = ")
+        if not sep:
+            return []
+        parts = head.split()
+        if len(parts) != 2 or parts[1] not in (STATUS_MESSAGE, DEMAND_MESSAGE):
+            return []
+        circuit, message = parts
+        items = values.split(';')
+        if '=' in items[0]:
+            named = dict(item.split('=', 1) for item in items if '=' in item)
+        else:
+            named = dict(zip(self.fields.get((circuit, message), ()), items))
+        ts = time.time() if ts is None else ts
+        device = prefix + circuit
+        if message == STATUS_MESSAGE:
+            phase = named.get("Operatingphase")
+            flame = named.get("Flame")
+            return self.on_status(device, ts, self.phase_code(phase.strip()) if phase is not None else None,
+                                  flame.strip() in ON_VALUES if flame is not None else None)
+        return self.on_demand(device, ts, named.get("Status", "").strip())
+
+    def snapshot(self, ts=None):
+        ts = time.time() if ts is None else ts
+        return {device: {'phase': state.phase, 'text': self.texts.get(state.phase, ""),
+                         'in_phase': ts - state.phase_since if state.phase_since is not None else None,
+                         'flame': state.flame, 'demand': state.demand, 'starts': state.starts.count(ts),
+                         'f22': state.f22.count(ts), 'flame_losses': state.flame_losses.count(ts)}
+                for device, state in self.devices.items()}
+
+def replay(detector, lines, out):
+    """
+    Feeds recorded lines, optionally prefixed with an epoch timestamp
+    ("1792437688.6 bc1 WTCStatus = ...").
+    """
+    for line in lines:
+        line = line.rstrip("\r\n")
+        ts = None
+        first, _, rest = line.partition(' ')
+        try:
+            ts = float(first)
+            line = rest
+        except ValueError:
+            pass
+        for event in detector.on_line(line, ts):
+            out.write(json.dumps(event) + "\n")
+
+async def listen(detector, host, port, out, prefix=""):
+    # Same reconnecting 'listen' subscription as the FHEM push bridge
+    backoff = 1
+    while True:
+        try:
+            reader, writer = await asyncio.open_connection(host, port)
+            writer.write(b"listen\n")
+            await writer.drain()
+            backoff = 1
+            while True:
+                raw = await reader.readline()
+                if not raw:
+                    break
+                for event in detector.on_line(raw.decode('utf-8', errors='replace').rstrip("\r\n"), prefix=prefix):
+                    out.write(json.dumps(event) + "\n")
+                    out.flush()
+            writer.close()
+        except OSError as e:
+            print(f"{host}:{port}: ebusd connection failed ({e}), retrying in {backoff}s", file=sys.stderr)
+        await asyncio.sleep(backoff)
+        backoff = min(backoff * 2, 60)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Detect short cycling, repeated F22 and stuck prepurge from WTC status broadcasts.")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p_listen = sub.add_parser("listen", help="follow the 'listen' stream of one or more ebusd gateways")
+    p_listen.add_argument("gateways", nargs='*', default=["localhost"], help="host[:port] (default: localhost)")
+    p_replay = sub.add_parser("replay", help="feed recorded listen lines")
+    p_replay.add_argument("file", nargs='?', default="-", help="recording, '[epoch] circuit message = values' per line")
+    p_replay.add_argument("--snapshot", action="store_true", help="print the device states at the end")
+
+    for p in (p_listen, p_replay):
+        p.add_argument("--window", type=float, default=DEFAULT_WINDOW,
+                       help=f"rolling window for starts, F22 and flame losses (default: {DEFAULT_WINDOW:g} s)")
+        p.add_argument("--max-starts", type=int, default=DEFAULT_MAX_STARTS,
+                       help=f"burner starts per window that count as short cycling (default: {DEFAULT_MAX_STARTS})")
+        p.add_argument("--f22-repeat", type=int, default=DEFAULT_F22_REPEAT,
+                       help=f"F22 entries per window that raise an alarm (default: {DEFAULT_F22_REPEAT})")
+        p.add_argument("--prepurge-timeout", type=float, default=DEFAULT_PREPURGE_TIMEOUT,
+                       help=f"seconds in prepurge before it counts as stuck (default: {DEFAULT_PREPURGE_TIMEOUT:g})")
+        p.add_argument("--config", default=CONFIG_DIR, help="config dir with the device CSVs (default: the parent directory)")
+    args = parser.parse_args()
+
+    detector = FaultDetector(args.window, args.max_starts, args.f22_repeat, args.prepurge_timeout,
+                             fields=load_message_fields(args.config),
+                             phase_codes=load_phase_codes(os.path.join(args.config, "_templates.csv")))
+    if args.command == "replay":
+        f = sys.stdin if args.file == "-" else open(args.file, 'r', encoding='utf-8', errors='replace')
+        try:
+            replay(detector, f, sys.stdout)
+        finally:
+            if f is not sys.stdin:
+                f.close()
+        if args.snapshot:
+            print(json.dumps(detector.snapshot(), indent=1), file=sys.stderr)
+    else:
+        gateways = []
+        for gateway in args.gateways:
+            host, _, port = gateway.partition(':')
+            gateways.append((host, int(port) if port else DEFAULT_EBUSD_PORT))
+        # Several gateways: prefix the devices with the gateway to keep them apart
+        prefixed = len(gateways) > 1
+
+        async def main():
+            await asyncio.gather(*(listen(detector, host, port, sys.stdout, f"{host}:{port}/" if prefixed else "")
+                                   for host, port in gateways))
+        try:
+            asyncio.run(main())
+        except KeyboardInterrupt:
+            pass
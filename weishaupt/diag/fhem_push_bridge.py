@@ -0,0 +1,336 @@
+import os
+import re
+import asyncio
+import argparse
+
+from ebusd_client import DEFAULT_EBUSD_HOST, DEFAULT_EBUSD_PORT
+from bus_metrics import METRICS, DEFAULT_METRICS_HOST, serve_metrics
+from generate_ebusd_csv import load_alias_map, fan_out_aliases
+from bus_load import DEFAULT_MAX_UTILIZATION, load_config
+from ebusd_config import CONFIG_DIR, circuit_of, device_files, firmware_includes, read_messages
+
+DEFAULT_CLASSDEF = os.path.join(CONFIG_DIR, "FHEM", "weishaupt.push.classdef")
+DEFAULT_BRIDGE_PORT = 8887
+# ebusd only reports broadcasts and its own r1-r9 polls on 'listen'; the
+# bridge reads the other watched messages itself once per poll interval
+DEFAULT_POLL_INTERVAL = 60.0
+# A client that does not take a batch within this time is dropped
+CLIENT_TIMEOUT = 5.0
+EBUSD_TIMEOUT = 10.0
+# ebusd "listen" update line: "<circuit> <name> = <value>"
+UPDATE_LINE = re.compile(r'^(\S+) (\S+) = (.*)$')
+ALIASES_COMMENT = re.compile(r'^# Aliases of (\S+): (.+)$')
+ALIAS_LINE = re.compile(r'^#\s*r,,([^,]+),.*#\s*Alias of (\S+)\s*$')
+
+def load_device_messages(device_csvs, all_includes=False):
+    """
+    Returns the (circuit, message) pairs a bridge should forward: every
+    read, update and broadcast message of the device CSVs and their
+    register includes. The firmware symbol includes hold ~1000 raw
+    registers each and are only walked with all_includes.
+    """
+    messages = []
+    for device_csv in device_csvs:
+        circuit = circuit_of(device_csv)
+        messages += [(circuit, msg['name']) for msg in read_messages(device_csv, all_includes)
+                     if msg['kind'] != 'w' and msg['name']]
+    seen = set()
+    return [m for m in messages if not (m in seen or seen.add(m))]
+
+def load_poll_messages(device_csvs, all_includes=False):
+    """
+    The (circuit, message) pairs ebusd never reports on its own: read
+    messages without an r1-r9 poll priority.
+    """
+    messages = []
+    for device_csv in device_csvs:
+        circuit = circuit_of(device_csv)
+        messages += [(circuit, msg['name']) for msg in read_messages(device_csv, all_includes)
+                     if msg['kind'] == 'r' and msg['priority'] is None and msg['name']]
+    seen = set()
+    return [m for m in messages if not (m in seen or seen.add(m))]
+
+def poll_airtime(poll, config_dir=CONFIG_DIR):
+    # Bus time of one read of every polled message, from the bus_load model
+    airtime = {(m['circuit'], m['name']): m['airtime'] for m in load_config(config_dir) if m['kind'] == 'r'}
+    return sum(airtime.get(key, 0.0) for key in poll)
+
+def load_device_aliases(device_csvs):
+    """
+    Alias maps of the firmware includes, per circuit: {circuit: {message:
+    [alias, ...]}} from the <firmware>.alias.csv sidecar that
+    generate_ebusd_csv.py writes next to each .inc, or from the alias
+    comments of the .inc itself when there is no sidecar.
+    """
+    aliases = {}
+    for device_csv in device_csvs:
+        for include in firmware_includes(device_csv):
+            path = os.path.join(os.path.dirname(device_csv), include)
+            sidecar = os.path.splitext(path)[0] + ".alias.csv"
+            if os.path.exists(sidecar):
+                alias_map = load_alias_map(sidecar)
+            elif os.path.exists(path):
+                alias_map = load_include_aliases(path)
+            else:
+                continue
+            aliases.setdefault(circuit_of(device_csv), {}).update(alias_map)
+    return aliases
+
+def load_include_aliases(include_path):
+    # "# Aliases of <message>: a, b" or, in older includes, a commented-out
+    # "# r,,<alias>,...  # Alias of <message>" line per alias
+    alias_map = {}
+    with open(include_path, 'r', encoding='utf-8') as f:
+        for line in f:
+            match = ALIASES_COMMENT.match(line)
+            if match:
+                alias_map.setdefault(match.group(1), []).extend(a.strip() for a in match.group(2).split(','))
+                continue
+            match = ALIAS_LINE.match(line)
+            if match and match.group(1) not in alias_map.get(match.group(2), []):
+                alias_map.setdefault(match.group(2), []).append(match.group(1))
+    return alias_map
+
+def alias_readings(messages, aliases):
+    # (circuit, alias) pairs for every watched message that has aliases
+    return [(circuit, alias) for circuit, name in messages for alias in aliases.get(circuit, {}).get(name, [])]
+
+def default_device_csvs(config_dir=CONFIG_DIR):
+    return [path for path, _, _ in device_files(config_dir)]
+
+def write_push_classdef(messages, out_path=DEFAULT_CLASSDEF, bridge_port=DEFAULT_BRIDGE_PORT):
+    with open(out_path, 'w', encoding='utf-8') as f:
+        f.write("################## weishaupt.push.classdef ###############\n")
+        f.write("# Generiert von diag/fhem_push_bridge.py - nicht von Hand bearbeiten.\n")
+        f.write("# Readings werden von fhem_push_bridge.py gepusht, kein EBUS.Timer noetig.\n")
+        f.write("# ebusd meldet per 'listen' nur Broadcasts und selbst gepollte Nachrichten (r1-r9, --pollinterval),\n")
+        f.write("# alle anderen r-Nachrichten liest die Bridge selbst (--poll-interval).\n")
+        f.write("#\n")
+        f.write("# Bsp.:\n")
+        f.write(f"# defmod EBUSPUSH ECMD telnet localhost:{bridge_port}\n")
+        f.write("# attr EBUSPUSH classdefs weishaupt.push=/etc/ebusd/weishaupt/FHEM/weishaupt.push.classdef\n")
+        f.write("#\n")
+        f.write("# defmod Weishaupt.Push ECMDDevice weishaupt.push\n")
+        f.write("# attr Weishaupt.Push IODev EBUSPUSH\n")
+        f.write("# attr Weishaupt.Push event-on-change-reading .*\n")
+        for circuit, name in messages:
+            reading = f"{circuit}_{name}"
+            prefix = f"{circuit} {name} = "
+            f.write(f"\nreading {reading} match \"{prefix}.*\\n\"\n")
+            f.write(f"reading {reading} postproc {{ s/^{prefix}//; s/\\n//g; $_ }}\n")
+    print(f"  -> Generated {out_path} ({len(messages)} readings)")
+
+class PushBridge:
+    """
+    Holds one 'listen' subscription to ebusd, reads the messages ebusd does
+    not report by itself every poll_interval seconds, keeps the last value
+    of every watched message and pushes only changed readings to all TCP
+    clients, batched every batch_interval seconds.
+    """
+    def __init__(self, messages=None, batch_interval=0.2, aliases=None, poll=None,
+                 poll_interval=DEFAULT_POLL_INTERVAL):
+        self.watched = set(messages) if messages else None
+        self.aliases = aliases or {}
+        self.batch_interval = batch_interval
+        self.poll = list(poll or [])
+        self.poll_interval = poll_interval
+        self.values = {}
+        self.pending = {}
+        self.clients = set()
+        self.changed_event = asyncio.Event()
+        self.received = 0
+        self.polled = 0
+        self.pushed = 0
+        self.dropped = 0
+        METRICS.add_collector(self.metric_samples)
+
+    def on_line(self, line):
+        m = UPDATE_LINE.match(line)
+        if not m:
+            return
+        self.received += 1
+        key = (m.group(1), m.group(2))
+        if self.watched is not None and key not in self.watched:
+            return
+        # One physical read answers for every alias of the same memory cell
+        circuit = key[0]
+        for name, value in fan_out_aliases({key[1]: m.group(3)}, self.aliases.get(circuit, {})).items():
+            if self.values.get((circuit, name)) != value:
+                self.values[(circuit, name)] = value
+                self.pending[(circuit, name)] = value
+                self.changed_event.set()
+
+    async def subscribe(self, host, port):
+        backoff = 1
+        while True:
+            try:
+                reader, writer = await asyncio.open_connection(host, port)
+                writer.write(b"listen\n")
+                await writer.drain()
+                backoff = 1
+                while True:
+                    raw = await reader.readline()
+                    if not raw:
+                        break
+                    self.on_line(raw.decode('utf-8', errors='replace').rstrip("\r\n"))
+                writer.close()
+            except OSError as e:
+                print(f"ebusd connection failed ({e}), retrying in {backoff}s")
+            await asyncio.sleep(backoff)
+            backoff = min(backoff * 2, 60)
+
+    @staticmethod
+    async def _command(reader, writer, command):
+        writer.write(command.encode('utf-8') + b"\n")
+        await writer.drain()
+        lines = []
+        while True:
+            raw = await asyncio.wait_for(reader.readline(), EBUSD_TIMEOUT)
+            if not raw:
+                raise ConnectionError("ebusd closed the connection")
+            line = raw.decode('utf-8', errors='replace').rstrip("\r\n")
+            if line == "":
+                return lines
+            lines.append(line)
+
+    async def poll_loop(self, host, port):
+        """
+        Reads every message of self.poll once per poll_interval over one
+        command connection, spread evenly over the cycle, and feeds the
+        answers through on_line(). -m lets ebusd answer from its cache when
+        the value is fresher than a cycle.
+        """
+        loop = asyncio.get_running_loop()
+        while self.poll:
+            started = loop.time()
+            step = self.poll_interval / len(self.poll)
+            writer = None
+            try:
+                reader, writer = await asyncio.open_connection(host, port)
+                for i, (circuit, name) in enumerate(self.poll):
+                    lines = await self._command(reader, writer,
+                                                f"read -m {int(self.poll_interval)} -c {circuit} {name}")
+                    self.polled += 1
+                    if lines and not lines[0].startswith("ERR"):
+                        self.on_line(f"{circuit} {name} = {lines[0]}")
+                    await asyncio.sleep(max(0.0, started + (i + 1) * step - loop.time()))
+            except (OSError, asyncio.TimeoutError) as e:
+                print(f"ebusd poll failed ({e or 'timeout'}), retrying next cycle")
+            finally:
+                if writer is not None:
+                    writer.close()
+            await asyncio.sleep(max(0.0, self.poll_interval - (loop.time() - started)))
+
+    @staticmethod
+    def _format(items):
+        return "".join(f"{circuit} {name} = {value}\n" for (circuit, name), value in items).encode('utf-8')
+
+    async def flush_loop(self):
+        while True:
+            await self.changed_event.wait()
+            await asyncio.sleep(self.batch_interval)
+            self.changed_event.clear()
+            batch, self.pending = self.pending, {}
+            if not batch or not self.clients:
+                continue
+            self.pushed += len(batch)
+            payload = self._format(batch.items())
+            # One stalled client must not hold back the others
+            await asyncio.gather(*(self._send(writer, payload) for writer in list(self.clients)))
+
+    async def _send(self, writer, payload):
+        try:
+            writer.write(payload)
+            await asyncio.wait_for(writer.drain(), CLIENT_TIMEOUT)
+            return True
+        except (ConnectionError, OSError, asyncio.TimeoutError):
+            self.clients.discard(writer)
+            self.dropped += 1
+            writer.close()
+            return False
+
+    def metric_samples(self):
+        return [
+            ("ebus_push_updates", "counter", (("result", "received"),), self.received),
+            ("ebus_push_updates", "counter", (("result", "polled"),), self.polled),
+            ("ebus_push_updates", "counter", (("result", "pushed"),), self.pushed),
+            ("ebus_push_dropped_clients", "counter", (), self.dropped),
+            ("ebus_push_queue_depth", "gauge", (), len(self.pending)),
+            ("ebus_push_clients", "gauge", (), len(self.clients)),
+        ]
+
+    async def handle_client(self, reader, writer):
+        # New clients get the current snapshot, then only changes
+        if self.values and not await self._send(writer, self._format(self.values.items())):
+            return
+        self.clients.add(writer)
+        try:
+            while await reader.read(1024):
+                pass
+        except (ConnectionError, OSError):
+            pass
+        finally:
+            self.clients.discard(writer)
+            writer.close()
+
+    async def run(self, ebusd_host, ebusd_port, listen_host, listen_port):
+        server = await asyncio.start_server(self.handle_client, listen_host, listen_port)
+        watched = "all" if self.watched is None else len(self.watched)
+        print(f"Push bridge on {listen_host}:{listen_port}, watching {watched} messages from {ebusd_host}:{ebusd_port}, "
+              f"polling {len(self.poll)} every {self.poll_interval:.0f}s")
+        async with server:
+            await asyncio.gather(self.subscribe(ebusd_host, ebusd_port), self.poll_loop(ebusd_host, ebusd_port),
+                                 self.flush_loop())
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Push changed ebusd readings to FHEM instead of polling them.")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    for name, help_text in (("run", "run the bridge"), ("classdef", "generate the FHEM push classdef")):
+        p = sub.add_parser(name, help=help_text)
+        p.add_argument("devices", nargs='*', help="device CSVs (default: all *..*.csv in the config dir)")
+        p.add_argument("--all-includes", action="store_true", help="also watch the firmware symbol includes (WH11928.inc, ...)")
+        p.add_argument("--listen-port", type=int, default=DEFAULT_BRIDGE_PORT)
+        if name == "run":
+            p.add_argument("--listen-host", default="127.0.0.1")
+            p.add_argument("--host", default=DEFAULT_EBUSD_HOST, help="ebusd host")
+            p.add_argument("--port", type=int, default=DEFAULT_EBUSD_PORT, help="ebusd command port")
+            p.add_argument("--batch-ms", type=int, default=200, help="push interval for changed readings (default: 200)")
+            p.add_argument("--watch-all", action="store_true", help="forward every update, not just the device messages")
+            p.add_argument("--poll-interval", type=float, default=DEFAULT_POLL_INTERVAL,
+                           help=f"seconds between reads of the messages without r1-r9 priority "
+                                f"(default: {DEFAULT_POLL_INTERVAL:g}, 0 disables polling)")
+            p.add_argument("--metrics-port", type=int, help="serve OpenMetrics on this port (/metrics)")
+        else:
+            p.add_argument("-o", "--output", default=DEFAULT_CLASSDEF)
+
+    args = parser.parse_args()
+    device_csvs = args.devices or default_device_csvs()
+    messages = load_device_messages(device_csvs, args.all_includes)
+    aliases = load_device_aliases(device_csvs)
+
+    if args.command == "classdef":
+        write_push_classdef(messages + alias_readings(messages, aliases), args.output, args.listen_port)
+    else:
+        poll, poll_interval = [], args.poll_interval
+        if poll_interval > 0:
+            poll = load_poll_messages(device_csvs, args.all_includes)
+            floor = poll_airtime(poll, os.path.dirname(os.path.abspath(device_csvs[0]))) / DEFAULT_MAX_UTILIZATION
+            if poll and poll_interval < floor:
+                print(f"Warning: reading {len(poll)} messages needs {floor * DEFAULT_MAX_UTILIZATION:.0f}s of bus time; "
+                      f"polling every {floor:.0f}s instead of {poll_interval:g}s to stay below "
+                      f"{DEFAULT_MAX_UTILIZATION:.0%} bus load. Give messages r1-r9 priorities or pass fewer device "
+                      f"CSVs to poll faster.")
+                poll_interval = floor
+
+        if args.metrics_port:
+            serve_metrics(DEFAULT_METRICS_HOST, args.metrics_port)
+
+        async def main():
+            bridge = PushBridge(None if args.watch_all else messages, args.batch_ms / 1000.0, aliases,
+                                poll, poll_interval)
+            await bridge.run(args.host, args.port, args.listen_host, args.listen_port)
+        try:
+            asyncio.run(main())
+        except KeyboardInterrupt:
+            pass
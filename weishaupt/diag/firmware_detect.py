@@ -0,0 +1,204 @@
+import os
+import re
+import sys
+import json
+import glob
+import argparse
+
+from ebusd_client import send_command, is_error, DEFAULT_EBUSD_HOST, DEFAULT_EBUSD_PORT
+from ebusd_config import FIRMWARE_STEM
+
+DIAG_DIR = os.path.dirname(os.path.abspath(__file__))
+INDEX_FILE = os.path.join(DIAG_DIR, "firmware_index.json")
+INDEX_VERSION = 2
+# Where the (sw, hw) of an index entry comes from. Rebuilding the index
+# keeps any other source, e.g. "identification" after checking a device's
+# 0704 answer against its table by hand.
+INFERRED_SOURCE = "file name"
+
+# 0011366.SYC -> SW 0011 / HW 366, WH11928.SYC -> SW 11 / HW 928
+SYC_NAME_PATTERNS = [
+    re.compile(r'^(?P<sw>\d{4})(?P<hw>\d{3})$'),
+    re.compile(r'^WH(?P<sw>\d{2})(?P<hw>\d{3})$', re.IGNORECASE),
+]
+INCLUDE_LINE = re.compile(rf'^!include,{FIRMWARE_STEM}\.inc,', re.IGNORECASE)
+
+def parse_syc_name(basename):
+    stem = os.path.splitext(basename)[0]
+    for pattern in SYC_NAME_PATTERNS:
+        m = pattern.match(stem)
+        if m:
+            return int(m.group('sw')), int(m.group('hw'))
+    return None
+
+def build_firmware_index(syc_dir=DIAG_DIR, previous=None):
+    """
+    Scans the .SYC file names once and returns the (sw, hw) -> file index.
+    Nothing is parsed here; only the matching table gets loaded later. The
+    versions are inferred from the file names (source "file name") unless
+    the previous index records a confirmed source for the same file.
+    """
+    confirmed = {e['syc']: e for e in (previous or {}).get('entries', [])
+                 if e.get('source', INFERRED_SOURCE) != INFERRED_SOURCE}
+    entries = []
+    for path in sorted(set(glob.glob(os.path.join(syc_dir, "*.SYC")) + glob.glob(os.path.join(syc_dir, "*.syc")))):
+        basename = os.path.basename(path)
+        version = parse_syc_name(basename)
+        if version is None:
+            continue
+        if basename in confirmed:
+            entries.append(confirmed[basename])
+            continue
+        entries.append({
+            'sw': version[0],
+            'hw': version[1],
+            'syc': basename,
+            'inc': os.path.splitext(basename)[0] + ".inc",
+            'source': INFERRED_SOURCE
+        })
+    return {'version': INDEX_VERSION, 'entries': entries}
+
+def load_firmware_index(index_path=INDEX_FILE):
+    with open(index_path, 'r') as f:
+        index = json.load(f)
+    if index.get('version') != INDEX_VERSION:
+        raise ValueError(f"Unsupported firmware index version {index.get('version')} in {index_path}")
+    return index
+
+def parse_identification(hex_answer):
+    """
+    Decodes the slave part of a 0704 identification answer as returned by
+    `ebusd hex`: NN, manufacturer, 5 byte device id, SW and HW as BCD.
+    """
+    data = bytes.fromhex(hex_answer.strip())
+    if not data or data[0] < 10 or len(data) < 11:
+        raise ValueError(f"Short identification answer: {hex_answer!r}")
+    payload = data[1:1 + data[0]]
+    return {
+        'manufacturer': payload[0],
+        'id': payload[1:6].decode('ascii', errors='replace').strip(),
+        'sw': f"{payload[6]:02x}{payload[7]:02x}",
+        'hw': f"{payload[8]:02x}{payload[9]:02x}"
+    }
+
+def read_identification(address, host=DEFAULT_EBUSD_HOST, port=DEFAULT_EBUSD_PORT):
+    lines = send_command(f"hex {address}070400", host, port)
+    if is_error(lines):
+        raise IOError(f"Identification of {address} failed: {' '.join(lines) or 'no answer'}")
+    return parse_identification(lines[0])
+
+def match_firmware(index, sw, hw):
+    """
+    Exact (sw, hw) match first; otherwise the newest table of the same
+    hardware that is not newer than the device software.
+    """
+    sw = int(sw)
+    hw = int(hw)
+    candidates = [e for e in index['entries'] if e['hw'] == hw]
+    for entry in candidates:
+        if entry['sw'] == sw:
+            return entry, "exact"
+    older = [e for e in candidates if e['sw'] <= sw]
+    if older:
+        return max(older, key=lambda e: e['sw']), "nearest"
+    return None, "none"
+
+def load_matching_table(entry, syc_dir=DIAG_DIR):
+    # Imported here so detection alone never pays for the SYC scanner
+    from syc_lookup_service import load_symbol_table
+    return load_symbol_table(os.path.join(syc_dir, entry['syc']))
+
+def apply_include(device_csv, inc_name):
+    """
+    Points the firmware !include line of a device CSV (e.g. 08..bc1.csv) at
+    inc_name. Returns True when the file was changed.
+    """
+    with open(device_csv, 'r', encoding='utf-8') as f:
+        lines = f.readlines()
+
+    changed = False
+    for i, line in enumerate(lines):
+        m = INCLUDE_LINE.match(line)
+        if m and m.group(1) + ".inc" != inc_name:
+            lines[i] = f"!include,{inc_name}," + line[m.end():]
+            changed = True
+
+    if changed:
+        with open(device_csv, 'w', encoding='utf-8') as f:
+            f.writelines(lines)
+    return changed
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Detect the controller firmware on the bus and select the matching symbol table.")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    sub.add_parser("index", help=f"rebuild {os.path.basename(INDEX_FILE)} from the .SYC files")
+
+    p_detect = sub.add_parser("detect", help="identify a device and pick its .SYC/.inc")
+    p_detect.add_argument("--address", default="08", help="slave address of the controller (default: 08, bc1)")
+    p_detect.add_argument("--host", default=DEFAULT_EBUSD_HOST)
+    p_detect.add_argument("--port", type=int, default=DEFAULT_EBUSD_PORT)
+    p_detect.add_argument("--sw", help="skip the bus read and use this software version")
+    p_detect.add_argument("--hw", help="skip the bus read and use this hardware version")
+    p_detect.add_argument("--load", action="store_true", help="also load the matching symbol table")
+    p_detect.add_argument("--apply", metavar="DEVICE.csv",
+                          help="rewrite the !include line of this device CSV (exact match with a confirmed SW/HW only; "
+                               "the versions of the index are inferred from the .SYC file names)")
+    p_detect.add_argument("--allow-nearest", action="store_true",
+                          help="let --apply use the nearest older table when there is no exact match")
+    p_detect.add_argument("--allow-inferred", action="store_true",
+                          help="let --apply use a table whose SW/HW is only inferred from its file name")
+
+    args = parser.parse_args()
+
+    if args.command == "index":
+        try:
+            previous = load_firmware_index()
+        except (OSError, ValueError):
+            previous = None
+        index = build_firmware_index(previous=previous)
+        with open(INDEX_FILE, 'w') as f:
+            json.dump(index, f, indent=1)
+        print(f"  -> Wrote {INDEX_FILE} ({len(index['entries'])} firmware tables)")
+        sys.exit(0)
+
+    if args.sw and args.hw:
+        ident = {'sw': args.sw, 'hw': args.hw, 'id': '?', 'manufacturer': None}
+    else:
+        try:
+            ident = read_identification(args.address, args.host, args.port)
+        except (IOError, ValueError) as e:
+            print(f"Error: {e}")
+            sys.exit(1)
+    print(f"Device {args.address}: ID={ident['id']} SW={ident['sw']} HW={ident['hw']}")
+
+    entry, quality = match_firmware(load_firmware_index(), ident['sw'], ident['hw'])
+    if entry is None:
+        print("No matching firmware symbol table.")
+        sys.exit(2)
+    inferred = entry.get('source', INFERRED_SOURCE) == INFERRED_SOURCE
+    print(f"  -> {quality} match: {entry['syc']} / {entry['inc']} (SW/HW from {entry.get('source', INFERRED_SOURCE)})")
+    if quality != "exact":
+        print(f"WARNING: no symbol table for SW {int(ident['sw'])} / HW {int(ident['hw'])}; "
+              f"{entry['syc']} is for SW {entry['sw']} and its addresses may not match this firmware",
+              file=sys.stderr)
+
+    if args.load:
+        table = load_matching_table(entry)
+        print(f"  -> Loaded {len(table['by_name'])} symbols from {entry['syc']}")
+
+    if args.apply:
+        if quality != "exact" and not args.allow_nearest:
+            print(f"Error: not rewriting {args.apply} with a {quality} match; pass --allow-nearest to use {entry['inc']} anyway")
+            sys.exit(4)
+        if inferred and not args.allow_inferred:
+            print(f"Error: not rewriting {args.apply}: the SW/HW of {entry['syc']} is only inferred from its file name; "
+                  f"pass --allow-inferred to use {entry['inc']} anyway")
+            sys.exit(4)
+        if not os.path.exists(os.path.join(os.path.dirname(os.path.abspath(args.apply)), entry['inc'])):
+            print(f"  -> {entry['inc']} not found next to {args.apply}; generate it with generate_ebusd_csv.py first")
+            sys.exit(3)
+        if apply_include(args.apply, entry['inc']):
+            print(f"  -> {args.apply} now includes {entry['inc']}")
+        else:
+            print(f"  -> {args.apply} already includes {entry['inc']}")
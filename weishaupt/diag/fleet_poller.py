@@ -0,0 +1,378 @@
+import os
+import sys
+import json
+import time
+import heapq
+import bisect
+import random
+import asyncio
+import argparse
+from collections import OrderedDict
+
+from bus_load import (CONFIG_DIR, DEFAULT_MAX_UTILIZATION, load_config, load_poll_file, schedule)
+from bus_metrics import LATENCY_BUCKETS, record_request, serve_metrics, DEFAULT_METRICS_HOST
+from ebusd_client import DEFAULT_EBUSD_PORT
+
+DEFAULT_POOL_SIZE = 64
+# Period of every r message of the catalog when a site has no poll file
+DEFAULT_PERIOD = 300.0
+# +-10% on every period so sites that started together drift apart
+DEFAULT_JITTER = 0.1
+DEFAULT_TIMEOUT = 10.0
+# Bus time a gateway may spend back to back before the rate limit kicks in
+BURST_SECONDS = 1.0
+# Floor of the polling budget when broadcasts already use most of the bus
+MIN_BUDGET = 0.05
+MAX_BACKOFF = 60.0
+
+def load_sites(path):
+    """
+    Site list with one "name host[:port] [config dir] [poll file]" per line
+    (# comments). Relative paths are taken from the site list's directory.
+    """
+    base = os.path.dirname(os.path.abspath(path))
+    sites = []
+    with open(path, 'r') as f:
+        for line in f:
+            line = line.split('#', 1)[0].strip()
+            if not line:
+                continue
+            parts = line.split()
+            host, _, port = parts[1].partition(':')
+            sites.append({
+                'name': parts[0],
+                'host': host,
+                'port': int(port) if port else DEFAULT_EBUSD_PORT,
+                'config': os.path.join(base, parts[2]) if len(parts) > 2 else CONFIG_DIR,
+                'poll': os.path.join(base, parts[3]) if len(parts) > 3 else None,
+            })
+    return sites
+
+_CATALOGS = {}
+
+def site_catalog(config_dir, poll_file=None, period=DEFAULT_PERIOD, max_utilization=DEFAULT_MAX_UTILIZATION):
+    """
+    The messages a site polls and the share of the bus its broadcasts
+    already take. Without a poll file every r message of the device CSVs
+    and their register includes is polled; the firmware symbol includes
+    (~1000 raw registers each) only when a poll file names them. Sites
+    sharing a config tree and poll file share one (cached) catalog.
+    """
+    key = (config_dir, poll_file, period)
+    if key not in _CATALOGS:
+        messages = load_config(config_dir, firmware=poll_file is not None)
+        polls = load_poll_file(poll_file) if poll_file else {
+            (m['circuit'], m['name']): period for m in messages if m['kind'] == 'r'}
+        active = schedule(messages, polls)
+        polled = [m for m in active if m['kind'] == 'r']
+        passive = sum(m['airtime'] / m['period'] for m in active if m['kind'] != 'r')
+        load = sum(m['airtime'] / m['period'] for m in polled)
+        _CATALOGS[key] = (polled, passive)
+        print(f"Catalog {config_dir}: {len(polled)} polled messages, {load * 100:.1f}% of the bus, "
+              f"broadcasts {passive * 100:.1f}%", file=sys.stderr)
+        if load + passive > max_utilization:
+            budget = max(MIN_BUDGET, max_utilization - passive)
+            print(f"Warning: polls and broadcasts need {(load + passive) * 100:.0f}% of the bus, more than "
+                  f"--max-utilization {max_utilization * 100:.0f}%; every poll will run about "
+                  f"{load / budget:.1f}x later than its period. Use a poll file or a longer --period.",
+                  file=sys.stderr)
+    return _CATALOGS[key]
+
+class TokenBucket:
+    """
+    Rate limit in seconds of bus time: refills at `rate` (the bus share the
+    gateway may use) up to `burst`, every request takes its airtime.
+    """
+    def __init__(self, rate, burst):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.last = time.monotonic()
+
+    async def take(self, cost):
+        while True:
+            now = time.monotonic()
+            self.tokens = min(self.burst, self.tokens + (now - self.last) * self.rate)
+            self.last = now
+            if self.tokens >= cost:
+                self.tokens -= cost
+                return
+            await asyncio.sleep((cost - self.tokens) / self.rate)
+
+class ConnectionPool:
+    """
+    At most `size` open ebusd connections over all gateways. Idle
+    connections are kept per gateway and reused; when the pool is full the
+    least recently used idle connection of another gateway is closed.
+    """
+    def __init__(self, size=DEFAULT_POOL_SIZE, timeout=DEFAULT_TIMEOUT):
+        self.size = size
+        self.timeout = timeout
+        self.slots = asyncio.Semaphore(size)
+        self.idle = OrderedDict()
+        self.in_use = 0
+        self.opened = 0
+        self.peak = 0
+
+    async def acquire(self, host, port):
+        await self.slots.acquire()
+        self.in_use += 1
+        conn = self.idle.pop((host, port), None)
+        if conn is not None:
+            return conn
+        if self.in_use + len(self.idle) > self.size:
+            _, (_, writer) = self.idle.popitem(last=False)
+            writer.close()
+        try:
+            conn = await asyncio.wait_for(asyncio.open_connection(host, port), self.timeout)
+        except BaseException:
+            self.in_use -= 1
+            self.slots.release()
+            raise
+        self.opened += 1
+        self.peak = max(self.peak, self.in_use + len(self.idle))
+        return conn
+
+    def release(self, host, port, conn, reuse=True):
+        self.in_use -= 1
+        if reuse and (host, port) not in self.idle:
+            self.idle[(host, port)] = conn
+        else:
+            conn[1].close()
+        self.slots.release()
+
+    def close(self):
+        while self.idle:
+            self.idle.popitem()[1][1].close()
+
+async def send(pool, host, port, command, timeout=DEFAULT_TIMEOUT):
+    """
+    One command over a pooled connection; ebusd ends every answer with an
+    empty line, so the connection can carry the next command afterwards.
+    """
+    reader, writer = conn = await pool.acquire(host, port)
+    try:
+        writer.write(command.encode('utf-8') + b"\n")
+        await writer.drain()
+        answer = await asyncio.wait_for(reader.readuntil(b"\n\n"), timeout)
+    except BaseException:
+        pool.release(host, port, conn, reuse=False)
+        raise
+    pool.release(host, port, conn)
+    return [line for line in answer.decode('utf-8', errors='replace').split("\n") if line]
+
+async def poll_site(site, pool, results, period=DEFAULT_PERIOD, jitter=DEFAULT_JITTER,
+                    max_utilization=DEFAULT_MAX_UTILIZATION, timeout=DEFAULT_TIMEOUT, stop_at=None):
+    """
+    Polls the catalog of one gateway until stop_at (loop time). Messages are
+    due every period +-jitter, first due somewhere in their first period.
+    The bus allows one telegram at a time, so a gateway has at most one
+    request in flight and spends at most the bus share left over by the
+    broadcasts.
+    """
+    messages, passive = site_catalog(site['config'], site['poll'], period, max_utilization)
+    if not messages:
+        return
+    loop = asyncio.get_running_loop()
+    # Polls beyond this budget are delayed, never sent faster
+    rate = max(MIN_BUDGET, max_utilization - passive)
+    bucket = TokenBucket(rate, max(rate * BURST_SECONDS, max(m['airtime'] for m in messages)))
+    now = loop.time()
+    due = [(now + random.uniform(0, m['period']), i) for i, m in enumerate(messages)]
+    heapq.heapify(due)
+    failures = 0
+
+    while due:
+        when, i = heapq.heappop(due)
+        if stop_at is not None and when > stop_at:
+            break
+        await asyncio.sleep(max(0.0, when - loop.time()))
+        msg = messages[i]
+        await bucket.take(msg['airtime'])
+        if stop_at is not None and loop.time() > stop_at:
+            break
+
+        command = f"read -f -c {msg['circuit']} {msg['name']}"
+        started = time.perf_counter()
+        late = loop.time() - when
+        result = {'site': site['name'], 'circuit': msg['circuit'], 'name': msg['name'], 'ts': time.time()}
+        unreachable = False
+        try:
+            lines = await send(pool, site['host'], site['port'], command, timeout)
+        except asyncio.TimeoutError:
+            record_request(command, started, error_kind="timeout")
+            result['error'] = "timeout"
+        except (OSError, asyncio.IncompleteReadError) as e:
+            record_request(command, started, error_kind="other")
+            result['error'] = str(e) or type(e).__name__
+            unreachable = True
+        else:
+            record_request(command, started, lines)
+            if not lines or lines[0].startswith("ERR"):
+                result['error'] = lines[0] if lines else "no answer"
+            else:
+                result['value'] = lines[0]
+        result['latency'] = time.perf_counter() - started
+        result['late'] = late
+        await results.put(result)
+
+        heapq.heappush(due, (when + msg['period'] * (1 + random.uniform(-jitter, jitter)), i))
+        if unreachable:
+            # Back off instead of failing every message of a dead gateway
+            failures += 1
+            backoff = min(MAX_BACKOFF, 2 ** failures)
+            if stop_at is not None:
+                backoff = min(backoff, max(0.0, stop_at - loop.time()))
+            await asyncio.sleep(backoff)
+        else:
+            failures = 0
+
+def new_stats():
+    # Latencies go into the bus_metrics buckets (plus +Inf) so a long run keeps constant memory
+    return {'results': 0, 'errors': 0, 'latency_buckets': [0] * (len(LATENCY_BUCKETS) + 1), 'max_latency': 0.0,
+            'max_late': 0.0, 'started': time.monotonic()}
+
+def latency_percentile(stats, p):
+    """
+    Upper bound of the bucket holding the p-th latency (the largest
+    latency seen for the +Inf bucket), or 0.0 without results.
+    """
+    counts = stats['latency_buckets']
+    rank = p * sum(counts)
+    seen = 0
+    for bound, count in zip(LATENCY_BUCKETS, counts):
+        seen += count
+        if count and seen >= rank:
+            return min(bound, stats['max_latency'])
+    return stats['max_latency']
+
+async def consume(results, out=None, stats=None):
+    """
+    Single sink for the results of all gateways: JSON lines to `out` and
+    the counters of the summary.
+    """
+    while True:
+        result = await results.get()
+        if result is None:
+            return
+        if stats is not None:
+            stats['results'] += 1
+            stats['errors'] += 'error' in result
+            stats['latency_buckets'][bisect.bisect_left(LATENCY_BUCKETS, result['latency'])] += 1
+            stats['max_latency'] = max(stats['max_latency'], result['latency'])
+            stats['max_late'] = max(stats['max_late'], result['late'])
+        if out is not None:
+            out.write(json.dumps(result) + "\n")
+
+async def run_fleet(sites, pool_size=DEFAULT_POOL_SIZE, duration=None, out=None, **options):
+    pool = ConnectionPool(pool_size, options.get('timeout', DEFAULT_TIMEOUT))
+    results = asyncio.Queue(maxsize=10000)
+    stats = new_stats()
+    sink = asyncio.create_task(consume(results, out, stats))
+    stop_at = asyncio.get_running_loop().time() + duration if duration else None
+    try:
+        await asyncio.gather(*(poll_site(site, pool, results, stop_at=stop_at, **options) for site in sites))
+    finally:
+        await results.put(None)
+        await sink
+        pool.close()
+    stats['pool_peak'] = pool.peak
+    stats['pool_opened'] = pool.opened
+    return stats
+
+async def start_simulated_gateway(host="127.0.0.1", port=0, latency=(0.03, 0.15), error_rate=0.01):
+    """
+    Stand-in for an ebusd command port: answers every line after a random
+    bus time, one request at a time like the real bus, with the occasional
+    ERR line. Returns (server, port).
+    """
+    bus = asyncio.Lock()
+
+    async def handle(reader, writer):
+        try:
+            while await reader.readline():
+                async with bus:
+                    await asyncio.sleep(random.uniform(*latency))
+                answer = "ERR: read timeout" if random.random() < error_rate else str(random.randint(0, 255))
+                writer.write(answer.encode('utf-8') + b"\n\n")
+                await writer.drain()
+        except (ConnectionError, asyncio.CancelledError):
+            # Client gone, or the loop shuts down with the connection open
+            pass
+        finally:
+            writer.close()
+
+    server = await asyncio.start_server(handle, host, port)
+    return server, server.sockets[0].getsockname()[1]
+
+async def simulate(count, config_dir=CONFIG_DIR, poll_file=None, **kwargs):
+    servers = []
+    sites = []
+    for i in range(count):
+        server, port = await start_simulated_gateway()
+        servers.append(server)
+        sites.append({'name': f"sim{i:03d}", 'host': "127.0.0.1", 'port': port, 'config': config_dir, 'poll': poll_file})
+    try:
+        return await run_fleet(sites, **kwargs)
+    finally:
+        for server in servers:
+            server.close()
+
+def print_summary(stats, sites):
+    elapsed = time.monotonic() - stats['started']
+    pct = lambda p: latency_percentile(stats, p) * 1000
+    print(f"{sites} gateway(s), {stats['results']} results in {elapsed:.1f} s "
+          f"({stats['results'] / elapsed if elapsed else 0:.1f}/s), {stats['errors']} error(s)", file=sys.stderr)
+    print(f"  latency p50 <= {pct(0.5):.0f} ms, p95 <= {pct(0.95):.0f} ms, max {pct(1.0):.0f} ms, max schedule lag {stats['max_late']:.2f} s, "
+          f"connections opened {stats['pool_opened']}, peak open {stats['pool_peak']}", file=sys.stderr)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Poll many ebusd gateways from one process.")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p_run = sub.add_parser("run", help="poll the gateways of a site list")
+    p_run.add_argument("sites", help="site list, one 'name host[:port] [config dir] [poll file]' per line")
+
+    p_sim = sub.add_parser("simulate", help="poll local simulated gateways")
+    p_sim.add_argument("--sites", type=int, default=100, help="number of simulated gateways (default: 100)")
+    p_sim.add_argument("--config", default=CONFIG_DIR, help="config dir of every simulated site (default: the parent directory)")
+    p_sim.add_argument("--poll", help="poll list of every simulated site")
+
+    for p in (p_run, p_sim):
+        p.add_argument("--pool", type=int, default=DEFAULT_POOL_SIZE,
+                       help=f"open ebusd connections over all gateways (default: {DEFAULT_POOL_SIZE})")
+        p.add_argument("--period", type=float, default=DEFAULT_PERIOD,
+                       help=f"period of every r message for sites without poll file (default: {DEFAULT_PERIOD:g} s)")
+        p.add_argument("--jitter", type=float, default=DEFAULT_JITTER,
+                       help=f"relative jitter on every period (default: {DEFAULT_JITTER})")
+        p.add_argument("--max-utilization", type=float, default=DEFAULT_MAX_UTILIZATION,
+                       help=f"bus share per gateway incl. broadcasts (default: {DEFAULT_MAX_UTILIZATION})")
+        p.add_argument("--timeout", type=float, default=DEFAULT_TIMEOUT)
+        p.add_argument("--duration", type=float, help="stop after N seconds (default: run until interrupted)")
+        p.add_argument("-o", "--output", help="write results as JSON lines here ('-' for stdout)")
+        p.add_argument("--metrics-port", type=int, help="serve OpenMetrics on this port")
+    args = parser.parse_args()
+
+    if args.metrics_port:
+        serve_metrics(DEFAULT_METRICS_HOST, args.metrics_port)
+    out = None
+    if args.output == "-":
+        out = sys.stdout
+    elif args.output:
+        out = open(args.output, 'w')
+    options = {'pool_size': args.pool, 'duration': args.duration, 'out': out, 'period': args.period,
+               'jitter': args.jitter, 'max_utilization': args.max_utilization, 'timeout': args.timeout}
+    try:
+        if args.command == "run":
+            sites = load_sites(args.sites)
+            stats = asyncio.run(run_fleet(sites, **options))
+            count = len(sites)
+        else:
+            stats = asyncio.run(simulate(args.sites, args.config, args.poll, **options))
+            count = args.sites
+        print_summary(stats, count)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        if out is not None and out is not sys.stdout:
+            out.close()
@@ -1,5 +1,15 @@
 import os
 import glob
+import argparse
+
+from phase_profiler import NullProfiler, PhaseProfiler, dump_cprofile
+from dl_types import load_dl_types, assign_symbol_types
+
+ACTUAL_SECTIONS = ["RAM", "Bits", "SFR", "Konstanten", "External RAM (XRAM)", "EOF"]
+SECTION_FOOTERS = [
+    b"Liste der RAM-Daten", b"Bit-Liste", b"SFR-Liste",
+    b"Liste der Konstanten", b"Liste der XRAM-Daten"
+]
 
 def calculate_weishaupt_crc_multi(hex_payload_string):
     data_bytes = bytes.fromhex(hex_payload_string)
@@ -14,29 +24,25 @@ def calculate_weishaupt_crc_multi(hex_payload_string):
         crc ^= next_byte
     return crc
 
-def get_payload_key(section, address):
+def get_payload_key(section, address, size=1):
     cc = address >> 8
     yy = address & 0xFF
     yy_hex = f"{yy:02X}"
-    if section == "RAM" and cc == 0x00: return f"01{yy_hex}"
+    # High nibble of the opcode is the byte count minus one
+    n = (size - 1) << 4
+    if section == "RAM" and cc == 0x00: return f"{0x01 | n:02X}{yy_hex}"
     if section == "Konstanten":
-        if cc == 0x00: return f"02{yy_hex}"
-        if cc == 0x01: return f"060102{yy_hex}"
-        if cc == 0x02: return f"060202{yy_hex}"
-        if cc == 0x03: return f"060302{yy_hex}"
-    if section == "External RAM (XRAM)" and cc == 0xF0: return f"03{yy_hex}"
-    if section == "SFR" and cc == 0x00: return f"04{yy_hex}"
+        if cc == 0x00: return f"{0x02 | n:02X}{yy_hex}"
+        if cc == 0x01: return f"0601{0x02 | n:02X}{yy_hex}"
+        if cc == 0x02: return f"0602{0x02 | n:02X}{yy_hex}"
+        if cc == 0x03: return f"0603{0x02 | n:02X}{yy_hex}"
+    if section == "External RAM (XRAM)" and cc == 0xF0: return f"{0x03 | n:02X}{yy_hex}"
+    if section == "SFR" and cc == 0x00: return f"{0x04 | n:02X}{yy_hex}"
     return f"UNKNOWN_{section}_{address:04X}"
 
-def parse_syc_to_ebusd(filepath):
-    with open(filepath, 'rb') as f:
-        data = f.read()
-    
-    actual_sections = ["RAM", "Bits", "SFR", "Konstanten", "External RAM (XRAM)", "EOF"]
-    section_footers = [
-        b"Liste der RAM-Daten", b"Bit-Liste", b"SFR-Liste",
-        b"Liste der Konstanten", b"Liste der XRAM-Daten"
-    ]
+def extract_syc_symbols(data):
+    actual_sections = ACTUAL_SECTIONS
+    section_footers = SECTION_FOOTERS
 
     section_idx = 0
     current_section = actual_sections[section_idx]
@@ -95,6 +101,11 @@ def parse_syc_to_ebusd(filepath):
                     continue
         offset += 1
 
+    return raw_registers, parent_map, raw_bits
+
+def link_bits_to_parents(raw_registers, parent_map, raw_bits):
+    actual_sections = ACTUAL_SECTIONS
+
     # --- PASS 2: 8051 Math to Link Bits to Parents ---
     for bit in raw_bits:
         bit_addr = bit['address']
@@ -121,19 +132,30 @@ def parse_syc_to_ebusd(filepath):
         for p_reg in parent_map[parent_key]:
             p_reg['bits'].append({'name': bit['name'], 'pos': bit_addr % 8})
 
+def build_ebusd_records(raw_registers):
     # --- PASS 3: Generate the ebusd CSV lines ---
-    parsed_records = []
-    seen_payloads = {}
-
+    # Registers sharing a payload are the same memory cell: group them so the
+    # first symbol gets the only physical read and the rest fan out as aliases.
+    # 16-bit values (see dl_types.assign_symbol_types) get one two-byte read.
+    # SFRs are never grouped: paged SFRs share an address but are different
+    # registers (0xCA is ADC_CHCTR0, CRCL or RCAP2L depending on the page).
+    payload_groups = {}
     for reg in raw_registers:
-        payload = get_payload_key(reg['section'], reg['address'])
+        size = 1 if reg['bits'] else reg.get('size', 1)
+        payload = get_payload_key(reg['section'], reg['address'], size)
         if "UNKNOWN" in payload: continue
-            
-        # Check for Duplicates
-        is_duplicate = payload in seen_payloads
-        original_name = seen_payloads.get(payload, "")
-        if not is_duplicate:
-            seen_payloads[payload] = reg['name']
+        group_key = (payload, reg['name']) if reg['section'] == "SFR" else payload
+        if group_key not in payload_groups:
+            payload_groups[group_key] = []
+        payload_groups[group_key].append(reg)
+
+    parsed_records = []
+    alias_rows = []
+
+    for group_key, group in payload_groups.items():
+        payload = group_key[0] if isinstance(group_key, tuple) else group_key
+        reg = group[0]
+        aliases = [alias['name'] for alias in group[1:]]
 
         crc_val = calculate_weishaupt_crc_multi(payload)
         crc_hex = f"{crc_val:02X}"
@@ -161,23 +183,27 @@ def parse_syc_to_ebusd(filepath):
         # Build lines 
         r_line = f'r,,{reg["name"]},{addr_hex},,,,"{crc_hex}{payload}",,{r_fields_str}'
         w_line = f'w,,{reg["name"]},{addr_hex},,,,"{crc_hex}{payload}",,{w_fields_str}'
-        
-        if is_duplicate:
-            r_line = f"# {r_line:<90} # Alias of {original_name}"
-            w_line = f"# {w_line:<90} # Alias of {original_name}"
+        lines = f"{r_line}\n{w_line}"
+
+        if aliases:
+            lines += f"\n# Aliases of {reg['name']}: {', '.join(aliases)}"
+            for alias in aliases:
+                alias_rows.append(f"{alias},{reg['name']},{reg['section']},{addr_hex}")
             
         parsed_records.append({
             'section': reg['section'],
             'section_idx': reg['section_idx'],
             'cc': reg['address'] >> 8,
             'yy': reg['address'] & 0xFF,
-            'lines': f"{r_line}\n{w_line}"
+            'lines': lines
         })
 
     # Sort primarily by Section Index, then CC, then YY
     parsed_records.sort(key=lambda r: (r['section_idx'], r['cc'], r['yy']))
 
-    out_filepath = os.path.splitext(filepath)[0] + ".inc"
+    return parsed_records, alias_rows
+
+def write_ebusd_inc(out_filepath, parsed_records, alias_rows):
     with open(out_filepath, 'w') as out_f:
         out_f.write("# type,circuit,name,comment,QQ,ZZ,PBSB,ID,class,name,type,divider,unit,str\n")
         out_f.write('*r,,,,,,"5000",,,,,,,\n')
@@ -190,17 +216,110 @@ def parse_syc_to_ebusd(filepath):
                 out_f.write(f"\n# --- {current_print_section} ---\n")
             out_f.write(record['lines'] + "\n")
             
-    print(f"  -> Generated {out_filepath} ({len(parsed_records)} mapped registers)")
+    alias_filepath = os.path.splitext(out_filepath)[0] + ".alias.csv"
+    with open(alias_filepath, 'w') as out_f:
+        out_f.write("# alias,message,section,address\n")
+        for row in alias_rows:
+            out_f.write(row + "\n")
+
+def parse_syc_to_ebusd(filepath, out_filepath=None, profiler=None, dl_types=None):
+    if profiler is None:
+        profiler = NullProfiler()
+    if out_filepath is None:
+        out_filepath = os.path.splitext(filepath)[0] + ".inc"
+
+    profiler.start_file(filepath)
+    try:
+        with profiler.phase("read") as stats:
+            with open(filepath, 'rb') as f:
+                data = f.read()
+            stats['bytes'] = len(data)
+
+        with profiler.phase("pass1_extract") as stats:
+            raw_registers, parent_map, raw_bits = extract_syc_symbols(data)
+            stats['bytes'] = len(data)
+            stats['symbols'] = len(raw_registers) + len(raw_bits)
+
+        with profiler.phase("pass2_link_bits") as stats:
+            link_bits_to_parents(raw_registers, parent_map, raw_bits)
+            stats['symbols'] = len(raw_bits)
+
+        # After the bit pass, so the synthetic BYTE_xx parents count as named cells
+        with profiler.phase("types") as stats:
+            assign_symbol_types(raw_registers, load_dl_types() if dl_types is None else dl_types)
+            stats['symbols'] = len(raw_registers)
+
+        with profiler.phase("pass3_format") as stats:
+            parsed_records, alias_rows = build_ebusd_records(raw_registers)
+            stats['symbols'] = len(raw_registers)
+
+        with profiler.phase("write") as stats:
+            write_ebusd_inc(out_filepath, parsed_records, alias_rows)
+            stats['bytes'] = os.path.getsize(out_filepath)
+            stats['symbols'] = len(parsed_records)
+    finally:
+        profiler.end_file()
+
+    print(f"  -> Generated {out_filepath} ({len(parsed_records)} mapped registers, {len(alias_rows)} aliases)")
+
+def load_alias_map(alias_filepath):
+    """
+    Loads the alias sidecar written by parse_syc_to_ebusd.
+
+    Returns a dict mapping each physical message name to the list of alias
+    names that decode from the same memory cell.
+    """
+    alias_map = {}
+    with open(alias_filepath, 'r') as f:
+        for line in f:
+            line = line.strip()
+            if not line or line.startswith('#'): continue
+            alias, message = line.split(',')[:2]
+            if message not in alias_map:
+                alias_map[message] = []
+            alias_map[message].append(alias)
+    return alias_map
+
+def fan_out_aliases(values, alias_map):
+    """
+    Copies every decoded message value to all of its alias names, so a single
+    bus read answers for every symbol mapped to the same payload.
+
+    Args:
+        values (dict): Decoded values keyed by physical message name.
+        alias_map (dict): As returned by load_alias_map().
+    """
+    fanned = dict(values)
+    for message, value in values.items():
+        for alias in alias_map.get(message, []):
+            fanned[alias] = value
+    return fanned
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generate ebusd .inc files from Weishaupt .SYC symbol files.")
+    parser.add_argument("--profile", metavar="REPORT.json",
+                        help="record per-phase timing and throughput into a JSON report")
+    parser.add_argument("--cprofile", metavar="OUT.prof",
+                        help="with --profile: also dump a cProfile of the slowest file")
+    parser.add_argument("--profile-memory", action="store_true",
+                        help="with --profile: trace peak memory per phase (slows the timed run down)")
+    args = parser.parse_args()
+
     syc_files = glob.glob("*.SYC") + glob.glob("*.syc")
     syc_files = list(set(syc_files))
     
     if not syc_files:
         print("No .SYC files found in the current directory.")
     else:
+        profiler = PhaseProfiler("generate_ebusd_csv", args.profile_memory) if args.profile else None
         print(f"Found {len(syc_files)} symbol files. Starting batch processing...\n")
+        dl_types = load_dl_types()
         for file in syc_files:
             print(f"Processing {file}...")
-            parse_syc_to_ebusd(file)
-        print("\nAll files processed successfully!")
\ No newline at end of file
+            parse_syc_to_ebusd(file, profiler=profiler, dl_types=dl_types)
+        print("\nAll files processed successfully!")
+
+        if profiler:
+            profiler.write_report(args.profile)
+            if args.cprofile:
+                dump_cprofile(parse_syc_to_ebusd, profiler.slowest_file(), args.cprofile)
@@ -1,106 +1,163 @@
 import os
 import glob
+import argparse
+
+from phase_profiler import NullProfiler, PhaseProfiler, dump_cprofile
+from dl_types import load_dl_types, assign_symbol_types
+
+ACTUAL_SECTIONS = ["RAM", "Bits", "SFR", "Konstanten", "External RAM (XRAM)", "EOF"]
+SECTION_FOOTERS = [
+    b"Liste der RAM-Daten", b"Bit-Liste", b"SFR-Liste",
+    b"Liste der Konstanten", b"Liste der XRAM-Daten"
+]
+
+def extract_template_lines(data, dl_types):
+    actual_sections = ACTUAL_SECTIONS
+    section_footers = SECTION_FOOTERS
+
+    section_idx = 0
+    current_section = actual_sections[section_idx]
+
+    grouped_templates = {sec: {} for sec in actual_sections}
+    seen_names = set()
+
+    offset = 0
+    while offset < len(data) - 2:
+        found_footer = False
+        for footer in section_footers:
+            if data[offset:offset+len(footer)] == footer:
+                section_idx += 1
+                if section_idx < len(actual_sections):
+                    current_section = actual_sections[section_idx]
+                offset += len(footer)
+                found_footer = True
+                break
+
+        if found_footer: continue
+
+        length = data[offset]
+        if 2 < length < 40:
+            name_bytes = data[offset+1 : offset+1+length]
+            valid_chars = b'ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz0123456789_+'
+
+            if all(b in valid_chars for b in name_bytes):
+                name = name_bytes.decode('ascii')
+                meta = data[offset+1+length : offset+1+length+2]
+
+                if len(meta) == 2:
+                    # We still check seen_names so we don't write identical lines
+                    # if the exact same name appears twice in the SYC file.
+                    if name not in seen_names:
+                        seen_names.add(name)
+                        address = int.from_bytes(meta, byteorder='little')
+
+                        grouped_templates[current_section][name] = {
+                            'name': name,
+                            'section': current_section,
+                            'address': address
+                        }
+
+                    offset += 1 + length + 2
+                    if offset + 1 < len(data) and data[offset] == 0x79 and data[offset+1] == 0x05:
+                        offset += 2
+                    continue
+        offset += 1
+
+    # Types need the whole section layout, so the lines are built last
+    registers = [item for section, items in grouped_templates.items() if section != "Bits" for item in items.values()]
+    assign_symbol_types(registers, dl_types, grouped_templates["Bits"].values())
+    for section, items in grouped_templates.items():
+        for item in items.values():
+            name = item['name']
+            address = item['address']
+            if section == "Bits":
+                template_line = f"_{name}:{name},BI{address % 8},,,"
+            else:
+                template_line = f"_{name}:{name},{item['type']},,,"
+            item['line'] = f"{template_line:<40} # 0x{address:04X}"
+
+    return grouped_templates, seen_names
+
+def write_template_inc(out_filepath, grouped_templates):
+    with open(out_filepath, 'w') as out_f:
+        out_f.write("# ebusd template definitions\n")
+        for section in ACTUAL_SECTIONS:
+            if grouped_templates[section]:
+                out_f.write(f"\n# =========================================\n")
+                out_f.write(f"# --- {section} ---\n")
+                out_f.write(f"# =========================================\n")
+
+                sorted_items = sorted(grouped_templates[section].values(), key=lambda item: item['address'])
+                prev_byte_addr = None
+
+                for item in sorted_items:
+                    address = item['address']
+                    if section == "Bits":
+                        byte_addr = address // 8
+                        if prev_byte_addr is not None and byte_addr != prev_byte_addr:
+                            out_f.write("\n")
+                        prev_byte_addr = byte_addr
+                    out_f.write(item['line'] + "\n")
+
+def generate_template_file(filepath, out_filepath=None, profiler=None, dl_types=None):
+    if profiler is None:
+        profiler = NullProfiler()
+    if dl_types is None:
+        dl_types = load_dl_types()
+    if out_filepath is None:
+        out_filepath = os.path.splitext(filepath)[0] + "_template.inc"
+
+    profiler.start_file(filepath)
+    try:
+        with profiler.phase("read") as stats:
+            with open(filepath, 'rb') as f:
+                data = f.read()
+            stats['bytes'] = len(data)
+
+        with profiler.phase("extract") as stats:
+            grouped_templates, seen_names = extract_template_lines(data, dl_types)
+            stats['bytes'] = len(data)
+            stats['symbols'] = len(seen_names)
+
+        with profiler.phase("write") as stats:
+            write_template_inc(out_filepath, grouped_templates)
+            stats['bytes'] = os.path.getsize(out_filepath)
+            stats['symbols'] = len(seen_names)
+    finally:
+        profiler.end_file()
+
+    print(f"  -> Generated {out_filepath} ({len(seen_names)} active templates)")
+
+def generate_template_files(profiler=None, syc_files=None):
+    # Default: all .SYC files in the current folder (handles both .SYC and .syc)
+    if not syc_files:
+        syc_files = list(set(glob.glob("*.SYC") + glob.glob("*.syc")))
 
-def generate_template_files():
-    # Find all .SYC files in the current folder (handles both .SYC and .syc)
-    syc_files = glob.glob("*.SYC") + glob.glob("*.syc")
-    syc_files = list(set(syc_files))
-    
     if not syc_files:
         print("No .SYC files found in the current directory.")
         return
 
-    actual_sections = ["RAM", "Bits", "SFR", "Konstanten", "External RAM (XRAM)", "EOF"]
-    section_footers = [
-        b"Liste der RAM-Daten", b"Bit-Liste", b"SFR-Liste",
-        b"Liste der Konstanten", b"Liste der XRAM-Daten"
-    ]
-
     print(f"Found {len(syc_files)} symbol files. Generating templates...\n")
 
+    dl_types = load_dl_types()
     for filepath in syc_files:
         print(f"Processing {filepath}...")
-        with open(filepath, 'rb') as f:
-            data = f.read()
-
-        section_idx = 0
-        current_section = actual_sections[section_idx]
-        
-        grouped_templates = {sec: {} for sec in actual_sections}
-        seen_names = set()
-
-        offset = 0
-        while offset < len(data) - 2:
-            found_footer = False
-            for footer in section_footers:
-                if data[offset:offset+len(footer)] == footer:
-                    section_idx += 1
-                    if section_idx < len(actual_sections):
-                        current_section = actual_sections[section_idx]
-                    offset += len(footer)
-                    found_footer = True
-                    break
-            
-            if found_footer: continue
-
-            length = data[offset]
-            if 2 < length < 40:
-                name_bytes = data[offset+1 : offset+1+length]
-                valid_chars = b'ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz0123456789_+'
-                
-                if all(b in valid_chars for b in name_bytes):
-                    name = name_bytes.decode('ascii')
-                    meta = data[offset+1+length : offset+1+length+2]
-                    
-                    if len(meta) == 2:
-                        # We still check seen_names so we don't write identical lines 
-                        # if the exact same name appears twice in the SYC file.
-                        if name not in seen_names:
-                            seen_names.add(name)
-                            address = int.from_bytes(meta, byteorder='little')
-                            
-                            if current_section == "Bits":
-                                bit_pos = address % 8
-                                template_line = f"_{name}:{name},BI{bit_pos},,,"
-                            else:
-                                template_line = f"_{name}:{name},UCH,,,"
-                                
-                            template_line = f"{template_line:<40} # 0x{address:04X}"
-                            
-                            grouped_templates[current_section][name] = {
-                                'address': address,
-                                'line': template_line
-                            }
-                        
-                        offset += 1 + length + 2
-                        if offset + 1 < len(data) and data[offset] == 0x79 and data[offset+1] == 0x05:
-                            offset += 2
-                        continue
-            offset += 1
-
-        out_filepath = os.path.splitext(filepath)[0] + "_template.inc"
-        
-        with open(out_filepath, 'w') as out_f:
-            out_f.write("# ebusd template definitions\n")
-            for section in actual_sections:
-                if grouped_templates[section]:
-                    out_f.write(f"\n# =========================================\n")
-                    out_f.write(f"# --- {section} ---\n")
-                    out_f.write(f"# =========================================\n")
-                    
-                    sorted_items = sorted(grouped_templates[section].values(), key=lambda item: item['address'])
-                    prev_byte_addr = None
-                    
-                    for item in sorted_items:
-                        address = item['address']
-                        if section == "Bits":
-                            byte_addr = address // 8
-                            if prev_byte_addr is not None and byte_addr != prev_byte_addr:
-                                out_f.write("\n")
-                            prev_byte_addr = byte_addr
-                        out_f.write(item['line'] + "\n")
-                        
-        print(f"  -> Generated {out_filepath} ({len(seen_names)} active templates)")
+        generate_template_file(filepath, profiler=profiler, dl_types=dl_types)
 
 if __name__ == "__main__":
-    generate_template_files()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Generate ebusd template includes from Weishaupt .SYC symbol files.")
+    parser.add_argument("--profile", metavar="REPORT.json",
+                        help="record per-phase timing and throughput into a JSON report")
+    parser.add_argument("--cprofile", metavar="OUT.prof",
+                        help="with --profile: also dump a cProfile of the slowest file")
+    parser.add_argument("--profile-memory", action="store_true",
+                        help="with --profile: trace peak memory per phase (slows the timed run down)")
+    args = parser.parse_args()
+
+    profiler = PhaseProfiler("generate_ebusd_templates", args.profile_memory) if args.profile else None
+    generate_template_files(profiler=profiler)
+
+    if profiler and profiler.files:
+        profiler.write_report(args.profile)
+        if args.cprofile:
+            dump_cprofile(generate_template_file, profiler.slowest_file(), args.cprofile)
@@ -1,4 +1,5 @@
 import re
+import argparse
 
 def build_mapping_table(filepath):
     with open(filepath, 'r', encoding='utf-8', errors='ignore') as f:
@@ -100,5 +101,7 @@ def build_mapping_table(filepath):
             print(f"{ui:<35} | {syc}")
 
 if __name__ == "__main__":
-    # Ensure this matches the name of the dump file you saved
-    build_mapping_table("FUN_005b5c6c.txt")
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Map UI components to SYC variables from a disassembly dump.")
+    parser.add_argument("file", nargs='?', default="FUN_005b5c6c.txt", help="dump file (default: FUN_005b5c6c.txt)")
+    args = parser.parse_args()
+    build_mapping_table(args.file)
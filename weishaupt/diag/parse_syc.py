@@ -1,3 +1,5 @@
+import argparse
+
 def parse_syc_file(filepath):
     with open(filepath, 'rb') as f:
         data = f.read()
@@ -74,4 +76,7 @@ def parse_syc_file(filepath):
         offset += 1
 
 if __name__ == "__main__":
-    parse_syc_file("WH11928.SYC")
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="List the symbols of a Weishaupt .SYC file by section.")
+    parser.add_argument("file", nargs='?', default="WH11928.SYC", help="symbol file (default: WH11928.SYC)")
+    args = parser.parse_args()
+    parse_syc_file(args.file)
@@ -0,0 +1,137 @@
+import os
+import time
+from contextlib import contextmanager
+
+# cProfile, tracemalloc, json and platform are imported where they are used,
+# so tools that only need NullProfiler start without them.
+
+class NullProfiler:
+    """
+    Drop-in profiler that records nothing. The generators use it when
+    --profile is not given, so the hot path only pays for an empty with-block.
+    """
+    def start_file(self, filepath):
+        pass
+
+    def end_file(self):
+        pass
+
+    @contextmanager
+    def phase(self, name):
+        yield {}
+
+class PhaseProfiler:
+    """
+    Records wall time and throughput per phase and per file. Peak memory is
+    only traced with trace_memory=True: tracemalloc slows allocation-heavy
+    code down several times, so take timings and memory in separate runs.
+
+    Usage:
+        profiler = PhaseProfiler("generate_ebusd_csv")
+        profiler.start_file("WH11928.SYC")
+        with profiler.phase("pass1_extract") as stats:
+            ...
+            stats['bytes'] = len(data)
+            stats['symbols'] = len(symbols)
+        profiler.end_file()
+        profiler.write_report("profile.json")
+    """
+    def __init__(self, tool, trace_memory=False):
+        self.tool = tool
+        self.trace_memory = trace_memory
+        self.files = []
+        self._current = None
+        self._file_start = None
+        if trace_memory:
+            import tracemalloc
+            if not tracemalloc.is_tracing():
+                tracemalloc.start()
+
+    def start_file(self, filepath):
+        self._current = {
+            'file': os.path.basename(filepath),
+            'bytes': os.path.getsize(filepath) if os.path.exists(filepath) else 0,
+            'phases': []
+        }
+        self._file_start = time.perf_counter()
+
+    def end_file(self):
+        self._current['wall_s'] = time.perf_counter() - self._file_start
+        self.files.append(self._current)
+        self._current = None
+
+    @contextmanager
+    def phase(self, name):
+        stats = {'bytes': 0, 'symbols': 0}
+        if self.trace_memory:
+            import tracemalloc
+            tracemalloc.reset_peak()
+            base_mem = tracemalloc.get_traced_memory()[0]
+        start = time.perf_counter()
+        try:
+            yield stats
+        finally:
+            wall = time.perf_counter() - start
+            peak = tracemalloc.get_traced_memory()[1] - base_mem if self.trace_memory else None
+            self._current['phases'].append({
+                'name': name,
+                'wall_s': wall,
+                'bytes': stats['bytes'],
+                'symbols': stats['symbols'],
+                'bytes_per_s': stats['bytes'] / wall if wall > 0 else 0.0,
+                'symbols_per_s': stats['symbols'] / wall if wall > 0 else 0.0,
+                'peak_mem_bytes': max(peak, 0) if peak is not None else None
+            })
+
+    def slowest_file(self):
+        if not self.files:
+            return None
+        return max(self.files, key=lambda f: f['wall_s'])['file']
+
+    def summary(self):
+        totals = {}
+        for file_entry in self.files:
+            for p in file_entry['phases']:
+                if p['name'] not in totals:
+                    totals[p['name']] = {'wall_s': 0.0, 'bytes': 0, 'symbols': 0,
+                                         'peak_mem_bytes': 0 if self.trace_memory else None}
+                t = totals[p['name']]
+                t['wall_s'] += p['wall_s']
+                t['bytes'] += p['bytes']
+                t['symbols'] += p['symbols']
+                if p['peak_mem_bytes'] is not None:
+                    t['peak_mem_bytes'] = max(t['peak_mem_bytes'], p['peak_mem_bytes'])
+        for t in totals.values():
+            t['bytes_per_s'] = t['bytes'] / t['wall_s'] if t['wall_s'] > 0 else 0.0
+            t['symbols_per_s'] = t['symbols'] / t['wall_s'] if t['wall_s'] > 0 else 0.0
+        return totals
+
+    def write_report(self, report_path):
+        import json
+        import platform
+        report = {
+            'tool': self.tool,
+            'created': time.strftime("%Y-%m-%dT%H:%M:%S"),
+            'python': platform.python_version(),
+            'machine': platform.machine(),
+            'trace_memory': self.trace_memory,
+            'total_wall_s': sum(f['wall_s'] for f in self.files),
+            'slowest_file': self.slowest_file(),
+            'phases': self.summary(),
+            'files': self.files
+        }
+        with open(report_path, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"  -> Wrote profile report {report_path} ({len(self.files)} files)")
+        return report
+
+def dump_cprofile(func, filepath, out_path):
+    """
+    Re-runs func(filepath) under cProfile and writes the stats to out_path,
+    readable with `python -m pstats out_path` or snakeviz.
+    """
+    import cProfile
+    profile = cProfile.Profile()
+    profile.runcall(func, filepath)
+    profile.dump_stats(out_path)
+    print(f"  -> Wrote cProfile dump of {filepath} to {out_path}")
@@ -0,0 +1,154 @@
+from generate_ebusd_csv import calculate_weishaupt_crc_multi
+
+# Weishaupt memory access over PBSB 5000 (read) / 5001 (write).
+#
+# The request data is a CRC byte followed by one or more chained elements.
+# An element is an opcode byte and the low address byte; the high nibble of
+# the opcode is the byte count minus one, e.g. from the chained test data
+#   0122015B115F01660168  -> RAM 0x22, 0x5B, 0x5F..0x60, 0x66, 0x68
+#   0601 12 92            -> Konstanten page 1, 2 bytes from 0x92
+# Konstanten pages above 0 are selected with a "06 PP" prefix in front of the
+# element, matching get_payload_key() in generate_ebusd_csv.
+READ_PBSB = "5000"
+WRITE_PBSB = "5001"
+SECTION_OPCODES = {
+    "RAM": (0x01, 0x00),
+    "Konstanten": (0x02, None),
+    "External RAM (XRAM)": (0x03, 0xF0),
+    "SFR": (0x04, 0x00),
+}
+OPCODE_SECTIONS = {opcode: section for section, (opcode, _) in SECTION_OPCODES.items()}
+MAX_ELEMENT_BYTES = 16
+MAX_MASTER_BYTES = 16
+# The slave answer starts with one status byte (the _8_Skip field)
+MAX_RESPONSE_DATA = 15
+# Writes send the _8_Skip byte (IGN:1, see _templates.csv) ahead of the value
+WRITE_SKIP_BYTE = 0x00
+
+def element_bytes(section, address, count=1):
+    if section not in SECTION_OPCODES:
+        raise ValueError(f"Section {section} is not addressable over the bus")
+    if not 1 <= count <= MAX_ELEMENT_BYTES:
+        raise ValueError(f"Element length {count} out of range")
+    opcode, fixed_cc = SECTION_OPCODES[section]
+    cc = address >> 8
+    yy = address & 0xFF
+    head = (opcode | ((count - 1) << 4), yy)
+    if fixed_cc is None:
+        if cc == 0:
+            return bytes(head)
+        return bytes((0x06, cc) + head)
+    if cc != fixed_cc:
+        raise ValueError(f"Address 0x{address:04X} is outside the {section} window")
+    return bytes(head)
+
+def parse_elements(id_hex):
+    """
+    Decodes the ID of a 5000/5001 message (CRC + chained elements) into
+    (section, address, count) runs. Returns None if the ID is not a valid
+    element chain.
+    """
+    try:
+        body = bytes.fromhex(id_hex.strip().strip('"'))[1:]
+    except ValueError:
+        return None
+    runs = []
+    pos = 0
+    while pos < len(body):
+        cc = None
+        if body[pos] == 0x06 and pos + 3 < len(body):
+            cc = body[pos + 1]
+            pos += 2
+        if pos + 1 >= len(body):
+            return None
+        section = OPCODE_SECTIONS.get(body[pos] & 0x0F)
+        if section is None or (cc is not None and section != "Konstanten"):
+            return None
+        fixed_cc = SECTION_OPCODES[section][1]
+        page = cc if cc is not None else (fixed_cc or 0)
+        runs.append((section, (page << 8) | body[pos + 1], (body[pos] >> 4) + 1))
+        pos += 2
+    return runs or None
+
+def coalesce_cells(cells, max_run=MAX_RESPONSE_DATA):
+    """
+    Merges (section, address) cells into (section, start, count) runs of
+    adjacent addresses, never crossing a 256 byte page.
+    """
+    runs = []
+    for section, address in sorted(set(cells)):
+        if runs:
+            sec, start, count = runs[-1]
+            if (sec == section and address == start + count and count < max_run
+                    and (address >> 8) == (start >> 8)):
+                runs[-1] = (sec, start, count + 1)
+                continue
+        runs.append((section, address, 1))
+    return runs
+
+def pack_read_requests(runs, max_master=MAX_MASTER_BYTES, max_response=MAX_RESPONSE_DATA):
+    """
+    Packs runs into as few read requests as the request and response size
+    limits allow. Returns a list of run lists, one per request.
+    """
+    requests = []
+    current = []
+    master_len = 1
+    response_len = 0
+    for run in runs:
+        elem_len = len(element_bytes(*run))
+        if current and (master_len + elem_len > max_master or response_len + run[2] > max_response):
+            requests.append(current)
+            current = []
+            master_len = 1
+            response_len = 0
+        current.append(run)
+        master_len += elem_len
+        response_len += run[2]
+    if current:
+        requests.append(current)
+    return requests
+
+def build_payload(elements):
+    """
+    Returns the hex request data: CRC over everything that follows it.
+    """
+    body = b"".join(elements).hex().upper()
+    return f"{calculate_weishaupt_crc_multi(body):02X}{body}"
+
+def read_request_hex(runs):
+    return build_payload([element_bytes(*run) for run in runs])
+
+def write_request_hex(runs, data):
+    """
+    Returns the hex data of a write request laid out like the generated `w`
+    lines: CRC over the element(s), the element(s), the _8_Skip byte, then
+    the value bytes in run order.
+    """
+    if len(data) != sum(run[2] for run in runs):
+        raise ValueError(f"Write of {sum(run[2] for run in runs)} byte(s) got {len(data)} data byte(s)")
+    return f"{read_request_hex(runs)}{WRITE_SKIP_BYTE:02X}{bytes(data).hex().upper()}"
+
+def ebusd_hex_command(zz, pbsb, payload_hex):
+    """
+    Formats a request for the ebusd `hex` command: ZZ PBSB NN data.
+    """
+    return f"hex {zz}{pbsb}{len(payload_hex) // 2:02X}{payload_hex}"
+
+def decode_read_response(runs, response_hex):
+    """
+    Splits a read answer (NN, status byte, data) back into cell values.
+    Returns {(section, address): value}.
+    """
+    data = bytes.fromhex(response_hex.strip())
+    values = data[2:2 + data[0] - 1] if data else b""
+    expected = sum(run[2] for run in runs)
+    if len(values) != expected:
+        raise ValueError(f"Expected {expected} data bytes, got {len(values)}: {response_hex}")
+    cells = {}
+    pos = 0
+    for section, start, count in runs:
+        for i in range(count):
+            cells[(section, start + i)] = values[pos]
+            pos += 1
+    return cells
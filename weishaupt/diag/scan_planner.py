@@ -0,0 +1,210 @@
+import os
+import sys
+import json
+import argparse
+
+from generate_ebusd_csv import extract_syc_symbols
+from ebusd_config import CONFIG_DIR, read_messages, firmware_includes
+from dl_types import load_dl_types, assign_symbol_types, bit_parent_cell
+from register_requests import (READ_PBSB, MAX_RESPONSE_DATA, coalesce_cells, pack_read_requests,
+                               parse_elements, read_request_hex)
+
+DIAG_DIR = os.path.dirname(os.path.abspath(__file__))
+REGISTER_PBSB = "0902"
+
+# Address ranges a discovery scan covers per section (inclusive)
+SCAN_WINDOWS = {
+    "RAM": (0x0000, 0x00FF),
+    "SFR": (0x0080, 0x00FF),
+    "Konstanten": (0x0000, 0x03FF),
+    "External RAM (XRAM)": (0xF000, 0xF0FF),
+}
+SECTION_LABELS = {"RAM": "RAM", "SFR": "SFR", "Konstanten": "KON", "External RAM (XRAM)": "XRAM"}
+
+def load_known_messages(device_csv):
+    """
+    Walks a device CSV and its includes and collects the IDs of every read
+    message by PBSB: known[pbsb] = [id_hex, ...].
+    """
+    known = {}
+    for msg in read_messages(device_csv):
+        if msg['kind'] == 'r' and msg['pbsb'] and msg['id']:
+            known.setdefault(msg['pbsb'], []).append(msg['id'])
+    return known
+
+def firmware_syc_for(device_csv, syc_dir=DIAG_DIR):
+    """
+    The .SYC belonging to the firmware include of a device CSV
+    (08..bc1.csv -> WH11928.inc -> WH11928.SYC), or None.
+    """
+    for include in firmware_includes(device_csv)[:1]:
+        path = os.path.join(syc_dir, os.path.splitext(include)[0] + ".SYC")
+        return path if os.path.exists(path) else None
+    return None
+
+def syc_known_cells(syc_path):
+    """
+    Memory cells named in a .SYC table, including the low byte of 16-bit
+    values. Bits mark their parent byte, using the same 8051 math as
+    link_bits_to_parents().
+    """
+    with open(syc_path, 'rb') as f:
+        raw_registers, _, raw_bits = extract_syc_symbols(f.read())
+    assign_symbol_types(raw_registers, load_dl_types(), raw_bits)
+    cells = {(reg['section'], reg['address'] + i) for reg in raw_registers for i in range(reg['size'])}
+    cells.update(bit_parent_cell(bit['address']) for bit in raw_bits)
+    return cells
+
+def message_known_cells(id_list):
+    cells = set()
+    for id_hex in id_list:
+        for section, start, count in parse_elements(id_hex) or []:
+            cells.update((section, start + i) for i in range(count))
+    return cells
+
+def memory_gaps(known_cells, windows=SCAN_WINDOWS):
+    """
+    Returns the unmapped (section, address) cells of every scan window.
+    """
+    gaps = []
+    for section, (first, last) in windows.items():
+        gaps.extend((section, a) for a in range(first, last + 1) if (section, a) not in known_cells)
+    return gaps
+
+def plan_memory_scan(known_cells, windows=SCAN_WINDOWS, max_response=MAX_RESPONSE_DATA, chain=True):
+    """
+    Merges the unmapped cells into runs of at most max_response bytes and
+    packs them into as few 5000 read requests as the telegram limits allow.
+    Returns a list of (runs, payload_hex).
+    """
+    runs = coalesce_cells(memory_gaps(known_cells, windows), max_run=max_response)
+    if chain:
+        requests = pack_read_requests(runs, max_response=max_response)
+    else:
+        requests = [[run] for run in runs]
+    return [(req, read_request_hex(req)) for req in requests]
+
+def register_known_ids(id_list):
+    # "1A0A02" -> register 0x0A1A (little endian id, length byte dropped)
+    known = set()
+    for id_hex in id_list:
+        if len(id_hex) >= 4:
+            try:
+                known.add(int.from_bytes(bytes.fromhex(id_hex[:4]), byteorder='little'))
+            except ValueError:
+                continue
+    return known
+
+def plan_register_scan(known_ids, first=0x0000, last=0xFFFF, run=1):
+    """
+    Register sweep over PBSB 0902 without the already mapped IDs. With
+    run > 1, up to `run` adjacent unmapped registers share one request that
+    asks for 2 * run bytes; the default keeps the one-register requests of
+    scan/scan.
+    Returns a list of (start register, count, payload_hex).
+    """
+    planned = []
+    register = first
+    while register <= last:
+        if register in known_ids:
+            register += 1
+            continue
+        count = 1
+        while (count < run and register + count <= last and register + count not in known_ids
+               and 2 * (count + 1) <= MAX_RESPONSE_DATA):
+            count += 1
+        payload = register.to_bytes(2, byteorder='little').hex().upper() + f"{2 * count:02X}"
+        planned.append((register, count, payload))
+        register += count
+    return planned
+
+def _telegram(zz, pbsb, payload):
+    return f"{zz}{pbsb}{len(payload) // 2:02X}{payload}"
+
+def write_shell(lines, out):
+    # Same line format as scan/scan
+    for label, telegram in lines:
+        out.write(f"echo {label} ; ebusctl read -f -s ff  -h {telegram}\n")
+
+def memory_plan_lines(zz, plan):
+    lines = []
+    for runs, payload in plan:
+        label = ",".join(f"{SECTION_LABELS[section]}:{start:04X}+{count}" for section, start, count in runs)
+        lines.append((label, _telegram(zz, READ_PBSB, payload)))
+    return lines
+
+def register_plan_lines(zz, plan):
+    lines = []
+    for register, count, payload in plan:
+        label = payload[:4] if count == 1 else f"{payload[:4]}+{count}"
+        lines.append((label, _telegram(zz, REGISTER_PBSB, payload)))
+    return lines
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Plan a discovery scan that only reads addresses not yet mapped.")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p_mem = sub.add_parser("memory", help="5000 memory reads (RAM, SFR, Konstanten, XRAM)")
+    p_mem.add_argument("--device", default=os.path.join(CONFIG_DIR, "08..bc1.csv"),
+                       help="device CSV whose messages and includes are already known (default: 08..bc1.csv)")
+    p_mem.add_argument("--syc", help="symbol table of the firmware (default: from the firmware !include)")
+    p_mem.add_argument("--zz", default="08", help="target slave address (default: 08, bc1)")
+    p_mem.add_argument("--sections", nargs='+', choices=sorted(SCAN_WINDOWS), help="limit the scan to these sections")
+    p_mem.add_argument("--max-response", type=int, default=MAX_RESPONSE_DATA,
+                       help=f"data bytes per answer (default: {MAX_RESPONSE_DATA})")
+    p_mem.add_argument("--no-chain", action="store_true", help="one element per request")
+
+    p_reg = sub.add_parser("register", help="0902 register sweep like scan/scan")
+    p_reg.add_argument("--device", default=os.path.join(CONFIG_DIR, "15..ka.csv"),
+                       help="device CSV whose register includes are already known (default: 15..ka.csv)")
+    p_reg.add_argument("--zz", default="15", help="target slave address (default: 15, ka)")
+    p_reg.add_argument("--first", type=lambda v: int(v, 16), default=0x0000, help="first register, hex (default: 0000)")
+    p_reg.add_argument("--last", type=lambda v: int(v, 16), default=0xFFFF, help="last register, hex (default: FFFF)")
+    p_reg.add_argument("--run", type=int, default=1,
+                       help="adjacent unmapped registers per request (default: 1, as in scan/scan)")
+
+    for p in (p_mem, p_reg):
+        p.add_argument("--format", choices=("shell", "json"), default="shell")
+        p.add_argument("-o", "--output", help="write the plan here instead of stdout")
+
+    args = parser.parse_args(argv)
+    known = load_known_messages(args.device)
+
+    if args.command == "memory":
+        syc_path = args.syc or firmware_syc_for(args.device)
+        cells = message_known_cells(known.get(READ_PBSB, []))
+        if syc_path:
+            cells |= syc_known_cells(syc_path)
+        windows = {s: w for s, w in SCAN_WINDOWS.items() if not args.sections or s in args.sections}
+        plan = plan_memory_scan(cells, windows, args.max_response, not args.no_chain)
+        total = sum(last - first + 1 for first, last in windows.values())
+        unknown = sum(count for runs, _ in plan for _, _, count in runs)
+        lines = memory_plan_lines(args.zz, plan)
+        entries = [{'zz': args.zz, 'pbsb': READ_PBSB, 'data': payload,
+                    'runs': [[section, start, count] for section, start, count in runs]} for runs, payload in plan]
+        summary = (f"{total} cells, {total - unknown} known ({os.path.basename(syc_path) if syc_path else 'no .SYC'}), "
+                   f"{unknown} unmapped -> {len(plan)} request(s)")
+    else:
+        ids = register_known_ids(known.get(REGISTER_PBSB, []))
+        plan = plan_register_scan(ids, args.first, args.last, args.run)
+        total = args.last - args.first + 1
+        lines = register_plan_lines(args.zz, plan)
+        entries = [{'zz': args.zz, 'pbsb': REGISTER_PBSB, 'data': payload, 'register': register, 'count': count}
+                   for register, count, payload in plan]
+        summary = (f"{total} registers, {sum(1 for i in ids if args.first <= i <= args.last)} known, "
+                   f"{len(plan)} request(s)")
+
+    out = open(args.output, 'w') if args.output else sys.stdout
+    try:
+        if args.format == "json":
+            json.dump(entries, out, indent=1)
+            out.write("\n")
+        else:
+            write_shell(lines, out)
+    finally:
+        if args.output:
+            out.close()
+    print(f"  -> {summary}", file=sys.stderr)
+
+if __name__ == "__main__":
+    main()
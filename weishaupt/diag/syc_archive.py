@@ -0,0 +1,219 @@
+import os
+import sys
+import glob
+import zlib
+import struct
+import argparse
+from collections import OrderedDict
+
+from generate_ebusd_csv import ACTUAL_SECTIONS, extract_syc_symbols
+from syc_binary import print_lookup
+
+# Multi-firmware symbol archive (.wsa), zlib-compressed body:
+#
+#   names       u32 count, then u8 length + ASCII name   (every name once)
+#   base        firmware id, u32 count, records
+#   firmwares   u32 count, per firmware: id, u32 removed count + u32 base
+#               record indices, u32 added count + records
+#
+# A record is (section index u8, address u16, name id u32) using the section
+# order of generate_ebusd_csv.ACTUAL_SECTIONS, so "Bits" entries carry the
+# raw bit address just like pass 1 of parse_syc_to_ebusd.
+MAGIC = b"WSYA"
+FORMAT_VERSION = 1
+RECORD = struct.Struct('<BHI')
+DEFAULT_ARCHIVE = "firmware_symbols.wsa"
+
+def _firmware_records(syc_path):
+    with open(syc_path, 'rb') as f:
+        data = f.read()
+    raw_registers, _, raw_bits = extract_syc_symbols(data)
+    records = {(reg['section'], reg['address'], reg['name']) for reg in raw_registers}
+    records |= {("Bits", bit['address'], bit['name']) for bit in raw_bits}
+    return records
+
+def _pack_str(buf, text):
+    raw = text.encode('ascii')
+    buf += struct.pack('<B', len(raw)) + raw
+
+def build_archive(syc_files, out_path=DEFAULT_ARCHIVE):
+    firmwares = {}
+    for path in syc_files:
+        firmwares[os.path.splitext(os.path.basename(path))[0]] = _firmware_records(path)
+
+    # The base is the firmware with the smallest total delta to all others
+    def delta_cost(candidate):
+        base = firmwares[candidate]
+        return sum(len(base ^ other) for other in firmwares.values())
+    base_id = min(sorted(firmwares), key=delta_cost)
+
+    names = sorted({name for records in firmwares.values() for _, _, name in records})
+    name_ids = {name: i for i, name in enumerate(names)}
+    section_ids = {sec: i for i, sec in enumerate(ACTUAL_SECTIONS)}
+
+    def pack_record(buf, record):
+        section, address, name = record
+        buf += RECORD.pack(section_ids[section], address, name_ids[name])
+
+    body = bytearray()
+    body += struct.pack('<I', len(names))
+    for name in names:
+        _pack_str(body, name)
+
+    base_records = sorted(firmwares[base_id], key=lambda r: (section_ids[r[0]], r[1], r[2]))
+    base_index = {record: i for i, record in enumerate(base_records)}
+    _pack_str(body, base_id)
+    body += struct.pack('<I', len(base_records))
+    for record in base_records:
+        pack_record(body, record)
+
+    others = [fw for fw in sorted(firmwares) if fw != base_id]
+    body += struct.pack('<I', len(others))
+    for fw in others:
+        records = firmwares[fw]
+        removed = sorted(base_index[r] for r in firmwares[base_id] - records)
+        added = sorted(records - firmwares[base_id], key=lambda r: (section_ids[r[0]], r[1], r[2]))
+        _pack_str(body, fw)
+        body += struct.pack(f'<I{len(removed)}I', len(removed), *removed)
+        body += struct.pack('<I', len(added))
+        for record in added:
+            pack_record(body, record)
+
+    blob = MAGIC + struct.pack('<H', FORMAT_VERSION) + zlib.compress(bytes(body), 9)
+    with open(out_path, 'wb') as f:
+        f.write(blob)
+
+    raw_bytes = sum(os.path.getsize(p) for p in syc_files)
+    total_records = sum(len(r) for r in firmwares.values())
+    print(f"  -> Wrote {out_path}: {len(firmwares)} firmwares, base {base_id}, {len(names)} unique names, "
+          f"{total_records} records ({len(blob)} bytes vs {raw_bytes} bytes of .SYC)")
+    return out_path
+
+class SymbolArchive:
+    """
+    Loads a .wsa archive with every name interned once and the base records
+    shared by all firmwares. Per-firmware lookup tables are only built on
+    demand by table(), in the same shape as syc_lookup_service.load_symbol_table;
+    the max_tables most recently used ones stay resident.
+    """
+    def __init__(self, path=DEFAULT_ARCHIVE, max_tables=4):
+        with open(path, 'rb') as f:
+            blob = f.read()
+        if blob[:4] != MAGIC:
+            raise ValueError(f"{path} is not a symbol archive")
+        version = struct.unpack_from('<H', blob, 4)[0]
+        if version != FORMAT_VERSION:
+            raise ValueError(f"{path}: unsupported archive version {version}")
+        body = zlib.decompress(blob[6:])
+
+        self._body = body
+        self._pos = 0
+        count = self._u32()
+        self.names = tuple(sys.intern(self._str()) for _ in range(count))
+
+        self.base_id = self._str()
+        self.base_records = self._records(self._u32())
+
+        self.deltas = {}
+        for _ in range(self._u32()):
+            fw = self._str()
+            removed_count = self._u32()
+            removed = frozenset(struct.unpack_from(f'<{removed_count}I', body, self._pos))
+            self._pos += 4 * removed_count
+            added = self._records(self._u32())
+            self.deltas[fw] = (removed, added)
+
+        del self._body
+        # Built tables, least recently used first (see SymbolTableCache)
+        self.max_tables = max_tables
+        self._tables = OrderedDict()
+
+    def _u32(self):
+        value = struct.unpack_from('<I', self._body, self._pos)[0]
+        self._pos += 4
+        return value
+
+    def _str(self):
+        length = self._body[self._pos]
+        text = self._body[self._pos + 1:self._pos + 1 + length].decode('ascii')
+        self._pos += 1 + length
+        return text
+
+    def _records(self, count):
+        records = []
+        for _ in range(count):
+            sec, address, name_id = RECORD.unpack_from(self._body, self._pos)
+            self._pos += RECORD.size
+            records.append((ACTUAL_SECTIONS[sec], address, self.names[name_id]))
+        return tuple(records)
+
+    def firmwares(self):
+        return [self.base_id] + sorted(self.deltas)
+
+    def records(self, firmware):
+        if firmware == self.base_id:
+            return self.base_records
+        if firmware not in self.deltas:
+            raise KeyError(f"Firmware '{firmware}' is not in the archive")
+        removed, added = self.deltas[firmware]
+        return tuple(r for i, r in enumerate(self.base_records) if i not in removed) + added
+
+    def table(self, firmware):
+        table = self._tables.get(firmware)
+        if table is not None:
+            self._tables.move_to_end(firmware)
+        else:
+            by_address = {}
+            by_name = {}
+            by_plain_address = {}
+            for section, address, name in self.records(firmware):
+                by_address.setdefault((section, address), []).append(name)
+                by_plain_address.setdefault(address, []).append(f"{section}:{name}")
+                by_name[name] = (section, address)
+            table = {'by_address': by_address, 'by_name': by_name, 'by_plain_address': by_plain_address}
+            self._tables[firmware] = table
+            while len(self._tables) > self.max_tables:
+                self._tables.popitem(last=False)
+        return table
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build and query the deduplicated multi-firmware symbol archive.")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p_build = sub.add_parser("build", help="pack .SYC files (default: all in the current directory)")
+    p_build.add_argument("files", nargs='*')
+    p_build.add_argument("-o", "--output", default=DEFAULT_ARCHIVE)
+
+    p_list = sub.add_parser("list", help="list firmwares and their delta sizes")
+    p_list.add_argument("-a", "--archive", default=DEFAULT_ARCHIVE)
+
+    p_lookup = sub.add_parser("lookup", help="look up names or SECTION:ADDRESS entries of one firmware")
+    p_lookup.add_argument("firmware")
+    p_lookup.add_argument("items", nargs='+')
+    p_lookup.add_argument("-a", "--archive", default=DEFAULT_ARCHIVE)
+
+    args = parser.parse_args()
+
+    if args.command == "build":
+        files = args.files or sorted(set(glob.glob("*.SYC") + glob.glob("*.syc")))
+        if not files:
+            print("No .SYC files found in the current directory.")
+            sys.exit(1)
+        build_archive(files, args.output)
+    elif args.command == "list":
+        archive = SymbolArchive(args.archive)
+        print(f"{archive.base_id:<10} base, {len(archive.base_records)} records")
+        for fw in sorted(archive.deltas):
+            removed, added = archive.deltas[fw]
+            print(f"{fw:<10} -{len(removed)} +{len(added)}")
+    else:
+        archive = SymbolArchive(args.archive)
+        if args.firmware not in archive.firmwares():
+            p_lookup.error(f"firmware '{args.firmware}' is not in {args.archive} "
+                           f"(available: {', '.join(archive.firmwares())})")
+        table = archive.table(args.firmware)
+        try:
+            print_lookup(args.items, lambda section, address: table['by_address'].get((section, address), []),
+                         table['by_name'].get)
+        except ValueError as e:
+            p_lookup.error(str(e))
@@ -0,0 +1,270 @@
+import os
+import sys
+import mmap
+import glob
+import array
+import struct
+import bisect
+import argparse
+
+from generate_ebusd_csv import ACTUAL_SECTIONS, extract_syc_symbols
+
+# Binary symbol table (.syb), all values little-endian:
+#
+#   header      MAGIC, version, section count, symbol count, hash slots,
+#               offsets of the tables below
+#   sections    per section: first record index (u32), record count (u32)
+#   addresses   u16[symbols]   sorted by address inside every section
+#   name_offs   u32[symbols]   offset of the length-prefixed name in the pool
+#   bit_pos     u8[symbols]    bit position for the Bits section, 0xFF otherwise
+#   hash        u32[slots]     open addressing on FNV-1a(name), record index + 1
+#   pool        u8 length + ASCII name, one entry per symbol
+#
+# Readers mmap the file and bisect/hash straight on the buffer, so no Python
+# object is created per symbol.
+MAGIC = b"WSYB"
+FORMAT_VERSION = 1
+HEADER = struct.Struct('<4sHHIIIIIIII')
+SECTION_ENTRY = struct.Struct('<II')
+SECTIONS = [s for s in ACTUAL_SECTIONS if s != "EOF"]
+NO_BIT = 0xFF
+# The u16/u32 tables are cast in place on little-endian hosts only
+NATIVE_LITTLE_ENDIAN = sys.byteorder == 'little'
+
+def fnv1a(name_bytes):
+    h = 0x811C9DC5
+    for b in name_bytes:
+        h = ((h ^ b) * 0x01000193) & 0xFFFFFFFF
+    return h
+
+def _align(buf, boundary=4):
+    while len(buf) % boundary:
+        buf.append(0)
+
+def compile_symbols(raw_registers, raw_bits):
+    """
+    Serialises the pass-1 output of extract_syc_symbols into the .syb layout.
+    """
+    per_section = {sec: [] for sec in SECTIONS}
+    for reg in raw_registers:
+        if reg['section'] in per_section:
+            per_section[reg['section']].append((reg['address'], NO_BIT, reg['name']))
+    for bit in raw_bits:
+        per_section["Bits"].append((bit['address'], bit['address'] % 8, bit['name']))
+
+    records = []
+    section_table = []
+    for sec in SECTIONS:
+        entries = sorted(per_section[sec])
+        section_table.append((len(records), len(entries)))
+        records.extend(entries)
+
+    pool = bytearray()
+    name_offs = []
+    for _, _, name in records:
+        name_bytes = name.encode('ascii')
+        name_offs.append(len(pool))
+        pool.append(len(name_bytes))
+        pool += name_bytes
+
+    slots = 1
+    while slots < max(2 * len(records), 8):
+        slots *= 2
+    hash_table = [0] * slots
+    for idx, (_, _, name) in enumerate(records):
+        slot = fnv1a(name.encode('ascii')) & (slots - 1)
+        while hash_table[slot]:
+            slot = (slot + 1) & (slots - 1)
+        hash_table[slot] = idx + 1
+
+    n = len(records)
+    body = bytearray()
+    offsets = {}
+    base = HEADER.size
+
+    offsets['sections'] = base + len(body)
+    for first, count in section_table:
+        body += SECTION_ENTRY.pack(first, count)
+    offsets['addresses'] = base + len(body)
+    body += struct.pack(f'<{n}H', *(r[0] for r in records))
+    _align(body)
+    offsets['name_offs'] = base + len(body)
+    body += struct.pack(f'<{n}I', *name_offs)
+    offsets['bit_pos'] = base + len(body)
+    body += bytes(r[1] for r in records)
+    _align(body)
+    offsets['hash'] = base + len(body)
+    body += struct.pack(f'<{slots}I', *hash_table)
+    offsets['pool'] = base + len(body)
+    body += pool
+
+    header = HEADER.pack(MAGIC, FORMAT_VERSION, len(SECTIONS), n, slots,
+                         offsets['sections'], offsets['addresses'], offsets['name_offs'],
+                         offsets['bit_pos'], offsets['hash'], offsets['pool'])
+    return header + bytes(body)
+
+def compile_syc(syc_path, out_path=None):
+    if out_path is None:
+        out_path = os.path.splitext(syc_path)[0] + ".syb"
+    with open(syc_path, 'rb') as f:
+        data = f.read()
+    raw_registers, _, raw_bits = extract_syc_symbols(data)
+    blob = compile_symbols(raw_registers, raw_bits)
+    with open(out_path, 'wb') as f:
+        f.write(blob)
+    print(f"  -> Compiled {out_path} ({len(raw_registers) + len(raw_bits)} symbols, {len(blob)} bytes)")
+    return out_path
+
+def _le_array(view, typecode):
+    # Zero-copy cast of a little-endian table; big-endian hosts get a
+    # byte-swapped copy instead
+    if NATIVE_LITTLE_ENDIAN:
+        return view.cast(typecode)
+    table = array.array(typecode)
+    table.frombytes(view)
+    view.release()
+    table.byteswap()
+    return table
+
+def parse_lookup_item(item):
+    """
+    Splits a lookup argument into (section, address) for SECTION:ADDRESS
+    items, or (None, name). Raises ValueError for an unknown section or an
+    address that is not a number.
+    """
+    if ':' not in item:
+        return None, item
+    section, addr = item.rsplit(':', 1)
+    if section not in SECTIONS:
+        raise ValueError(f"unknown section '{section}' in {item} (choose from {', '.join(SECTIONS)})")
+    try:
+        return section, int(addr, 0)
+    except ValueError:
+        raise ValueError(f"invalid address '{addr}' in {item}") from None
+
+def print_lookup(items, names_at, find):
+    """
+    Prints one line per name or SECTION:ADDRESS item. names_at(section,
+    address) lists the names of a cell, find(name) returns (section,
+    address[, bit position or None]) or None. All items are parsed before
+    anything is printed, see parse_lookup_item().
+    """
+    for item, (section, key) in [(item, parse_lookup_item(item)) for item in items]:
+        if section is not None:
+            print(f"{item:<30} {', '.join(names_at(section, key)) or '-'}")
+            continue
+        hit = find(key)
+        if hit is None:
+            print(f"{item:<30} -")
+        else:
+            bit = f" bit {hit[2]}" if len(hit) > 2 and hit[2] is not None else ""
+            print(f"{item:<30} {hit[0]}:0x{hit[1]:04X}{bit}")
+
+class SymbolTable:
+    """
+    Read-only view on a compiled .syb file.
+
+        with SymbolTable("WH11928.syb") as table:
+            table.names_at("RAM", 0x17)      # ['select_FS_x', 'select_PR_x']
+            table.find("TCHZZ")              # ('RAM', 49, None)
+    """
+    def __init__(self, path):
+        self._file = open(path, 'rb')
+        self._mm = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        (magic, version, section_count, self.symbol_count, self._slots,
+         off_sections, off_addresses, off_name_offs, off_bit_pos, off_hash, off_pool) = HEADER.unpack_from(self._mm, 0)
+        if magic != MAGIC:
+            self.close()
+            raise ValueError(f"{path} is not a binary symbol table")
+        if version != FORMAT_VERSION:
+            self.close()
+            raise ValueError(f"{path}: unsupported format version {version}")
+
+        n = self.symbol_count
+        view = memoryview(self._mm)
+        self._addresses = _le_array(view[off_addresses:off_addresses + 2 * n], 'H')
+        self._name_offs = _le_array(view[off_name_offs:off_name_offs + 4 * n], 'I')
+        self._bit_pos = view[off_bit_pos:off_bit_pos + n]
+        self._hash = _le_array(view[off_hash:off_hash + 4 * self._slots], 'I')
+        self._pool = off_pool
+        self._sections = {}
+        for i in range(section_count):
+            self._sections[SECTIONS[i]] = SECTION_ENTRY.unpack_from(self._mm, off_sections + i * SECTION_ENTRY.size)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        for attr in ('_addresses', '_name_offs', '_bit_pos', '_hash'):
+            view = getattr(self, attr, None)
+            if isinstance(view, memoryview):
+                view.release()
+            setattr(self, attr, None)
+        if getattr(self, '_mm', None) is not None:
+            self._mm.close()
+            self._mm = None
+        self._file.close()
+
+    def _name(self, idx):
+        off = self._pool + self._name_offs[idx]
+        length = self._mm[off]
+        return self._mm[off + 1:off + 1 + length].decode('ascii')
+
+    def _section_of(self, idx):
+        for sec, (first, count) in self._sections.items():
+            if first <= idx < first + count:
+                return sec
+        return None
+
+    def names_at(self, section, address):
+        first, count = self._sections[section]
+        lo = bisect.bisect_left(self._addresses, address, first, first + count)
+        hi = bisect.bisect_right(self._addresses, address, lo, first + count)
+        return [self._name(i) for i in range(lo, hi)]
+
+    def find(self, name):
+        """
+        Returns (section, address, bit position or None), or None if unknown.
+        """
+        name_bytes = name.encode('ascii')
+        mask = self._slots - 1
+        slot = fnv1a(name_bytes) & mask
+        while True:
+            entry = self._hash[slot]
+            if entry == 0:
+                return None
+            idx = entry - 1
+            if self._name(idx) == name:
+                pos = self._bit_pos[idx]
+                return self._section_of(idx), self._addresses[idx], None if pos == NO_BIT else pos
+            slot = (slot + 1) & mask
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compile .SYC symbol files into mmap-able .syb tables and query them.")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p_compile = sub.add_parser("compile", help="compile .SYC files (default: all in the current directory)")
+    p_compile.add_argument("files", nargs='*')
+
+    p_lookup = sub.add_parser("lookup", help="look up names or SECTION:ADDRESS entries in a .syb file")
+    p_lookup.add_argument("table")
+    p_lookup.add_argument("items", nargs='+')
+
+    args = parser.parse_args()
+
+    if args.command == "compile":
+        files = args.files or sorted(set(glob.glob("*.SYC") + glob.glob("*.syc")))
+        if not files:
+            print("No .SYC files found in the current directory.")
+            sys.exit(1)
+        for file in files:
+            compile_syc(file)
+    else:
+        try:
+            with SymbolTable(args.table) as table:
+                print_lookup(args.items, table.names_at, table.find)
+        except ValueError as e:
+            p_lookup.error(str(e))
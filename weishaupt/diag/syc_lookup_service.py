@@ -0,0 +1,222 @@
+import os
+import sys
+import json
+import argparse
+import threading
+import urllib.request
+from collections import OrderedDict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from generate_ebusd_csv import extract_syc_symbols
+
+DIAG_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8890
+
+def load_symbol_table(syc_path):
+    """
+    Parses a .SYC once into the lookup dicts the service answers from.
+
+    by_address maps (section, address) to every symbol name at that cell,
+    by_name maps a symbol name to its (section, address) and by_plain_address
+    maps a bare address to "section:name" entries across all sections.
+    """
+    with open(syc_path, 'rb') as f:
+        data = f.read()
+    raw_registers, _, raw_bits = extract_syc_symbols(data)
+
+    by_address = {}
+    by_name = {}
+    by_plain_address = {}
+    symbols = [(reg['section'], reg['address'], reg['name']) for reg in raw_registers]
+    symbols += [("Bits", bit['address'], bit['name']) for bit in raw_bits]
+    for section, address, name in symbols:
+        by_address.setdefault((section, address), []).append(name)
+        by_plain_address.setdefault(address, []).append(f"{section}:{name}")
+        by_name[name] = (section, address)
+
+    return {'by_address': by_address, 'by_name': by_name, 'by_plain_address': by_plain_address}
+
+def parse_address_spec(spec):
+    """
+    Accepts "RAM:0x0017", "Konstanten:531" or a bare "0x0017" / 23. A bare
+    address is returned with section None and matches in every section.
+    """
+    if isinstance(spec, int):
+        return None, spec
+    if ':' in spec:
+        section, addr = spec.rsplit(':', 1)
+        return section, int(addr, 0)
+    return None, int(spec, 0)
+
+class SymbolTableCache:
+    """
+    Keeps at most max_tables parsed firmware tables resident, evicting the
+    least recently used one. Firmware ids are .SYC basenames, e.g. "WH11928".
+    """
+    def __init__(self, syc_dir=DIAG_DIR, max_tables=4):
+        self.syc_dir = syc_dir
+        self.max_tables = max_tables
+        self.tables = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def _syc_path(self, firmware):
+        for ext in (".SYC", ".syc"):
+            path = os.path.join(self.syc_dir, os.path.basename(firmware) + ext)
+            if os.path.exists(path):
+                return path
+        raise KeyError(f"No symbol file for firmware '{firmware}'")
+
+    def get(self, firmware):
+        with self.lock:
+            table = self.tables.get(firmware)
+            if table is not None:
+                self.tables.move_to_end(firmware)
+                self.hits += 1
+                return table
+
+        # Parse outside the lock so lookups on resident tables are never blocked
+        table = load_symbol_table(self._syc_path(firmware))
+
+        with self.lock:
+            self.misses += 1
+            self.tables[firmware] = table
+            self.tables.move_to_end(firmware)
+            while len(self.tables) > self.max_tables:
+                self.tables.popitem(last=False)
+                self.evictions += 1
+        return table
+
+    def lookup(self, firmware, addresses=(), names=()):
+        table = self.get(firmware)
+        by_address = table['by_address']
+        by_name = table['by_name']
+
+        address_results = {}
+        for spec in addresses:
+            section, address = parse_address_spec(spec)
+            if section is not None:
+                address_results[str(spec)] = by_address.get((section, address), [])
+            else:
+                address_results[str(spec)] = table['by_plain_address'].get(address, [])
+
+        name_results = {}
+        for name in names:
+            key = by_name.get(name)
+            name_results[name] = None if key is None else {'section': key[0], 'address': f"0x{key[1]:04X}"}
+
+        return {'firmware': firmware, 'addresses': address_results, 'names': name_results}
+
+    def stats(self):
+        with self.lock:
+            return {
+                'resident': list(self.tables.keys()),
+                'max_tables': self.max_tables,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions
+            }
+
+class LookupHandler(BaseHTTPRequestHandler):
+    cache = None
+
+    def _send_json(self, status, obj):
+        body = json.dumps(obj).encode('utf-8')
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        if self.path == "/stats":
+            self._send_json(200, self.cache.stats())
+        else:
+            self._send_json(404, {'error': 'unknown path'})
+
+    def do_POST(self):
+        if self.path != "/lookup":
+            self._send_json(404, {'error': 'unknown path'})
+            return
+        try:
+            length = int(self.headers.get("Content-Length", 0))
+            request = json.loads(self.rfile.read(length) or b"{}")
+            if not isinstance(request, dict):
+                raise ValueError("request body must be a JSON object")
+            firmware = request.get('firmware')
+            if not isinstance(firmware, str) or not firmware:
+                raise ValueError("missing or malformed 'firmware' (expected a firmware id such as \"WH11928\")")
+        except (ValueError, TypeError) as e:
+            self._send_json(400, {'error': str(e)})
+            return
+        try:
+            result = self.cache.lookup(firmware, request.get('addresses', []), request.get('names', []))
+        except KeyError as e:
+            self._send_json(404, {'error': e.args[0]})
+            return
+        except (ValueError, TypeError) as e:
+            self._send_json(400, {'error': str(e)})
+            return
+        self._send_json(200, result)
+
+    def log_message(self, format, *args):
+        pass
+
+def serve(host=DEFAULT_HOST, port=DEFAULT_PORT, max_tables=4, syc_dir=DIAG_DIR, preload=()):
+    cache = SymbolTableCache(syc_dir=syc_dir, max_tables=max_tables)
+    for firmware in preload:
+        cache.get(firmware)
+
+    handler = type("BoundLookupHandler", (LookupHandler,), {'cache': cache})
+    server = ThreadingHTTPServer((host, port), handler)
+    print(f"Symbol lookup service on http://{host}:{port} (max {max_tables} resident tables)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+def lookup(firmware, addresses=(), names=(), host=DEFAULT_HOST, port=DEFAULT_PORT, timeout=5):
+    """
+    Client helper: one batched POST /lookup against a running service.
+    """
+    body = json.dumps({'firmware': firmware, 'addresses': list(addresses), 'names': list(names)}).encode('utf-8')
+    request = urllib.request.Request(f"http://{host}:{port}/lookup", data=body,
+                                     headers={"Content-Type": "application/json"})
+    with urllib.request.urlopen(request, timeout=timeout) as response:
+        return json.loads(response.read())
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Resident address <-> name lookup service for Weishaupt .SYC symbol tables.")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p_serve = sub.add_parser("serve", help="run the lookup service")
+    p_serve.add_argument("--host", default=DEFAULT_HOST)
+    p_serve.add_argument("--port", type=int, default=DEFAULT_PORT)
+    p_serve.add_argument("--max-tables", type=int, default=4, help="firmware tables kept resident (LRU)")
+    p_serve.add_argument("--syc-dir", default=DIAG_DIR)
+    p_serve.add_argument("--preload", nargs='*', default=[], help="firmware ids to parse at startup")
+
+    p_query = sub.add_parser("query", help="query a running service")
+    p_query.add_argument("firmware", help="e.g. WH11928")
+    p_query.add_argument("items", nargs='+', help="addresses (RAM:0x0017, 0x0017) or symbol names")
+    p_query.add_argument("--host", default=DEFAULT_HOST)
+    p_query.add_argument("--port", type=int, default=DEFAULT_PORT)
+
+    args = parser.parse_args()
+
+    if args.command == "serve":
+        serve(args.host, args.port, args.max_tables, args.syc_dir, args.preload)
+    else:
+        addresses = [i for i in args.items if ':' in i or i[:1].isdigit()]
+        names = [i for i in args.items if i not in addresses]
+        try:
+            result = lookup(args.firmware, addresses, names, args.host, args.port)
+        except OSError as e:
+            print(f"Error: lookup service not reachable ({e})")
+            sys.exit(1)
+        print(json.dumps(result, indent=2))
@@ -0,0 +1,5 @@
+import os
+import sys
+
+# The diag scripts import each other by module name, as when run from diag/
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
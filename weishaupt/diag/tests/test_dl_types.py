@@ -0,0 +1,15 @@
+from dl_types import assign_symbol_types
+
+def register(name, address, section="RAM"):
+    return {'name': name, 'section': section, 'address': address, 'bits': []}
+
+def test_16_bit_values_are_big_endian():
+    regs = assign_symbol_types([register("TA_FILTER", 0xF0AF, "External RAM (XRAM)"),
+                                register("OFFSET_s16", 0x40)], {"TA_FILTER": "UIR"})
+    assert [(r['type'], r['size']) for r in regs] == [("UIR", 2), ("SIR", 2)]
+
+def test_low_byte_must_be_free():
+    regs = [register("A_u16", 0x1F), register("B_u16", 0x41), register("C", 0x42), register("D_u16", 0xFF)]
+    # 0x20 is the parent byte of bit 0x00
+    assign_symbol_types(regs, {}, [{'name': "B_FLAG", 'address': 0x00}])
+    assert [r['type'] for r in regs] == ["UCH", "UCH", "UCH", "UCH"]
@@ -0,0 +1,125 @@
+import asyncio
+
+from ebusd_proxy import EbusdProxy, parse_read_command
+
+class FakeEbusd:
+    """
+    Answers every command line with "<n>" after `delay` seconds, or never
+    when delay is None. Counts the commands it received.
+    """
+    def __init__(self, delay=0.05):
+        self.delay = delay
+        self.commands = []
+
+    async def handle(self, reader, writer):
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                self.commands.append(line.decode().strip())
+                if self.delay is None:
+                    continue
+                await asyncio.sleep(self.delay)
+                writer.write(f"{len(self.commands)}\n\n".encode())
+                await writer.drain()
+        except (ConnectionError, asyncio.CancelledError):
+            pass
+        finally:
+            writer.close()
+
+async def with_proxy(fake, test, **kwargs):
+    server = await asyncio.start_server(fake.handle, "127.0.0.1", 0)
+    proxy = EbusdProxy("127.0.0.1", server.sockets[0].getsockname()[1], **kwargs)
+    try:
+        return await test(proxy)
+    finally:
+        server.close()
+
+async def read(proxy, command):
+    return await proxy.read(command, *parse_read_command(command))
+
+def test_parse_read_command_normalizes_the_key():
+    assert parse_read_command("read -f -c bc1 TCHZZ") == ("read -c bc1 TCHZZ", "bc1", "TCHZZ", True)
+    assert parse_read_command("read  -c bc1   TCHZZ") == ("read -c bc1 TCHZZ", "bc1", "TCHZZ", False)
+    assert parse_read_command("read TCHZZ") == ("read TCHZZ", None, "TCHZZ", False)
+    assert parse_read_command("read -h") is None
+    assert parse_read_command("write -c bc1 TCHZZ 1") is None
+
+def test_concurrent_reads_share_one_upstream_request():
+    fake = FakeEbusd()
+
+    async def test(proxy):
+        answers = await asyncio.gather(*(read(proxy, "read -c bc1 TCHZZ") for _ in range(5)))
+        cached = await read(proxy, "read -c bc1 TCHZZ")
+        return answers, cached, dict(proxy.stats)
+
+    answers, cached, stats = asyncio.run(with_proxy(fake, test))
+    assert fake.commands == ["read -c bc1 TCHZZ"]
+    assert answers == [["1"]] * 5 and cached == ["1"]
+    assert (stats['misses'], stats['coalesced'], stats['hits']) == (1, 4, 1)
+
+def test_forced_read_refreshes_the_plain_entry():
+    fake = FakeEbusd(delay=0)
+
+    async def test(proxy):
+        first = await read(proxy, "read -c bc1 TCHZZ")
+        forced = await read(proxy, "read -f -c bc1 TCHZZ")
+        after = await read(proxy, "read -c bc1 TCHZZ")
+        return first, forced, after
+
+    first, forced, after = asyncio.run(with_proxy(fake, test))
+    assert (first, forced, after) == (["1"], ["2"], ["2"])
+    assert len(fake.commands) == 2
+
+def test_upstream_timeout_fails_every_waiter():
+    fake = FakeEbusd(delay=None)
+
+    async def test(proxy):
+        return await asyncio.gather(*(read(proxy, "read -c bc1 TCHZZ") for _ in range(3)))
+
+    answers = asyncio.run(with_proxy(fake, test, upstream_timeout=0.2))
+    assert all(answer[0].startswith("ERR") for answer in answers)
+    assert len(fake.commands) == 1
+
+def test_waiters_get_an_error_reply_for_any_upstream_failure():
+    fake = FakeEbusd()
+
+    async def test(proxy):
+        async def failing(command):
+            await asyncio.sleep(0.05)
+            raise RuntimeError("boom")
+        proxy.execute = failing
+        leader = asyncio.ensure_future(read(proxy, "read -c bc1 TCHZZ"))
+        await asyncio.sleep(0)
+        waiters = await asyncio.gather(*(read(proxy, "read -c bc1 TCHZZ") for _ in range(2)))
+        try:
+            await leader
+        except RuntimeError:
+            pass
+        return waiters
+
+    assert asyncio.run(with_proxy(fake, test)) == [["ERR: boom"]] * 2
+
+def test_cache_evicts_the_oldest_entries():
+    fake = FakeEbusd(delay=0)
+
+    async def test(proxy):
+        for name in ("A", "B", "C", "A"):
+            await read(proxy, f"read -c bc1 {name}")
+        return list(proxy.cache)
+
+    keys = asyncio.run(with_proxy(fake, test, max_cache_entries=2))
+    assert keys == ["read -c bc1 C", "read -c bc1 A"]
+    # A was evicted and had to be read again
+    assert len(fake.commands) == 4
+
+def test_ttl_by_circuit_and_name():
+    sections = {("bc1", "TCHZZ"): "RAM", ("bc2", "TCHZZ"): "RAM", ("bc1", "TCVSP"): "Konstanten",
+                ("bc2", "TCVSP"): "SFR"}
+    proxy = EbusdProxy(message_sections=sections)
+    assert proxy.ttl_for("bc1", "TCVSP") == proxy.ttls["Konstanten"]
+    assert proxy.ttl_for("bc2", "TCVSP") == proxy.ttls["SFR"]
+    assert proxy.ttl_for(None, "TCHZZ") == proxy.ttls["RAM"]
+    # Ambiguous without -c: default TTL
+    assert proxy.ttl_for(None, "TCVSP") == proxy.ttls[None]
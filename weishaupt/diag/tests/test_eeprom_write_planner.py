@@ -0,0 +1,57 @@
+import pytest
+
+from eeprom_write_planner import diff_cells, expand_desired, parse_konstanten_id, plan_writes
+from register_requests import MAX_MASTER_BYTES
+
+CATALOG = {"TCVSP": (0x0003, 1), "TCHZZ": (0x0004, 1), "NG_GR_MIN": (0x0009, 1), "HIST_PTR": (0x0200, 2)}
+
+def test_parse_konstanten_id():
+    assert parse_konstanten_id('"bb0203"') == (0x0003, 1)
+    assert parse_konstanten_id("AC06020200") == (0x0200, 1)
+    assert parse_konstanten_id("1C06021200") == (0x0200, 2)
+    # MF1: twelve bytes from 0x0002
+    assert parse_konstanten_id("c6b202") == (0x0002, 12)
+    assert parse_konstanten_id("5C0100") is None
+    assert parse_konstanten_id("8a0225022e") is None
+
+def test_expand_desired_splits_big_endian():
+    assert expand_desired({"HIST_PTR": 0x0212}, CATALOG) == {0x0200: 0x02, 0x0201: 0x12}
+    assert expand_desired({"TCVSP": -1}, CATALOG) == {0x0003: 0xFF}
+    assert expand_desired({"HIST_PTR": [1, 2]}, CATALOG) == {0x0200: 1, 0x0201: 2}
+
+@pytest.mark.parametrize("desired, error", [
+    ({"TCVSP": 300}, OverflowError),
+    ({"TCVSP": -129}, OverflowError),
+    ({"HIST_PTR": [1, 256]}, ValueError),
+    ({"HIST_PTR": [1]}, ValueError),
+    ({"NOPE": 1}, KeyError),
+    ([1, 2], ValueError),
+])
+def test_expand_desired_rejects(desired, error):
+    with pytest.raises(error):
+        expand_desired(desired, CATALOG)
+
+def test_diff_only_keeps_changed_cells():
+    assert diff_cells({3: 40, 4: 41}, {3: 40, 4: 0}) == {4: 41}
+
+def test_single_cell_writes_by_default():
+    plan = plan_writes({0x0003: 40, 0x0004: 41, 0x0009: 5})
+    assert [runs for runs, _ in plan] == [[("Konstanten", 0x0003, 1)], [("Konstanten", 0x0004, 1)],
+                                          [("Konstanten", 0x0009, 1)]]
+    # Same CRC + element as the read line of NG_GR_MIN ("b10209"), skip byte, value
+    assert plan[2][1] == "B1020900" + "05"
+
+def test_merged_elements_are_opt_in():
+    plan = plan_writes({0x0003: 40, 0x0004: 41, 0x0009: 5}, merge=True)
+    assert [runs for runs, _ in plan] == [[("Konstanten", 0x0003, 2)], [("Konstanten", 0x0009, 1)]]
+
+def test_chained_writes_are_opt_in():
+    plan = plan_writes({0x0003: 40, 0x0009: 5}, chain=True)
+    assert len(plan) == 1
+    assert plan[0][1].endswith("00" + "28" + "05")
+
+def test_long_runs_are_split_to_fit_a_telegram():
+    changed = {0x10 + i: i for i in range(16)}
+    plan = plan_writes(changed, merge=True)
+    assert sum(runs[0][2] for runs, _ in plan) == 16
+    assert all(len(payload) // 2 <= MAX_MASTER_BYTES for _, payload in plan)
@@ -0,0 +1,83 @@
+from fault_detector import FaultDetector, RollingCount, PHASE_F22
+
+FIELDS = {('bc1', 'WTCStatus'): ['Status1', 'Operatingphase', 'Flame'],
+          ('bc1', 'PowerDemand'): ['Status', 'Action']}
+CODES = {"Burner Off": 0x00, "Prepurge": 0x03, "Burner in operation": 0x06,
+         "F22:Flame failure during operation": PHASE_F22}
+PHASE_CODES = (CODES, {code: text for text, code in CODES.items()})
+
+def make_detector(**kwargs):
+    return FaultDetector(fields=FIELDS, phase_codes=PHASE_CODES, **kwargs)
+
+def feed(detector, recording):
+    events = []
+    for ts, line in recording:
+        events += detector.on_line(line, ts)
+    return events
+
+def kinds(events):
+    return [e['event'] for e in events]
+
+def test_rolling_count_expires_after_window():
+    count = RollingCount(window=60, buckets=12)
+    for ts in (0, 1, 2):
+        count.add(ts)
+    assert count.count(59) == 3
+    assert count.count(62) == 0
+    assert count.add(63) == 1
+
+def test_short_cycling_fires_once_and_rearms():
+    detector = make_detector(window=60, max_starts=3)
+    recording = []
+    for start in (0, 10, 20, 30, 200, 210, 220):
+        recording.append((start, "bc1 WTCStatus = Operatingphase=Burner in operation"))
+        recording.append((start + 5, "bc1 WTCStatus = Operatingphase=Burner Off"))
+    events = [e for e in feed(detector, recording) if e['event'] == "short_cycling"]
+    # Third start raises the alarm, the fourth stays quiet, the window
+    # expires before 200 and the third start after that raises it again
+    assert [e['ts'] for e in events] == [20, 220]
+    assert [e['starts'] for e in events] == [3, 3]
+
+def test_f22_with_flame_loss():
+    detector = make_detector()
+    events = feed(detector, [
+        (0, "bc1 WTCStatus = Operatingphase=Burner in operation;Flame=On"),
+        (30, "bc1 WTCStatus = Operatingphase=F22:Flame failure during operation;Flame=Off"),
+    ])
+    assert kinds(events) == ["phase", "fault", "flame_loss"]
+    fault, loss = events[1], events[2]
+    assert fault['phase'] == PHASE_F22
+    assert loss['phase'] == PHASE_F22
+    assert loss['runtime'] == 30
+    assert loss['count'] == 1
+
+def test_repeated_f22_alarm():
+    detector = make_detector(window=600, f22_repeat=2)
+    events = feed(detector, [
+        (0, "bc1 WTCStatus = Operatingphase=F22:Flame failure during operation"),
+        (10, "bc1 WTCStatus = Operatingphase=Burner Off"),
+        (20, "bc1 WTCStatus = Operatingphase=F22:Flame failure during operation"),
+    ])
+    assert kinds(events).count("repeated_f22") == 1
+
+def test_positional_and_named_lines_give_the_same_events():
+    named = feed(make_detector(), [
+        (0, "bc1 WTCStatus = Operatingphase=Prepurge;Flame=Off"),
+        (20, "bc1 WTCStatus = Operatingphase=Burner in operation;Flame=On"),
+        (80, "bc1 WTCStatus = Operatingphase=Burner Off;Flame=Off"),
+    ])
+    positional = feed(make_detector(), [
+        (0, "bc1 WTCStatus = 0;Prepurge;Off"),
+        (20, "bc1 WTCStatus = 0;Burner in operation;On"),
+        (80, "bc1 WTCStatus = 0;Burner Off;Off"),
+    ])
+    assert kinds(named) == ["phase", "phase"]
+    assert named == positional
+
+def test_ignores_other_messages_and_unknown_circuits():
+    detector = make_detector()
+    assert detector.on_line("bc1 TCHZZ = 42", 0) == []
+    assert detector.on_line("no separator", 0) == []
+    # No field list for fs9: positional values cannot be mapped
+    assert detector.on_line("fs9 WTCStatus = 0;Prepurge;Off", 0) == []
+    assert detector.devices['fs9'].phase is None
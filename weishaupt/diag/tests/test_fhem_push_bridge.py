@@ -0,0 +1,22 @@
+import os
+import subprocess
+import sys
+
+CONFIG_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+BRIDGE = os.path.join(CONFIG_DIR, "diag", "fhem_push_bridge.py")
+
+def run_classdef(tmp_path, *args):
+    out = tmp_path / "weishaupt.push.classdef"
+    subprocess.run([sys.executable, BRIDGE, "classdef", "-o", str(out), *args], check=True, cwd=str(tmp_path))
+    return out.read_text(encoding='utf-8')
+
+def test_classdef_of_the_device_csvs(tmp_path):
+    text = run_classdef(tmp_path, "--listen-port", "9999")
+    assert "# defmod EBUSPUSH ECMD telnet localhost:9999" in text
+    assert 'reading bc1_StatusMessage match "bc1 StatusMessage = .*\\n"' in text
+
+def test_classdef_includes_alias_readings(tmp_path):
+    # WH11928.inc: select_PR_x decodes from the same cell as select_FS_x
+    text = run_classdef(tmp_path, "--all-includes", os.path.join(CONFIG_DIR, "08..bc1.csv"))
+    assert "reading bc1_select_FS_x match" in text
+    assert "reading bc1_select_PR_x match" in text
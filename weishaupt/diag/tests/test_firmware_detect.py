@@ -0,0 +1,15 @@
+from firmware_detect import INFERRED_SOURCE, build_firmware_index, match_firmware
+
+def test_versions_are_inferred_from_the_file_names(tmp_path):
+    for name in ("WH11928.SYC", "0011366.SYC", "notes.SYC"):
+        (tmp_path / name).write_bytes(b"")
+    index = build_firmware_index(str(tmp_path))
+    assert [(e['syc'], e['sw'], e['hw'], e['source']) for e in index['entries']] == \
+        [("0011366.SYC", 11, 366, INFERRED_SOURCE), ("WH11928.SYC", 11, 928, INFERRED_SOURCE)]
+    assert match_firmware(index, "12", "928")[1] == "nearest"
+
+def test_rebuild_keeps_confirmed_entries(tmp_path):
+    (tmp_path / "WH11928.SYC").write_bytes(b"")
+    confirmed = {'sw': 11, 'hw': 928, 'syc': "WH11928.SYC", 'inc': "WH11928.inc", 'source': "identification"}
+    index = build_firmware_index(str(tmp_path), previous={'entries': [confirmed]})
+    assert index['entries'] == [confirmed]
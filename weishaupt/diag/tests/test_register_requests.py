@@ -0,0 +1,48 @@
+import pytest
+
+from register_requests import (coalesce_cells, decode_read_response, ebusd_hex_command, element_bytes,
+                               pack_read_requests, parse_elements, read_request_hex, write_request_hex)
+
+def test_chained_test_data_round_trip():
+    # parse_elements() skips the leading CRC byte
+    runs = parse_elements("00" + "0122015B115F01660168")
+    assert runs == [("RAM", 0x22, 1), ("RAM", 0x5B, 1), ("RAM", 0x5F, 2), ("RAM", 0x66, 1), ("RAM", 0x68, 1)]
+    assert read_request_hex(runs)[2:] == "0122015B115F01660168"
+
+def test_single_cells_match_the_generated_read_lines():
+    # IDs of WH11928.inc: IDLE_R0 (RAM 0x00), EEA_F_HIST_PTR_LOW (Konstanten page 2)
+    assert read_request_hex([("RAM", 0x0000, 1)]) == "5C0100"
+    assert read_request_hex([("Konstanten", 0x0200, 1)]) == "AC06020200"
+    assert parse_elements("AC06020200") == [("Konstanten", 0x0200, 1)]
+
+def test_element_windows():
+    assert element_bytes("External RAM (XRAM)", 0xF010, 2) == bytes((0x13, 0x10))
+    with pytest.raises(ValueError):
+        element_bytes("RAM", 0x0100)
+    with pytest.raises(ValueError):
+        element_bytes("RAM", 0x10, 17)
+    with pytest.raises(ValueError):
+        element_bytes("Bits", 0x10)
+
+def test_coalesce_never_crosses_a_page():
+    cells = [("Konstanten", a) for a in (0x01FE, 0x01FF, 0x0200, 0x0201)]
+    assert coalesce_cells(cells) == [("Konstanten", 0x01FE, 2), ("Konstanten", 0x0200, 2)]
+
+def test_pack_respects_response_limit():
+    runs = [("RAM", a, 4) for a in range(0, 40, 8)]
+    requests = pack_read_requests(runs)
+    assert [sum(r[2] for r in req) for req in requests] == [12, 8]
+
+def test_decode_read_response():
+    runs = [("RAM", 0x5F, 2), ("RAM", 0x66, 1)]
+    values = decode_read_response(runs, "04000A0B0C")
+    assert values == {("RAM", 0x5F): 0x0A, ("RAM", 0x60): 0x0B, ("RAM", 0x66): 0x0C}
+    with pytest.raises(ValueError):
+        decode_read_response(runs, "03000A0B")
+
+def test_write_layout_matches_the_w_lines():
+    # CRC over the element only, then the _8_Skip byte, then the value
+    assert write_request_hex([("Konstanten", 0x0200, 1)], b"\x05") == "AC0602020000" + "05"
+    assert ebusd_hex_command("08", "5001", "AC060202000005") == "hex 08500107AC060202000005"
+    with pytest.raises(ValueError):
+        write_request_hex([("RAM", 0x10, 2)], b"\x01")
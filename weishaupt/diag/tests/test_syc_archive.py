@@ -0,0 +1,45 @@
+import os
+
+import pytest
+
+from syc_archive import SymbolArchive, build_archive, _firmware_records
+from syc_lookup_service import load_symbol_table
+
+DIAG_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+FIRMWARES = ["WH10928", "WH11928", "WH90928", "0011366"]
+
+@pytest.fixture(scope="module")
+def archive(tmp_path_factory):
+    out = str(tmp_path_factory.mktemp("archive") / "symbols.wsa")
+    build_archive([os.path.join(DIAG_DIR, fw + ".SYC") for fw in FIRMWARES], out)
+    return SymbolArchive(out)
+
+def test_lists_every_firmware_once(archive):
+    assert sorted(archive.firmwares()) == sorted(FIRMWARES)
+    assert archive.base_id in FIRMWARES
+
+@pytest.mark.parametrize("firmware", FIRMWARES)
+def test_records_round_trip(archive, firmware):
+    expected = _firmware_records(os.path.join(DIAG_DIR, firmware + ".SYC"))
+    records = archive.records(firmware)
+    assert len(records) == len(expected)
+    assert set(records) == expected
+
+def test_table_matches_the_parsed_syc(archive):
+    table = archive.table("WH11928")
+    parsed = load_symbol_table(os.path.join(DIAG_DIR, "WH11928.SYC"))
+    assert table['by_name'] == parsed['by_name']
+    assert {k: sorted(v) for k, v in table['by_address'].items()} == \
+        {k: sorted(v) for k, v in parsed['by_address'].items()}
+
+def test_unknown_firmware(archive):
+    with pytest.raises(KeyError):
+        archive.records("WH99999")
+
+def test_table_cache_is_bounded(archive, monkeypatch):
+    monkeypatch.setattr(archive, "max_tables", 2)
+    first = archive.table("WH10928")
+    archive.table("WH11928")
+    assert archive.table("WH10928") is first
+    archive.table("WH90928")
+    assert list(archive._tables) == ["WH10928", "WH90928"]
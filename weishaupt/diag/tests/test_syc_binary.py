@@ -0,0 +1,57 @@
+import os
+import sys
+import struct
+
+import pytest
+
+import syc_binary
+from syc_binary import SymbolTable, compile_symbols, compile_syc, parse_lookup_item
+from syc_lookup_service import load_symbol_table
+
+DIAG_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SYC = os.path.join(DIAG_DIR, "WH11928.SYC")
+
+def write_table(tmp_path, raw_registers, raw_bits):
+    path = tmp_path / "test.syb"
+    path.write_bytes(compile_symbols(raw_registers, raw_bits))
+    return str(path)
+
+def test_round_trip_of_synthetic_symbols(tmp_path):
+    registers = [{'section': "RAM", 'address': 0x17, 'name': "select_PR_x"},
+                 {'section': "RAM", 'address': 0x17, 'name': "select_FS_x"},
+                 {'section': "Konstanten", 'address': 0x0203, 'name': "TCVSP"}]
+    bits = [{'address': 0x0A, 'name': "B_FLAME"}]
+    with SymbolTable(write_table(tmp_path, registers, bits)) as table:
+        assert sorted(table.names_at("RAM", 0x17)) == ["select_FS_x", "select_PR_x"]
+        assert table.names_at("RAM", 0x18) == []
+        assert table.find("TCVSP") == ("Konstanten", 0x0203, None)
+        assert table.find("B_FLAME") == ("Bits", 0x0A, 2)
+        assert table.find("UNKNOWN") is None
+
+def test_byte_swapped_tables(monkeypatch):
+    # Host with the other byte order: the table needs swapping to read back
+    monkeypatch.setattr(syc_binary, "NATIVE_LITTLE_ENDIAN", sys.byteorder != 'little')
+    foreign = '>' if sys.byteorder == 'little' else '<'
+    assert list(syc_binary._le_array(memoryview(struct.pack(foreign + "2H", 0x0203, 0x17)), 'H')) == [0x0203, 0x17]
+
+def test_parse_lookup_item():
+    assert parse_lookup_item("TCHZZ") == (None, "TCHZZ")
+    assert parse_lookup_item("External RAM (XRAM):0xF0AF") == ("External RAM (XRAM)", 0xF0AF)
+    for item in ("XRAM:0x10", "RAM:zz"):
+        with pytest.raises(ValueError):
+            parse_lookup_item(item)
+
+def test_rejects_foreign_files(tmp_path):
+    path = tmp_path / "bad.syb"
+    path.write_bytes(b"NOPE" + bytes(64))
+    with pytest.raises(ValueError):
+        SymbolTable(str(path))
+
+def test_compiled_syc_matches_the_parsed_table(tmp_path):
+    out = compile_syc(SYC, str(tmp_path / "WH11928.syb"))
+    parsed = load_symbol_table(SYC)
+    with SymbolTable(out) as table:
+        for (section, address), names in parsed['by_address'].items():
+            assert sorted(table.names_at(section, address)) == sorted(names)
+        for name, (section, address) in parsed['by_name'].items():
+            assert table.find(name)[:2] == (section, address)
@@ -0,0 +1,207 @@
+#!/usr/bin/env python3
+import os
+import sys
+import argparse
+
+# Single entry point for the diag scripts:
+#
+#   whdiag.py syc parse WH11928.SYC
+#   whdiag.py syc lookup WH11928.SYC TCHZZ RAM:0x17   (.syb cached in ~/.cache/whdiag)
+#   whdiag.py gen inc [FILES]            gen templates [FILES]
+#   whdiag.py crc 0122015B               crc --check 3D0122015B
+#   whdiag.py translations extract WCMDiag5519b.exe -o Extracted_Translations
+#   whdiag.py scan memory --device ../08..bc1.csv
+#
+# Only os, sys and argparse are imported up front. Every handler imports the
+# module it needs when it runs, so `crc` and `syc lookup` do not pay for
+# pefile, the profiler or the generators.
+DIAG_DIR = os.path.dirname(os.path.abspath(__file__))
+SUBDIRS = {
+    "extracted_forms": os.path.join(DIAG_DIR, "extracted_forms"),
+    "forms": os.path.join(DIAG_DIR, "Extracted_Translations", "Forms"),
+}
+# `syc lookup` keeps its compiled .syb tables here instead of next to the .SYC
+CACHE_DIR = os.path.join(os.environ.get("XDG_CACHE_HOME") or os.path.expanduser("~/.cache"), "whdiag")
+
+# "group name" -> (handler, help, [(args, kwargs), ...])
+COMMANDS = {}
+
+def arg(*args, **kwargs):
+    return args, kwargs
+
+def command(name, help_text, *arguments):
+    def register(func):
+        COMMANDS[name] = (func, help_text, list(arguments))
+        return func
+    return register
+
+def _load(module, subdir=None):
+    """
+    Imports a diag module on demand. Scripts below extracted_forms/ and
+    Extracted_Translations/Forms/ are put on sys.path first, file names that
+    are no valid module name ("import re.py") are loaded from their path.
+    """
+    import importlib
+    path = SUBDIRS.get(subdir, DIAG_DIR)
+    if path not in sys.path:
+        sys.path.insert(0, path)
+    if module.endswith(".py"):
+        import importlib.util
+        spec = importlib.util.spec_from_file_location(os.path.splitext(module)[0].replace(" ", "_"),
+                                                      os.path.join(path, module))
+        mod = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(mod)
+        return mod
+    return importlib.import_module(module)
+
+def _syc_files(files):
+    if files:
+        return files
+    import glob
+    return sorted(set(glob.glob("*.SYC") + glob.glob("*.syc")))
+
+# ---------------------------------------------------------------- crc
+
+@command("crc", "CRC byte of a 5000/5001 request body",
+         arg("payloads", nargs='+', metavar="HEX", help="request data without CRC (with --check: including it)"),
+         arg("--check", action="store_true", help="verify the leading CRC byte instead of adding one"))
+def cmd_crc(args):
+    from generate_ebusd_csv import calculate_weishaupt_crc_multi
+    failed = 0
+    for payload in args.payloads:
+        payload = payload.strip().strip('"').upper()
+        try:
+            data = bytes.fromhex(payload)
+        except ValueError:
+            args.parser.error(f"invalid hex payload '{payload}'")
+        if args.check and not data:
+            args.parser.error("--check needs the CRC byte and the request data")
+        if args.check:
+            expected = calculate_weishaupt_crc_multi(payload[2:])
+            ok = int(payload[:2], 16) == expected
+            failed += not ok
+            print(f"{payload:<34} {'OK' if ok else f'BAD (expected {expected:02X})'}")
+        else:
+            print(f"{calculate_weishaupt_crc_multi(payload):02X}{payload}")
+    return 1 if failed else 0
+
+# ---------------------------------------------------------------- syc
+
+@command("syc parse", "list the symbols of a .SYC file by section",
+         arg("file", nargs='?', default="WH11928.SYC", help="symbol file (default: WH11928.SYC)"))
+def cmd_syc_parse(args):
+    _load("parse_syc").parse_syc_file(args.file)
+
+@command("syc compile", "compile .SYC files into mmap-able .syb tables",
+         arg("files", nargs='*', help="default: all .SYC files in the current directory"))
+def cmd_syc_compile(args):
+    from syc_binary import compile_syc
+    files = _syc_files(args.files)
+    if not files:
+        print("No .SYC files found in the current directory.")
+        return 1
+    for file in files:
+        compile_syc(file)
+
+@command("syc lookup", "look up names or SECTION:ADDRESS entries, compiling the .syb when stale",
+         arg("file", help=".SYC or .syb file"),
+         arg("items", nargs='+', help="symbol name or SECTION:ADDRESS, e.g. RAM:0x17"))
+def cmd_syc_lookup(args):
+    from syc_binary import SymbolTable, compile_syc, print_lookup
+    table_path = args.file
+    if not table_path.lower().endswith(".syb"):
+        os.makedirs(CACHE_DIR, exist_ok=True)
+        table_path = os.path.join(CACHE_DIR, os.path.splitext(os.path.basename(args.file))[0] + ".syb")
+        if not os.path.exists(table_path) or os.path.getmtime(table_path) < os.path.getmtime(args.file):
+            compile_syc(args.file, table_path)
+    try:
+        with SymbolTable(table_path) as table:
+            print_lookup(args.items, table.names_at, table.find)
+    except ValueError as e:
+        args.parser.error(str(e))
+
+# ---------------------------------------------------------------- gen
+
+@command("gen inc", "generate ebusd .inc files from .SYC symbol files",
+         arg("files", nargs='*', help="default: all .SYC files in the current directory"))
+def cmd_gen_inc(args):
+    from generate_ebusd_csv import parse_syc_to_ebusd
+    from dl_types import load_dl_types
+    files = _syc_files(args.files)
+    if not files:
+        print("No .SYC files found in the current directory.")
+        return 1
+    dl_types = load_dl_types()
+    for file in files:
+        print(f"Processing {file}...")
+        parse_syc_to_ebusd(file, dl_types=dl_types)
+
+@command("gen templates", "generate ebusd template includes from .SYC symbol files",
+         arg("files", nargs='*', help="default: all .SYC files in the current directory"))
+def cmd_gen_templates(args):
+    from generate_ebusd_templates import generate_template_files
+    generate_template_files(syc_files=args.files)
+
+# ---------------------------------------------------------------- translations
+
+@command("translations extract", "extract string tables and DFM forms of all languages from the diagnosis EXE",
+         arg("exe", nargs='?', default="WCMDiag5519b.exe", help="diagnosis executable (default: WCMDiag5519b.exe)"),
+         arg("-o", "--output", default="Extracted_Translations", help="output directory (default: Extracted_Translations)"))
+def cmd_translations_extract(args):
+    _load("extract_languages", "extracted_forms").extract_translations(args.exe, args.output)
+
+@command("translations ui-text", "list UI component captions found in the diagnosis EXE",
+         arg("exe", nargs='?', default="WCMDiag5519b.exe", help="diagnosis executable (default: WCMDiag5519b.exe)"))
+def cmd_translations_ui_text(args):
+    _load("extract_ui_text", "extracted_forms").extract_all_translations(args.exe)
+
+@command("translations dfm", "list UI component captions of an extracted DFM text file",
+         arg("file", help="extracted form, e.g. TFRMWCM_5.txt"))
+def cmd_translations_dfm(args):
+    _load("parse_dfm_text", "extracted_forms").extract_dfm_translations(args.file)
+
+@command("translations build", "build per-form translation CSV matrices from extracted DFM text",
+         arg("--input", default="Extracted_Translations/Forms",
+             help="folder with the extracted form texts (default: Extracted_Translations/Forms)"),
+         arg("--output", default="Extracted_Translations/CSV_Matrices",
+             help="folder for the CSV matrices (default: Extracted_Translations/CSV_Matrices)"))
+def cmd_translations_build(args):
+    _load("build_translation_csv", "forms").batch_process(args.input, args.output)
+
+@command("translations map", "map UI components to SYC variables from a disassembly dump",
+         arg("file", help="dump file, e.g. FUN_005b5c6c.txt"))
+def cmd_translations_map(args):
+    _load("import re.py").build_mapping_table(args.file)
+
+# ---------------------------------------------------------------- scan
+
+@command("scan", "plan a discovery scan that only reads addresses not yet mapped (see scan_planner.py)",
+         arg("scan_args", nargs=argparse.REMAINDER, help="memory|register [options]"))
+def cmd_scan(args):
+    from scan_planner import main
+    main(args.scan_args)
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="whdiag", description="Weishaupt diagnosis tools.")
+    sub = parser.add_subparsers(dest="command", metavar="COMMAND", required=True)
+    groups = {}
+    for name, (handler, help_text, arguments) in COMMANDS.items():
+        target = sub
+        if " " in name:
+            group, name = name.split(" ", 1)
+            if group not in groups:
+                group_parser = sub.add_parser(group, help=f"{group} commands")
+                groups[group] = group_parser.add_subparsers(dest="subcommand", metavar="SUBCOMMAND", required=True)
+            target = groups[group]
+        p = target.add_parser(name, help=help_text, description=help_text)
+        for a, kw in arguments:
+            p.add_argument(*a, **kw)
+        p.set_defaults(handler=handler, parser=p)
+    return parser
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    return args.handler(args) or 0
+
+if __name__ == "__main__":
+    sys.exit(main())